@@ -1,9 +1,13 @@
-from pathlib import Path
+"""
+ALAMOpy, a Python interface to the ALAMO executable.
 
-base_path = Path.home()
-# base_path = Path("/home/io")  # wsl
-# base_path = Path("/content/")  # collab
+The ALAMO executable is looked up, in order of precedence, from:
+    the ALAMO_EXEC_PATH environment variable,
+    the exec_path attribute of this package (e.g. alamopy.exec_path = path),
+    an "alamo" executable on the PATH,
+    the legacy location ~/alamo-linux64/alamo.
+See almutils.get_alamo_path.
+"""
 
-exec_path = base_path / "alamo-linux64" / "alamo"
-
-print(f"Expected ALAMO executable location: {exec_path}")
+# Set to the location of the ALAMO executable to override the discovery
+exec_path = None
@@ -13,13 +13,26 @@
 """
 Main file of ALAMOpy; a shell that calls other alm functions.
 """
+import getpass
 import os
+import weakref
+import shutil
+import tempfile
 
+from alamopy import almcache
 from alamopy import almopts
 from alamopy import almwrite
 from alamopy import almexec
+from alamopy import almprofile
 from alamopy import almread
-import getpass, os, tempfile
+from alamopy import almsample
+from alamopy import almscreen
+from alamopy import almsubset
+from alamopy import almworkspace
+
+# Default limit of concurrent doalamo_async runs on one event loop
+max_concurrency = os.cpu_count() or 1
+_semaphores = weakref.WeakKeyDictionary()
 
 
 def doalamo(
@@ -53,20 +66,197 @@ def doalamo(
                 ALAMOpy. See almopts.py for a complete documentation.
     """
 
-    full_name = getpass.getuser()
-    tempdir = tempfile.mkdtemp(prefix=full_name + "-")
+    opts = prepare_opts(xdata, zdata, noutputs, xmin, xmax, simulator, kwargs)
+    almopts.validate_opts(opts)
+    if opts["engine"] == "subset":
+        return fit_in_process(opts)
+
+    profile = almprofile.get_profile(opts["profile"])
+    opts["profile"] = profile
+    pool = almworkspace.get_pool(opts["workspace_pool"])
+    workspace = pool.acquire() if pool is not None else make_workspace()
+    try:
+        place_in_workspace(opts, workspace)
+        with almprofile.span(opts, "complete_opts"):
+            almopts.complete_opts(opts)
+        if opts["screen"]:
+            with almprofile.span(opts, "screen"):
+                almscreen.screen(opts)
+
+        # Runs with a cache (or kept files) never take the named pipes, so
+        # that the cache below sees every run
+        if pool is not None and pool.fifo and almworkspace.fifo_usable(opts):
+            # Streaming the alm and lst files through named pipes
+            with almprofile.span(opts, "exec_alamo"):
+                almworkspace.run_through_fifos(
+                    opts,
+                    almwrite.write_alm_file,
+                    almexec.exec_alamo,
+                    almread.read_lst_file,
+                )
+        else:
+            # Writing alm file
+            with almprofile.span(opts, "write_alm_file"):
+                almwrite.write_alm_file(opts)
+
+            # Running ALAMO and reading lst file, unless the result is cached
+            cache = almcache.get_cache(opts["cache"])
+            hit = False
+            if cache is not None:
+                with almprofile.span(opts, "cache_load"):
+                    key = cache.make_key(opts)
+                    hit = almcache.load(cache, key, opts)
+            if not hit:
+                with almprofile.span(opts, "exec_alamo"):
+                    almexec.exec_alamo(opts)
+                with almprofile.span(opts, "read_lst_file"):
+                    almread.read_lst_file(opts)
+                if cache is not None:
+                    with almprofile.span(opts, "cache_store"):
+                        almcache.store(cache, key, opts)
+        if opts["holdout"] is not None:
+            with almprofile.span(opts, "score_holdout"):
+                almsample.score_holdout(opts)
+    finally:
+        # Cleaning up, also when ALAMO or the parsing failed
+        with almprofile.span(opts, "cleanup"):
+            cleanup(opts, pool)
+        finish_profile(opts)
+
+    # Returning to the user
+    return opts["return"]
+
 
-    initial_directory = os.getcwd()
+async def doalamo_async(
+    xdata=None,
+    zdata=None,
+    noutputs=None,
+    xmin=None,
+    xmax=None,
+    simulator=None,
+    semaphore=None,
+    **kwargs
+):
+    """
+    Coroutine counterpart of doalamo. ALAMO runs as an asyncio subprocess, and
+    writing the alm file and parsing the lst file happen in the default
+    executor, so the event loop is never blocked by a fit.
 
+    Args:
+        semaphore: An asyncio.Semaphore bounding the number of concurrent
+                   runs. Defaults to a semaphore of size max_concurrency shared
+                   by all runs on the current event loop (see
+                   set_max_concurrency).
+        The remaining arguments are the same as for doalamo.
+
+    Cancelling the awaiting task kills the ALAMO process and cleans up the
+    workspace of the run.
+    """
+    import asyncio
+
+    opts = prepare_opts(xdata, zdata, noutputs, xmin, xmax, simulator, kwargs)
+    almopts.validate_opts(opts)
+
+    if semaphore is None:
+        semaphore = default_semaphore()
+    loop = asyncio.get_running_loop()
+
+    async with semaphore:
+        if opts["engine"] == "subset":
+            return await loop.run_in_executor(None, fit_in_process, opts)
+        profile = almprofile.get_profile(opts["profile"])
+        opts["profile"] = profile
+        pool = almworkspace.get_pool(opts["workspace_pool"])
+        workspace = pool.acquire() if pool is not None else make_workspace()
+        try:
+            place_in_workspace(opts, workspace)
+            with almprofile.span(opts, "complete_opts"):
+                almopts.complete_opts(opts)
+            if opts["screen"]:
+                with almprofile.span(opts, "screen"):
+                    await loop.run_in_executor(None, almscreen.screen, opts)
+            with almprofile.span(opts, "write_alm_file"):
+                await loop.run_in_executor(None, almwrite.write_alm_file, opts)
+            cache = almcache.get_cache(opts["cache"])
+            hit = False
+            if cache is not None:
+                with almprofile.span(opts, "cache_load"):
+                    key = await loop.run_in_executor(None, cache.make_key, opts)
+                    hit = await loop.run_in_executor(
+                        None, almcache.load, cache, key, opts
+                    )
+            if not hit:
+                with almprofile.span(opts, "exec_alamo"):
+                    await almexec.exec_alamo_async(opts)
+                with almprofile.span(opts, "read_lst_file"):
+                    await loop.run_in_executor(None, almread.read_lst_file, opts)
+                if cache is not None:
+                    with almprofile.span(opts, "cache_store"):
+                        await loop.run_in_executor(
+                            None, almcache.store, cache, key, opts
+                        )
+            if opts["holdout"] is not None:
+                with almprofile.span(opts, "score_holdout"):
+                    await loop.run_in_executor(None, almsample.score_holdout, opts)
+        finally:
+            with almprofile.span(opts, "cleanup"):
+                cleanup(opts, pool)
+            finish_profile(opts)
+
+    return opts["return"]
+
+
+def set_max_concurrency(limit):
+    """
+    Set the number of doalamo_async runs allowed to execute concurrently on
+    each event loop when no explicit semaphore is passed.
+    """
+    global max_concurrency
+    max_concurrency = limit
+    _semaphores.clear()
+
+
+def fit_in_process(opts):
+    """
+    Fit the data with the in-process engine of almsubset instead of ALAMO,
+    without any workspace or file.
+    """
+    profile = almprofile.get_profile(opts["profile"])
+    opts["profile"] = profile
     try:
-        # Change the current working Directory and make writable
-        os.chdir(tempdir)
-        os.chmod(tempdir, 0o755)  ## read and write by me, readable for everone else
-    except OSError:
-        print("Can't change the Current Working Directory")
-    current_directory = os.getcwd()
-
-    # Preparing and updating options with user-supplied values
+        with almprofile.span(opts, "complete_opts"):
+            almopts.complete_opts(opts)
+        if opts["screen"]:
+            with almprofile.span(opts, "screen"):
+                almscreen.screen(opts)
+        with almprofile.span(opts, "fit_subset"):
+            almsubset.fit_subset(opts)
+        if opts["holdout"] is not None:
+            with almprofile.span(opts, "score_holdout"):
+                almsample.score_holdout(opts)
+    finally:
+        finish_profile(opts)
+    return opts["return"]
+
+
+def default_semaphore():
+    """
+    Return the semaphore shared by doalamo_async runs on the running loop.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max_concurrency)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+def prepare_opts(xdata, zdata, noutputs, xmin, xmax, simulator, kwargs):
+    """
+    Prepare the default options and update them with user-supplied values.
+    """
     opts = almopts.prepare_default_opts()
     for key, value in kwargs.items():
         opts[key] = value
@@ -76,29 +266,111 @@ def doalamo(
     opts["xmin"] = xmin
     opts["xmax"] = xmax
     opts["simulator"] = simulator
-    almopts.validate_opts(opts)
-    almopts.complete_opts(opts)
+    return opts
 
-    # Writing alm file
-    almwrite.write_alm_file(opts)
 
-    # Running ALAMO
-    almexec.exec_alamo(opts)
+def make_workspace():
+    """
+    Create a private temporary directory for a single ALAMO run.
+    """
+    workspace = tempfile.mkdtemp(prefix=getpass.getuser() + "-")
+    os.chmod(workspace, 0o755)  ## read and write by me, readable for everone else
+    return workspace
+
 
-    # Reading lst file
-    almread.read_lst_file(opts)
+def place_in_workspace(opts, workspace):
+    """
+    Make the alm file name absolute inside the workspace, so that no step of
+    the run depends on the current working directory of the process.
+    """
+    opts["workspace"] = workspace
+    if not os.path.isabs(opts["alm_file_name"]):
+        opts["alm_file_name"] = os.path.join(workspace, opts["alm_file_name"])
 
-    # Cleaning up
+
+def cleanup(opts, pool=None):
+    """
+    Remove the files of a run, unless the user asked to keep them, and give
+    the workspace back to its pool if it came from one.
+    """
+    workspace = opts["workspace"]
+    if workspace is None:
+        return
     if not opts["keep_alm_file"] and os.path.isfile(opts["alm_file_name"]):
         os.remove(opts["alm_file_name"])
-    if not opts["keep_lst_file"] and os.path.isfile(opts["lst_file_name"]):
-        os.remove(opts["lst_file_name"])
+    if opts["lst_file_name"] is not None:
+        if not opts["keep_lst_file"] and os.path.isfile(opts["lst_file_name"]):
+            os.remove(opts["lst_file_name"])
 
     if opts["keep_alm_file"] or opts["keep_lst_file"]:
-        print("You may view the output files in " + tempdir)
+        if pool is not None:
+            workspace = pool.detach(workspace)
+            opts["workspace"] = workspace
+        print("You may view the output files in " + workspace)
+    elif pool is not None:
+        pool.release(workspace)
     else:
-        os.chdir(initial_directory)
-        os.rmdir(tempdir)
+        shutil.rmtree(workspace, ignore_errors=True)
 
-    # Returning to the user
-    return opts["return"]
+
+def finish_profile(opts):
+    """
+    Store the phases recorded by the profile of a run, if any, into
+    opts["return"]["other"]["profile"].
+    """
+    profile = opts["profile"]
+    if profile is None:
+        return
+    profile.close()
+    opts["return"]["other"]["profile"] = profile.records
+
+
+def _run_batch_job(job_id, kwargs):
+    """
+    Run a single doalamo job inside a worker process of doalamo_batch.
+    The lambdified model functions cannot be pickled, so they are stripped
+    here and rebuilt by the parent process.
+    """
+    try:
+        result = doalamo(**kwargs)
+    except Exception as err:  # reported back to the caller with the job id
+        return job_id, None, err
+    return job_id, almread.strip_model_funs(result), None
+
+
+def doalamo_batch(jobs, max_workers=None):
+    """
+    Run many doalamo jobs across a process pool, yielding results as soon as
+    each job finishes.
+
+    Args:
+        jobs: Either a dictionary mapping job ids to doalamo keyword arguments,
+              or an iterable of (job_id, kwargs) pairs. Each kwargs dictionary
+              is passed to doalamo as doalamo(**kwargs), e.g.
+              {"fit_a": {"xdata": x, "zdata": z, "monomialpower": [2, 3]}}.
+        max_workers: The maximum number of worker processes. Defaults to the
+                     number of processors on the machine.
+
+    Yields:
+        (job_id, result, error) tuples in completion order. result is the
+        dictionary doalamo would have returned, or None if the job failed, in
+        which case error holds the raised exception.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    if isinstance(jobs, dict):
+        jobs = jobs.items()
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_run_batch_job, job_id, kwargs): job_id
+            for job_id, kwargs in jobs
+        }
+        for future in as_completed(futures):
+            try:
+                job_id, result, error = future.result()
+            except Exception as err:  # e.g. a crashed worker process
+                job_id, result, error = futures[future], None, err
+            if result is not None:
+                almread.restore_model_funs(result)
+            yield job_id, result, error
@@ -0,0 +1,355 @@
+##############################################################################
+# Institute for the Design of Advanced Energy Systems Process Systems
+# Engineering Framework (IDAES PSE Framework) Copyright (c) 2018-2020, by the
+# software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia
+# University Research Corporation, et al. All rights reserved.
+#
+# Please see the files COPYRIGHT.txt and LICENSE.txt for full copyright and
+# license information, respectively. Both files are also available online
+# at the URL "https://github.com/IDAES/idaes-pse".
+##############################################################################
+"""
+almbasis.py
+The candidate basis functions ALAMO considers for a set of options.
+
+Bases are monomial tuples, as in almmodel, so that they can be evaluated with
+almmodel.AlmModel.basis and labelled with almmodel.format_basis. basis_matrix
+evaluates all the candidates at once, group by group, and memoizes the
+result by a fingerprint of the data, so that the engines, validation and
+refitting code evaluating the same candidates on the same data share it.
+"""
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from alamopy import almmodel
+
+# Unary functions of every input, by the option enabling them
+function_options = [
+    ("expfcns", "exp"),
+    ("logfcns", "log"),
+    ("sinfcns", "sin"),
+    ("cosfcns", "cos"),
+]
+
+# Options defining the candidate bases, part of the keys of basis_matrix
+basis_option_names = [
+    "linfcns",
+    "monomialpower",
+    "multi2power",
+    "multi3power",
+    "ratiopower",
+    "constant",
+    "exclude",
+    "custombas",
+] + [option for option, _ in function_options]
+
+# Number and total size in bytes of the basis matrices memoized by
+# basis_matrix, and the size of the largest matrix memoized at all
+max_memoized_matrices = 8
+max_memoized_bytes = 2**28
+max_memoized_matrix_bytes = 2**26
+
+_memo = OrderedDict()
+_memo_bytes = 0
+_memo_lock = threading.Lock()
+
+
+def candidate_bases(settings, ninputs, xlabels=None):
+    """
+    Enumerate the candidate bases of ALAMO for the given options.
+    Args:
+        settings: A dictionary of ALAMO options by their lowercase name, e.g.
+            almopts options or the entries of an alm file. Missing options
+            take ALAMO's defaults: linfcns and constant on, no other basis.
+        ninputs: The number of inputs.
+        xlabels: The input labels used by the custom bases, X1, X2, ... by
+            default.
+    Returns:
+        A list of monomial tuples: the linear terms, monomials, functions,
+        pairwise and triple products, ratios, the custom bases and finally
+        the constant.
+    Raises:
+        ValueError if a custom basis cannot be represented (see
+        almmodel.parse_basis).
+    """
+    bases = []
+    for _, _, group in candidate_groups(settings, ninputs, xlabels):
+        bases.extend(group)
+    return bases
+
+
+def candidate_groups(settings, ninputs, xlabels=None):
+    """
+    The candidate bases of candidate_bases, in the same order, grouped by the
+    option creating them.
+    Returns:
+        A list of (option, value, bases), e.g. ("monomialpower", 2.0, [...])
+        or ("expfcns", 1.0, [...]). The value of the custom bases and of the
+        constant is None.
+    """
+    inputs = included_inputs(settings, ninputs)
+
+    groups = []
+    if _enabled(settings.get("linfcns"), True):
+        groups.append(("linfcns", 1.0, [_product({j: 1.0}) for j in inputs]))
+    for power in option_values(settings.get("monomialpower")):
+        if power != 1.0:
+            group = [_product({j: power}) for j in inputs]
+            groups.append(("monomialpower", power, group))
+    for option, name in function_options:
+        if _enabled(settings.get(option), False):
+            group = [(1.0, (), ((name, _product({j: 1.0}), 1.0),)) for j in inputs]
+            groups.append((option, 1.0, group))
+    for power in option_values(settings.get("multi2power")):
+        group = [
+            _product({j: power for j in pair})
+            for pair in itertools.combinations(inputs, 2)
+        ]
+        groups.append(("multi2power", power, group))
+    for power in option_values(settings.get("multi3power")):
+        group = [
+            _product({j: power for j in triple})
+            for triple in itertools.combinations(inputs, 3)
+        ]
+        groups.append(("multi3power", power, group))
+    for power in option_values(settings.get("ratiopower")):
+        group = [
+            _product({i: power, j: -power})
+            for i, j in itertools.permutations(inputs, 2)
+        ]
+        groups.append(("ratiopower", power, group))
+    if settings.get("custombas") is not None:
+        labels = xlabels or ["X%d" % (j + 1) for j in range(ninputs)]
+        index = {label: j for j, label in enumerate(labels)}
+        group = [
+            almmodel.parse_basis(expression, index)
+            for expression in _expressions(settings["custombas"])
+        ]
+        groups.append(("custombas", None, group))
+    if _enabled(settings.get("constant"), True):
+        groups.append(("constant", None, [_product({})]))
+    return groups
+
+
+def basis_inputs(basis):
+    """
+    The set of the indices of the inputs a basis depends on.
+    """
+    inputs = {j for j, _ in basis[1]}
+    for _, arg, _ in basis[2]:
+        inputs |= basis_inputs(arg)
+    return inputs
+
+
+def basis_matrix(settings, xdata, xlabels=None):
+    """
+    Evaluate the candidate bases of the options on data, memoized by a
+    fingerprint of the data and the options defining the bases, unless the
+    matrix takes more than max_memoized_matrix_bytes bytes.
+    Args:
+        settings: The options, as for candidate_bases.
+        xdata: An (n, ninputs) array.
+        xlabels: The input labels, X1, X2, ... by default.
+    Returns:
+        (matrix, bases, labels): the read-only (n, nbases) values of the
+        bases, the bases as in candidate_bases, and the label of every
+        column in ALAMO's term syntax, e.g. "X1*X2^-1". Columns of bases
+        undefined on the data, e.g. logarithms of negative inputs, hold nan.
+    """
+    xdata = np.asarray(xdata, dtype=float)
+    if xdata.ndim == 1:
+        xdata = xdata.reshape(-1, 1)
+    ninputs = xdata.shape[1]
+    labels = list(xlabels or ["X%d" % (j + 1) for j in range(ninputs)])
+    options = tuple(
+        (name, repr(settings.get(name))) for name in basis_option_names
+    )
+    key = (data_fingerprint(xdata), options, tuple(labels))
+    with _memo_lock:
+        entry = _memo.get(key)
+        if entry is not None:
+            _memo.move_to_end(key)
+    if entry is None:
+        bases = candidate_bases(settings, ninputs, labels)
+        matrix = _evaluate_groups(settings, xdata, bases)
+        matrix.setflags(write=False)
+        entry = (matrix, bases, [basis_label(basis, labels) for basis in bases])
+        if matrix.nbytes <= max_memoized_matrix_bytes:
+            _remember(key, entry)
+    # The matrix is shared read-only, the lists are copied for the caller
+    return entry[0], list(entry[1]), list(entry[2])
+
+
+def _remember(key, entry):
+    """
+    Memoize an entry of basis_matrix, evicting the least recently used ones
+    beyond max_memoized_matrices entries or max_memoized_bytes bytes.
+    """
+    global _memo_bytes
+    with _memo_lock:
+        if key in _memo:
+            return
+        _memo[key] = entry
+        _memo_bytes += entry[0].nbytes
+        while len(_memo) > max_memoized_matrices or _memo_bytes > max_memoized_bytes:
+            _memo_bytes -= _memo.popitem(last=False)[1][0].nbytes
+
+
+def data_fingerprint(xdata):
+    """
+    Return a digest of the shape and values of an array, identifying it
+    regardless of its memory layout.
+    """
+    xdata = np.ascontiguousarray(xdata, dtype=float)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr(xdata.shape).encode("ascii"))
+    digest.update(xdata.view(np.uint8))
+    return digest.hexdigest()
+
+
+def clear_memo():
+    """
+    Forget the basis matrices memoized by basis_matrix.
+    """
+    global _memo_bytes
+    with _memo_lock:
+        _memo.clear()
+        _memo_bytes = 0
+
+
+def _evaluate_groups(settings, xdata, bases):
+    """
+    Evaluate the bases of candidate_bases with one array operation per group
+    of bases, in the order of candidate_bases, into a column-major matrix.
+    """
+    ndata, ninputs = xdata.shape
+    inputs = included_inputs(settings, ninputs)
+    x = np.asfortranarray(xdata[:, inputs])
+    matrix = np.empty((ndata, len(bases)), order="F")
+    powers = {1.0: x}
+    start = 0
+
+    def power(p):
+        if p not in powers:
+            powers[p] = x**p
+        return powers[p]
+
+    def put(first, *factors):
+        nonlocal start
+        out = matrix[:, start : start + first.shape[1]]
+        np.copyto(out, first)
+        for factor in factors:
+            np.multiply(out, factor, out=out)
+        start += first.shape[1]
+
+    with np.errstate(all="ignore"):
+        if _enabled(settings.get("linfcns"), True):
+            put(x)
+        for p in option_values(settings.get("monomialpower")):
+            if p != 1.0:
+                put(power(p))
+        for option, name in function_options:
+            if _enabled(settings.get(option), False):
+                put(getattr(np, name)(x))
+        for p in option_values(settings.get("multi2power")):
+            first, second = _combinations(len(inputs), 2)
+            put(power(p)[:, first], power(p)[:, second])
+        for p in option_values(settings.get("multi3power")):
+            first, second, third = _combinations(len(inputs), 3)
+            put(power(p)[:, first], power(p)[:, second], power(p)[:, third])
+        for p in option_values(settings.get("ratiopower")):
+            pairs = np.array(
+                list(itertools.permutations(range(len(inputs)), 2)), dtype=int
+            ).reshape(-1, 2)
+            put(power(p)[:, pairs[:, 0]], power(-p)[:, pairs[:, 1]])
+        # The custom bases follow the groups, and precede the constant
+        constant = int(_enabled(settings.get("constant"), True))
+        custom = bases[start : len(bases) - constant]
+        if custom:
+            model = almmodel.AlmModel([""] * ninputs, np.zeros(len(custom)), custom)
+            put(model.basis(xdata))
+    if constant:
+        matrix[:, start] = 1.0
+    return matrix
+
+
+def _combinations(count, size):
+    """
+    The index arrays of the combinations of size indices out of count, one
+    array per position, in the order of itertools.combinations.
+    """
+    combinations = np.array(
+        list(itertools.combinations(range(count), size)), dtype=int
+    ).reshape(-1, size)
+    return tuple(combinations.T)
+
+
+def included_inputs(settings, ninputs):
+    """
+    The indices of the inputs not excluded by the exclude option, a 0/1 flag
+    for every input as in ALAMO.
+    """
+    flags = option_values(settings.get("exclude"))
+    return [j for j in range(ninputs) if not (j < len(flags) and flags[j])]
+
+
+def _product(powers):
+    return (1.0, tuple(sorted(powers.items())), ())
+
+
+def option_values(option):
+    """
+    The numeric values of a list option, given as a number, a list or the
+    words of an alm file entry.
+    """
+    if option is None:
+        return []
+    if not isinstance(option, (list, tuple)):
+        option = [option]
+    return [float(value) for value in option]
+
+
+def _expressions(option):
+    """
+    The expressions of the custom bases, given as a string, a list of strings
+    or the lines of an alm file section.
+    """
+    if isinstance(option, str):
+        option = [option]
+    return [str(expression).strip() for expression in option if str(expression).strip()]
+
+
+def _enabled(option, default):
+    values = option_values(option)
+    return bool(values[0]) if values else default
+
+
+def basis_label(basis, xlabels):
+    """
+    Label a basis as in the "BASES considered" block of a lst file, e.g.
+    "X1*X2^-1" or "exp(X1)".
+    """
+    return almmodel.format_basis(basis, xlabels).replace(" * ", "*")
+
+
+def term_factors(basis, xlabels):
+    """
+    The factors of a basis in the BETAS and BASES block, e.g. ["X1", "X2"].
+    The constant basis has no factor.
+    """
+    if not basis[1] and not basis[2]:
+        return []
+    return almmodel.format_basis(basis, xlabels).split(" * ")
+
+
+def format_term(coeff, basis, xlabels):
+    """
+    Format a term as a line of the BETAS and BASES block, e.g. "1.5 X1 X2".
+    """
+    return " ".join([repr(float(coeff))] + term_factors(basis, xlabels))
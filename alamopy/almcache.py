@@ -0,0 +1,239 @@
+##############################################################################
+# Institute for the Design of Advanced Energy Systems Process Systems
+# Engineering Framework (IDAES PSE Framework) Copyright (c) 2018-2020, by the
+# software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia
+# University Research Corporation, et al. All rights reserved.
+#
+# Please see the files COPYRIGHT.txt and LICENSE.txt for full copyright and
+# license information, respectively. Both files are also available online
+# at the URL "https://github.com/IDAES/idaes-pse".
+##############################################################################
+"""
+almcache.py
+Content-addressed cache of ALAMO results.
+
+A run is identified by the hash of the rendered .alm file, the ALAMO
+version and the Python-side options shaping the result, so refitting
+identical data with identical options can skip the ALAMO executable
+entirely. The cache is opt-in through the "cache" option:
+    cache=True uses a process-wide, memory-only cache (see default_cache).
+    cache=AlmCache(directory=...) additionally persists results on disk.
+"""
+import copy
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+from alamopy import almexec
+from alamopy import almread
+
+# Options that do not reach the alm file but change the stored result: how
+# the lst file and ALAMO output are parsed, and the screening and
+# subsampling reports
+result_option_names = [
+    "skip_data_echo",
+    "max_output_lines",
+    "screen",
+    "screen_threshold",
+    "screen_max_inputs",
+    "max_fit_points",
+    "fit_sampling",
+    "fit_holdout",
+]
+
+
+class AlmCache:
+    """
+    A two-tier cache of ALAMO results: an in-memory LRU tier and an optional
+    on-disk tier with size-based eviction of the least recently used entries.
+
+    Args:
+        directory: Directory of the on-disk tier. None keeps the cache in
+                   memory only.
+        max_entries: Maximum number of results kept in memory.
+        max_disk_bytes: Maximum total size of the on-disk tier in bytes.
+    """
+
+    def __init__(self, directory=None, max_entries=128, max_disk_bytes=2**29):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def make_key(self, opts):
+        """
+        Return the cache key of the run described by opts, i.e. the hash of
+        the written alm file, the ALAMO version of its backend and the
+        result_option_names options.
+        """
+        digest = hashlib.sha256()
+        digest.update(str(almexec.alamo_version(opts)).encode("utf-8"))
+        digest.update(b"\0")
+        options = [(name, opts.get(name)) for name in result_option_names]
+        digest.update(repr(options).encode("utf-8"))
+        digest.update(b"\0")
+        with open(opts["alm_file_name"], "rb") as alm_file:
+            for block in iter(lambda: alm_file.read(2**20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Return the cached entry {"lst": ..., "result": ...} under key, or None.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+
+        entry = self._read_disk(key)
+        if entry is not None:
+            almread.restore_model_funs(entry["result"])
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, lst_text, result):
+        """
+        Store the lst file contents and the parsed result under key.
+        """
+        entry = {"lst": lst_text, "result": copy.deepcopy(result)}
+        self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def clear(self):
+        """
+        Remove every entry from both tiers.
+        """
+        with self._lock:
+            self._memory.clear()
+        for path in self._disk_files():
+            _remove_quietly(path)
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pkl")
+
+    def _disk_files(self):
+        if self.directory is None:
+            return []
+        return [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(".pkl")
+        ]
+
+    def _read_disk(self, key):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as cache_file:
+                entry = pickle.load(cache_file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        # Mark as recently used for the eviction order
+        os.utime(path)
+        return entry
+
+    def _write_disk(self, key, entry):
+        if self.directory is None:
+            return
+        result = almread.strip_model_funs(copy.deepcopy(entry["result"]))
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(handle, "wb") as cache_file:
+            pickle.dump({"lst": entry["lst"], "result": result}, cache_file)
+        os.replace(temp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        files = []
+        for path in self._disk_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            _remove_quietly(path)
+            total -= size
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+_default_cache = None
+
+
+def default_cache():
+    """
+    Return the process-wide, memory-only cache used by cache=True.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AlmCache()
+    return _default_cache
+
+
+def get_cache(option):
+    """
+    Resolve the value of the "cache" option to an AlmCache or None.
+    """
+    if option is None or option is False:
+        return None
+    if option is True:
+        return default_cache()
+    return option
+
+
+def load(cache, key, opts):
+    """
+    Fill opts["return"] from the cache entry under key.
+    Returns:
+        True on a cache hit, False otherwise.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return False
+    opts["return"] = copy.deepcopy(entry["result"])
+    opts["return"]["other"]["cached"] = True
+    if opts["keep_lst_file"]:
+        with open(opts["lst_file_name"], "w") as lst_file:
+            lst_file.write(entry["lst"])
+    return True
+
+
+def store(cache, key, opts):
+    """
+    Store the result of a successful run into the cache under key.
+    """
+    opts["return"]["other"]["cached"] = False
+    if opts["return"]["other"].get("return_code", 0) != 0:
+        return
+    try:
+        with open(opts["lst_file_name"], "r") as lst_file:
+            lst_text = lst_file.read()
+    except FileNotFoundError:
+        return
+    cache.put(key, lst_text, opts["return"])
@@ -10,9 +10,13 @@
 # license information, respectively. Both files are also available online
 # at the URL "https://github.com/IDAES/idaes-pse".
 ##############################################################################
+import numpy as np
 
+from alamopy import almmodel
+from alamopy import almutils
 
-def almconfidence(data, *vargs):
+
+def almconfidence(data, *vargs, chunk_size=None):
     # This function calulates a covariance matrix
     # and confidence intervals of the estimated alamo regression coeficients
     """
@@ -22,106 +26,305 @@ def almconfidence(data, *vargs):
         data: A dictionary that contains the values necessary to create
               the confidence interval. It is produced when ALAMO is run
               and returns back the metrics.
+        chunk_size: If given, X^T X is accumulated over chunks of that many
+              rows, so that memory scales with nterms^2 instead of ndata.
+              xdata (and zdata) may then be np.memmap arrays. The chunked
+              mode is also used when xdata is an iterable of chunks, either
+              xchunk arrays or (xchunk, zchunk) pairs. Without data["ssr"],
+              the sum of squared residuals is accumulated from zdata.
     """
-    import numpy as np
-
-    # import sympy
-    from scipy.stats import t  # 2.7
-    from sympy.parsing.sympy_parser import parse_expr
-    from sympy import symbols, lambdify
-
     if "xdata" not in data.keys():
         xdata = vargs[0]
-        # zdata = vargs[1]
+        zdata = vargs[1] if len(vargs) > 1 else None
     else:
         xdata = data["xdata"]
-        # zdata = data['zdata']
-
-    ndata = np.shape(xdata)[0]
-    # ninputs = np.shape(xdata)[1]
-    # noutputs = np.shape(zdata)[1]
-    if isinstance(data["model"], type({})):
-        for okey in data["model"].keys():
-            model = data["model"][okey]
-            model.split("=")[1]
-            # out = model.split('=')[0]
-            model = model.split("=")[1]
-            # split the model on +/- to isolate each linear term
-            # This section is not currently in compliance with custom basis functions
-            model = model.replace(" - ", " + ").split(" + ")
-            nlinterms = len(model)
-            sensmat = np.zeros([ndata, nlinterms])
-            covar = np.zeros([nlinterms, nlinterms])
-            coeffs = np.zeros([nlinterms])
-            for j in range(nlinterms):
-                thisterm = model[j].split(" * ")
-                coeffs[j] = float(eval(thisterm[0]))
-                thisterm = thisterm[-1]
-                thislam = lambdify(
-                    [symbols(data["xlabels"])],
-                    parse_expr(thisterm.replace("^", "**")),
-                    "numpy",
-                )
-                for i in range(ndata):
-                    sensmat[i, j] = thislam(xdata[i])
-
-            sigma = float(data["ssr"]) / (float(ndata) - float(nlinterms))
-            ci = np.zeros([nlinterms])
-            covar = sigma * np.linalg.inv(np.matmul(np.transpose(sensmat), sensmat))
-            for i in range(0, nlinterms):
-                ci[i] = t.ppf(1 - 0.025, int(ndata) - nlinterms) * np.sqrt(covar[i][i])
-
-            data["covariance"][okey] = covar
-            data["conf_inv"][okey] = list()
-            for j in range(nlinterms):
-                data["conf_inv"][okey].append(
-                    "B" + str(j + 1) + " : " + str(coeffs[j]) + "+/-" + str(ci[j])
-                )
+        zdata = data.get("zdata")
+
+    single = not isinstance(data["model"], type({}))
+    models = {None: data["model"]} if single else data["model"]
+    if chunk_size is not None or _is_chunk_iterable(xdata):
+        results = chunked_intervals(
+            models,
+            data["xlabels"],
+            iter_chunks(xdata, zdata, chunk_size),
+            data.get("ssr"),
+        )
+    elif single:
+        xdata = np.asarray(xdata, dtype=float)
+        ndata = np.shape(xdata)[0]
+        coeffs, sensmat = sensitivity_matrix(data["model"], data["xlabels"], xdata)
+        covar, ci = coefficient_intervals(sensmat, data["ssr"], ndata)
+        results = {None: (coeffs, covar, ci)}
     else:
-        model = data["model"]
-        model.split("=")[1]
-        # out = model.split('=')[0]
-        model = model.split("=")[1]
-        # split the model on +/- to isolate each linear term
-        # This section is not currently in compliance with custom basis functions
-        model = model.replace(" - ", " + ").split(" + ")
-        while "" in model:
-            model.remove("")
-        while " " in model:
-            model.remove(" ")
-        nlinterms = len(model)
-        sensmat = np.zeros([ndata, nlinterms])
-        covar = np.zeros([nlinterms, nlinterms])
-        coeffs = np.zeros([nlinterms])
-        for j in range(nlinterms):
-            if " * " in model[j]:
-                thisterm = model[j].split(" * ")
-                coeffs[j] = float(eval(thisterm[0]))
-                thisterm = thisterm[-1]
-            else:
-                thisterm = model[j]
-                coeffs[j] = float(eval(thisterm))
-            thislam = lambdify(
-                [symbols(data["xlabels"])],
-                parse_expr(thisterm.replace("^", "**")),
-                "numpy",
-            )
-            for i in range(ndata):
-                sensmat[i, j] = thislam(xdata[i])
+        xdata = np.asarray(xdata, dtype=float)
+        results = multi_output_intervals(
+            data["model"], data["xlabels"], xdata, data["ssr"]
+        )
 
-        sigma = float(data["ssr"]) / (float(ndata) - float(nlinterms))
+    if single:
+        coeffs, covar, ci = results[None]
+        data["covariance"] = covar
+        data["conf_inv"] = format_intervals(coeffs, ci)
+        data["coeffs"] = coeffs
+        data["ci"] = ci
+        return data
 
-        covar = sigma * np.linalg.inv(np.matmul(np.transpose(sensmat), sensmat))
-        ci = np.zeros([nlinterms])
-        for i in range(0, nlinterms):
-            ci[i] = t.ppf(1 - 0.025, int(ndata) - nlinterms) * np.sqrt(
-                covar[i][i]
-            )  # 2.7
+    for key in ["covariance", "conf_inv", "coeffs", "ci"]:
+        if not isinstance(data.get(key), dict):
+            data[key] = {}
+    for okey, (coeffs, covar, ci) in results.items():
+        data["covariance"][okey] = covar
+        data["conf_inv"][okey] = format_intervals(coeffs, ci)
+        data["coeffs"][okey] = coeffs
+        data["ci"][okey] = ci
+    return data
 
-        data["covariance"] = covar
-        data["conf_inv"] = list()
-        for j in range(nlinterms):
-            data["conf_inv"].append(
-                "B" + str(j + 1) + " : " + str(coeffs[j]) + "+/-" + str(ci[j])
+
+def iter_chunks(xdata, zdata=None, chunk_size=None):
+    """
+    Yield (xchunk, zchunk) pairs of 2D arrays from xdata and zdata, sliced in
+    chunks of chunk_size rows, or from xdata if it is an iterable of chunks.
+    zchunk is None when no zdata is available.
+    """
+    if not _is_chunk_iterable(xdata):
+        xdata = almutils.array_2d(xdata)
+        if zdata is not None:
+            zdata = almutils.array_2d(zdata)
+        chunk_size = max(int(chunk_size or xdata.shape[0]), 1)
+        for start in range(0, xdata.shape[0], chunk_size):
+            stop = start + chunk_size
+            yield (
+                xdata[start:stop],
+                None if zdata is None else zdata[start:stop],
             )
-        return data
+        return
+
+    for chunk in xdata:
+        if isinstance(chunk, tuple):
+            xchunk, zchunk = chunk
+            yield almutils.array_2d(xchunk), almutils.array_2d(zchunk)
+        else:
+            yield almutils.array_2d(chunk), None
+
+
+def _is_chunk_iterable(xdata):
+    return not hasattr(xdata, "__array__") and not isinstance(xdata, (list, tuple))
+
+
+def chunked_intervals(models, xlabels, chunks, ssr=None, confidence=0.95):
+    """
+    Compute the confidence intervals of several models by accumulating the R
+    factor of their sensitivity matrices over chunks of rows, as the QR
+    decomposition of [R; Xchunk] at every chunk. The result is the same as
+    multi_output_intervals on the whole data, with memory in nterms^2.
+    Args:
+        models: A dictionary mapping output names to model strings, in the
+            order of the zdata columns.
+        xlabels: The input labels of the models.
+        chunks: An iterable of (xchunk, zchunk) pairs, see iter_chunks.
+        ssr: The sum of squared residuals, either a number shared by all
+            outputs or a dictionary mapping output names to numbers. If None,
+            it is accumulated from the zchunks.
+        confidence: The two-sided confidence level.
+    Returns:
+        A dictionary mapping output names to (coeffs, covar, ci) ndarrays.
+    """
+    structured = {}
+    for okey, model in models.items():
+        try:
+            structured[okey] = almmodel.AlmModel.from_model_str(model, xlabels)
+        except ValueError:
+            structured[okey] = None
+
+    coeffs = {}
+    rfactors = dict.fromkeys(models)
+    residuals = dict.fromkeys(models, 0.0)
+    ndata = 0
+    for xchunk, zchunk in chunks:
+        if xchunk.shape[0] == 0:
+            continue
+        if ssr is None and zchunk is None:
+            raise ValueError("Either ssr or zdata is needed for the intervals")
+        # Bases shared between outputs are evaluated once per chunk
+        cache = {}
+        for column, (okey, model) in enumerate(models.items()):
+            if structured[okey] is not None:
+                coeffs[okey] = structured[okey].coeffs
+                sensmat = structured[okey].basis(xchunk, cache)
+            else:
+                coeffs[okey], sensmat = _lambdified_sensitivity_matrix(
+                    model, xlabels, xchunk
+                )
+            if rfactors[okey] is not None:
+                sensmat = np.vstack((rfactors[okey], sensmat))
+            rfactors[okey] = np.linalg.qr(sensmat, mode="r")
+            if ssr is None:
+                error = zchunk[:, column] - sensmat[-xchunk.shape[0] :] @ coeffs[okey]
+                residuals[okey] += float(error @ error)
+        ndata += xchunk.shape[0]
+
+    results = {}
+    for okey in models:
+        if rfactors[okey] is None:
+            raise ValueError("No data to compute the intervals")
+        okey_ssr = residuals[okey] if ssr is None else _output_ssr(ssr, okey)
+        covar, ci = covariance_from_r(rfactors[okey], okey_ssr, ndata, confidence)
+        results[okey] = (coeffs[okey], covar, ci)
+    return results
+
+
+def multi_output_intervals(models, xlabels, xdata, ssr):
+    """
+    Compute the confidence intervals of several models fitted on the same
+    xdata together. Every distinct basis is evaluated once, and the Gram
+    matrix X^T X of all of them is formed in a single pass over the data;
+    the covariance of each output is then obtained from the Cholesky factor
+    of its block.
+    Args:
+        models: A dictionary mapping output names to model strings.
+        xlabels: The input labels of the models.
+        xdata: An (ndata, ninputs) array.
+        ssr: The sum of squared residuals, either a number shared by all
+            outputs or a dictionary mapping output names to numbers.
+    Returns:
+        A dictionary mapping output names to (coeffs, covar, ci) ndarrays.
+    """
+    ndata = xdata.shape[0]
+    structured = {}
+    results = {}
+    for okey, model in models.items():
+        try:
+            structured[okey] = almmodel.AlmModel.from_model_str(model, xlabels)
+        except ValueError:
+            coeffs, sensmat = sensitivity_matrix(model, xlabels, xdata)
+            covar, ci = coefficient_intervals(sensmat, _output_ssr(ssr, okey), ndata)
+            results[okey] = (coeffs, covar, ci)
+
+    # Evaluating the union of all bases once
+    union = {}
+    for model in structured.values():
+        for basis in model.bases:
+            union.setdefault(basis, len(union))
+    if union:
+        shared = almmodel.AlmModel(xlabels, np.zeros(len(union)), list(union))
+        sensmat = shared.basis(xdata)
+        gram = sensmat.T @ sensmat
+
+    for okey, model in structured.items():
+        index = [union[basis] for basis in model.bases]
+        covar, ci = gram_intervals(
+            gram[np.ix_(index, index)], _output_ssr(ssr, okey), ndata
+        )
+        results[okey] = (model.coeffs, covar, ci)
+    return {okey: results[okey] for okey in models}
+
+
+def _output_ssr(ssr, okey):
+    return ssr[okey] if isinstance(ssr, dict) else ssr
+
+
+def sensitivity_matrix(model, xlabels, xdata):
+    """
+    Evaluate the sensitivity of a model to its coefficients, i.e. the value
+    of the basis of every term, at every data point.
+    Args:
+        model: A model string "z = c1 * b1 + c2 * b2 ...".
+        xlabels: The input labels of the model.
+        xdata: An (ndata, ninputs) array.
+    Returns:
+        (coeffs, sensmat), the nterms coefficients and the (ndata, nterms)
+        sensitivity matrix.
+    """
+    try:
+        model = almmodel.AlmModel.from_model_str(model, xlabels)
+    except ValueError:
+        return _lambdified_sensitivity_matrix(model, xlabels, xdata)
+    return model.coeffs, model.basis(xdata)
+
+
+def _lambdified_sensitivity_matrix(model, xlabels, xdata):
+    """
+    Fallback of sensitivity_matrix for terms almmodel cannot represent: each
+    basis is lambdified through sympy and evaluated once on all data points.
+    """
+    from sympy.parsing.sympy_parser import parse_expr
+    from sympy import symbols, lambdify
+
+    terms = almmodel.split_terms(model.split("=")[1])
+    coeffs = np.zeros(len(terms))
+    sensmat = np.zeros([xdata.shape[0], len(terms)])
+    for j, term in enumerate(terms):
+        factors = term.split(" * ")
+        try:
+            coeffs[j] = float(factors[0])
+            factors = factors[1:]
+        except ValueError:
+            coeffs[j] = -1.0 if term.startswith("-") else 1.0
+            factors[0] = factors[0].lstrip("-")
+        if not factors:
+            sensmat[:, j] = 1.0
+            continue
+        thislam = lambdify(
+            [symbols(xlabels)],
+            parse_expr(" * ".join(factors).replace("^", "**")),
+            "numpy",
+        )
+        sensmat[:, j] = thislam(xdata.T)
+    return coeffs, sensmat
+
+
+def coefficient_intervals(sensmat, ssr, ndata, confidence=0.95):
+    """
+    Compute the covariance matrix and the half-widths of the confidence
+    intervals of the coefficients of a linear-in-coefficients model.
+    The covariance sigma * inv(X^T X) is obtained from the R factor of a QR
+    decomposition of the sensitivity matrix X instead of an explicit inverse.
+    Args:
+        sensmat: The (ndata, nterms) sensitivity matrix.
+        ssr: The sum of squared residuals of the model.
+        ndata: The number of data points.
+        confidence: The two-sided confidence level.
+    Returns:
+        (covar, ci), the (nterms, nterms) covariance matrix and the nterms
+        half-widths of the confidence intervals.
+    """
+    rfactor = np.linalg.qr(sensmat, mode="r")
+    return covariance_from_r(rfactor, ssr, ndata, confidence)
+
+
+def gram_intervals(gram, ssr, ndata, confidence=0.95):
+    """
+    Same as coefficient_intervals, given the (nterms, nterms) Gram matrix
+    X^T X of the sensitivity matrix, through its Cholesky factor.
+    """
+    rfactor = np.linalg.cholesky(gram).T
+    return covariance_from_r(rfactor, ssr, ndata, confidence)
+
+
+def covariance_from_r(rfactor, ssr, ndata, confidence=0.95):
+    """
+    Same as coefficient_intervals, given the (nterms, nterms) upper
+    triangular R factor of the sensitivity matrix, so that X^T X = R^T R.
+    """
+    from scipy.linalg import solve_triangular
+    from scipy.stats import t
+
+    nlinterms = rfactor.shape[1]
+    if np.any(np.diag(rfactor) == 0.0):
+        raise np.linalg.LinAlgError("Singular matrix")
+    sigma = float(ssr) / (float(ndata) - float(nlinterms))
+    rinv = solve_triangular(rfactor, np.eye(nlinterms))
+    covar = sigma * (rinv @ rinv.T)
+    tval = t.ppf(1 - (1 - confidence) / 2, int(ndata) - nlinterms)
+    ci = tval * np.sqrt(np.diag(covar))
+    return covar, ci
+
+
+def format_intervals(coeffs, ci):
+    """
+    Format the confidence intervals as ["B1 : coeff+/-ci", ...].
+    """
+    return [
+        "B" + str(j + 1) + " : " + str(coeffs[j]) + "+/-" + str(ci[j])
+        for j in range(len(coeffs))
+    ]
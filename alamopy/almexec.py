@@ -15,30 +15,335 @@ almexec.py
 Run the ALAMO executable.
 """
 
+import collections
+import os
+import signal
 import subprocess
-from alamopy import exec_path
+import threading
+import time
+from alamopy import almprofile
 from alamopy import almutils
 
+# Return codes of runs stopped by alamopy, distinct from ALAMO's own codes
+termination_codes = {"timeout": -1, "cancelled": -2}
+
+# Seconds between two checks of the cancel handle
+cancel_poll_interval = 0.1
+
+
+class BinaryBackend:
+    """
+    The default execution backend: runs an ALAMO executable as a subprocess.
+
+    An execution backend is any object with the methods
+        run(opts): run ALAMO on opts["alm_file_name"], so that the lst file
+            is written to opts["lst_file_name"], and store the output with
+            store_output;
+        version(): return the version of ALAMO, part of the cache keys;
+    and optionally the coroutine run_async(opts). Backends are selected
+    with the "backend" option, e.g. almfake.FakeBackend for an in-process
+    stand-in, or a backend submitting runs to a remote machine.
+
+    Args:
+        command: The command line prefix running ALAMO, to which the alm
+                 file name is appended. Defaults to the discovered ALAMO
+                 executable (see almutils.get_alamo_path).
+    """
+
+    def __init__(self, command=None):
+        self.command = None if command is None else list(command)
+
+    def command_line(self, opts):
+        """
+        Return the command line that runs ALAMO on the alm file in opts.
+        """
+        if self.command is None:
+            return [str(almutils.get_alamo_path()), opts["alm_file_name"]]
+        return self.command + [opts["alm_file_name"]]
+
+    def run(self, opts):
+        return run_process(opts, self.command_line(opts))
+
+    async def run_async(self, opts):
+        return await run_process_async(opts, self.command_line(opts))
+
+    def version(self):
+        if self.command is None:
+            return almutils.get_alamo_version()
+        return " ".join(self.command)
+
+
+_default_backend = BinaryBackend()
+
+
+def get_backend(opts):
+    """
+    Return the execution backend of a run, BinaryBackend by default.
+    """
+    backend = opts.get("backend")
+    return _default_backend if backend is None else backend
+
+
+def alamo_version(opts):
+    """
+    Return the ALAMO version reported by the execution backend of a run.
+    """
+    return get_backend(opts).version()
+
+
 def exec_alamo(opts):
     """
-    Call ALAMO on the written alm file, and capture stdout and stderr.
+    Call ALAMO on the written alm file through the execution backend of the
+    run (see BinaryBackend and run_process).
+    """
+    return get_backend(opts).run(opts)
+
+
+async def exec_alamo_async(opts):
+    """
+    Coroutine counterpart of exec_alamo. Backends without run_async run in
+    the default executor.
+    """
+    backend = get_backend(opts)
+    if hasattr(backend, "run_async"):
+        return await backend.run_async(opts)
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, backend.run, opts)
+
+
+class OutputMonitor:
     """
-    exec_result = subprocess.run(
-        [str(exec_path), opts["alm_file_name"]],
-        # check=True,
-        capture_output=True,
+    Consume an output stream of ALAMO line by line, as it is produced.
+
+    The last lines are kept in a ring buffer, the termination code is picked
+    up as soon as it is printed, and every line reporting progress updates
+    the progress dictionary (see almutils.parse_progress_line), which is then
+    passed to the callback.
+
+    Args:
+        max_lines: The number of lines kept, None to keep them all.
+        callback: Called with a copy of the progress dictionary on every
+                  update. It runs on the thread reading the stream; if it
+                  raises, it is not called again and the error is kept in
+                  the error attribute.
+        echo: Print every line as it arrives.
+    """
+
+    def __init__(self, max_lines=None, callback=None, echo=False):
+        self.lines = collections.deque(maxlen=max_lines)
+        self.callback = callback
+        self.echo = echo
+        self.term_code = None
+        self.progress = {}
+        self.error = None
+
+    def feed(self, line):
+        """
+        Consume one line of output, as str or bytes.
+        """
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", "replace")
+        self.lines.append(line)
+        if self.echo:
+            print(line, end="")
+        if self.term_code is None:
+            self.term_code = almutils.term_code_of_line(line)
+        progress = almutils.parse_progress_line(line)
+        if progress is None:
+            return
+        self.progress.update(progress)
+        if self.callback is not None:
+            try:
+                self.callback(dict(self.progress))
+            except Exception as err:  # reported once ALAMO is done
+                self.error = err
+                self.callback = None
+
+    def text(self):
+        """
+        Return the retained output as a single string.
+        """
+        return "".join(self.lines)
+
+
+def make_monitors(opts):
+    """
+    Return the (stdout, stderr) OutputMonitors of a run.
+    """
+    echo = bool(opts["print_alm_output"])
+    max_lines = opts.get("max_output_lines")
+    return (
+        OutputMonitor(max_lines, opts.get("progress_callback"), echo),
+        OutputMonitor(max_lines, None, echo),
+    )
+
+
+def _pump(stream, monitor):
+    with stream:
+        for line in iter(stream.readline, b""):
+            monitor.feed(line)
+
+
+def run_process(opts, command):
+    """
+    Run the ALAMO command line on the written alm file, and stream its stdout
+    and stderr.
+    ALAMO runs inside opts["workspace"] (if set), so that the working
+    directory of the calling process is never changed.
+
+    The output is read line by line while ALAMO runs: progress is reported
+    to opts["progress_callback"] and only the last opts["max_output_lines"]
+    lines are retained (see OutputMonitor).
+
+    ALAMO runs in its own process group. When opts["timeout"] seconds have
+    passed, or opts["cancel"] (e.g. a threading.Event) is set, the whole
+    group is killed and the output captured so far is stored, with the
+    "timeout" or "cancelled" termination status.
+    """
+    timeout = opts.get("timeout")
+    cancel = opts.get("cancel")
+    deadline = None if timeout is None else time.monotonic() + timeout
+    stdout, stderr = make_monitors(opts)
+    with almprofile.span(opts, "spawn"):
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=opts.get("workspace"),
+            start_new_session=True,
+        )
+    readers = [
+        threading.Thread(target=_pump, args=(process.stdout, stdout), daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr, stderr), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+    status = None
+    try:
+        while True:
+            wait = cancel_poll_interval if cancel is not None else None
+            if deadline is not None:
+                remaining = max(deadline - time.monotonic(), 0.0)
+                wait = remaining if wait is None else min(wait, remaining)
+            try:
+                process.wait(timeout=wait)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel is not None and cancel.is_set():
+                    status = "cancelled"
+                elif deadline is not None and time.monotonic() >= deadline:
+                    status = "timeout"
+                else:
+                    continue
+            kill_process_group(process)
+            process.wait()
+            break
+        for reader in readers:
+            reader.join()
+    except BaseException:  # e.g. KeyboardInterrupt, never leave ALAMO behind
+        kill_process_group(process)
+        process.wait()
+        raise
+
+    return store_output(opts, stdout, stderr, status)
+
+
+def kill_process_group(process):
+    """
+    Kill a process started with start_new_session=True and all of its
+    descendants, which share its process group.
+    """
+    if not hasattr(os, "killpg"):
+        process.kill()
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        # The whole group already exited
+        pass
+
+
+async def run_process_async(opts, command):
+    """
+    Coroutine counterpart of run_process. ALAMO is launched without blocking
+    the event loop; if the awaiting task is cancelled, the ALAMO process
+    group is killed before the cancellation propagates. The output is
+    streamed, and opts["timeout"] and opts["cancel"] are honoured as in
+    run_process.
+    """
+    import asyncio
+
+    async def pump(stream, monitor):
+        async for line in stream:
+            monitor.feed(line)
+
+    stdout, stderr = make_monitors(opts)
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=opts.get("workspace"),
+        start_new_session=True,
+        limit=2**20,
+    )
+    run = asyncio.ensure_future(
+        asyncio.gather(
+            pump(process.stdout, stdout), pump(process.stderr, stderr), process.wait()
+        )
     )
+    timeout = opts.get("timeout")
+    cancel = opts.get("cancel")
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    status = None
+    try:
+        while True:
+            wait = cancel_poll_interval if cancel is not None else None
+            if deadline is not None:
+                remaining = max(deadline - loop.time(), 0.0)
+                wait = remaining if wait is None else min(wait, remaining)
+            done, _ = await asyncio.wait([run], timeout=wait)
+            if done:
+                break
+            if cancel is not None and cancel.is_set():
+                status = "cancelled"
+            elif deadline is not None and loop.time() >= deadline:
+                status = "timeout"
+            else:
+                continue
+            kill_process_group(process)
+            break
+        await run
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            kill_process_group(process)
+        run.cancel()
+        await process.wait()
+        raise
 
-    alm_out = exec_result.stdout.decode("utf-8")
-    alm_err = exec_result.stderr.decode("utf-8")
+    return store_output(opts, stdout, stderr, status)
 
-    opts["return"]["out"]["stdout"] = alm_out
-    opts["return"]["out"]["stderr"] = alm_err
-    opts["return"]["other"]["return_code"] = almutils.parse_term_code(alm_out)
 
-    if opts["print_alm_output"]:
-        print(alm_out)
-        if alm_err:
-            print(alm_err)
+def store_output(opts, stdout, stderr, status=None):
+    """
+    Store the output of ALAMO, consumed by the stdout and stderr
+    OutputMonitors, together with the termination code into opts["return"].
+    status is None if ALAMO exited by itself, otherwise the reason why it was
+    stopped ("timeout" or "cancelled"), stored as the termination status.
+    """
+    opts["return"]["out"]["stdout"] = stdout.text()
+    opts["return"]["out"]["stderr"] = stderr.text()
+    if status is None:
+        opts["return"]["other"]["return_code"] = stdout.term_code or 0
+        opts["return"]["other"]["termination"] = "normal"
+    else:
+        opts["return"]["other"]["return_code"] = termination_codes[status]
+        opts["return"]["other"]["termination"] = status
+    if stdout.progress:
+        opts["return"]["other"]["progress"] = dict(stdout.progress)
 
+    if stdout.error is not None:
+        raise stdout.error
     return opts
@@ -0,0 +1,289 @@
+##############################################################################
+# Institute for the Design of Advanced Energy Systems Process Systems
+# Engineering Framework (IDAES PSE Framework) Copyright (c) 2018-2020, by the
+# software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia
+# University Research Corporation, et al. All rights reserved.
+#
+# Please see the files COPYRIGHT.txt and LICENSE.txt for full copyright and
+# license information, respectively. Both files are also available online
+# at the URL "https://github.com/IDAES/idaes-pse".
+##############################################################################
+"""
+almfake.py
+A stand-in for the ALAMO executable, for testing without an ALAMO license.
+
+The fake reads an alm file, fits every output by least squares on all the
+candidate bases requested by its options (see almbasis), and writes a lst
+file in ALAMO's format with the chosen terms and quality metrics. It does no
+model selection, so its models are only as good as the requested bases.
+
+It can run in process, as an execution backend:
+    alamopy.doalamo(xdata, zdata, backend=almfake.FakeBackend(latency=0.5))
+or as a subprocess, through the default backend:
+    backend=almexec.BinaryBackend([sys.executable, "-m", "alamopy.almfake"])
+"""
+import sys
+import time
+
+import numpy as np
+
+from alamopy import almbasis
+from alamopy import almexec
+from alamopy import almsubset
+from alamopy import almutils
+
+version = "fake"
+
+# Width of the rules separating the sections of the lst file
+_rule = " " + "=" * 75 + "\n"
+
+
+class FakeBackend:
+    """
+    An execution backend running the fake ALAMO in process.
+
+    Args:
+        latency: Seconds each run waits before fitting, to emulate the
+                 running time of ALAMO. The wait honours the timeout and
+                 cancel options like a real ALAMO process.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def run(self, opts):
+        status = _wait(opts, self.latency)
+        if status is not None:
+            return _store(opts, "", status)
+        return _store(opts, fake_alamo(opts["alm_file_name"], opts["lst_file_name"]))
+
+    async def run_async(self, opts):
+        import asyncio
+
+        status = await _wait_async(opts, self.latency)
+        if status is not None:
+            return _store(opts, "", status)
+        loop = asyncio.get_running_loop()
+        stdout = await loop.run_in_executor(
+            None, fake_alamo, opts["alm_file_name"], opts["lst_file_name"]
+        )
+        return _store(opts, stdout)
+
+    def version(self):
+        return version
+
+
+def _wait(opts, latency):
+    """
+    Sleep for latency seconds, and return the termination status if the
+    timeout or the cancel handle of the run fire first.
+    """
+    waits = _waits(opts, latency)
+    try:
+        while True:
+            time.sleep(next(waits))
+    except StopIteration as stop:
+        return stop.value
+
+
+async def _wait_async(opts, latency):
+    """
+    Coroutine counterpart of _wait.
+    """
+    import asyncio
+
+    waits = _waits(opts, latency)
+    try:
+        while True:
+            await asyncio.sleep(next(waits))
+    except StopIteration as stop:
+        return stop.value
+
+
+def _waits(opts, latency):
+    """
+    Yield the successive sleeps of _wait, and return its termination status.
+    """
+    deadline = time.monotonic() + latency
+    timeout = opts.get("timeout")
+    stop = None if timeout is None else time.monotonic() + timeout
+    cancel = opts.get("cancel")
+    while True:
+        now = time.monotonic()
+        if cancel is not None and cancel.is_set():
+            return "cancelled"
+        if stop is not None and now >= stop and stop < deadline:
+            return "timeout"
+        if now >= deadline:
+            return None
+        wait = deadline - now
+        if stop is not None:
+            wait = min(wait, max(stop - now, 0.0))
+        if cancel is not None:
+            wait = min(wait, almexec.cancel_poll_interval)
+        yield wait
+
+
+def _store(opts, stdout, status=None):
+    out_monitor, err_monitor = almexec.make_monitors(opts)
+    for line in stdout.splitlines(True):
+        out_monitor.feed(line)
+    return almexec.store_output(opts, out_monitor, err_monitor, status)
+
+
+def fake_alamo(alm_file_name, lst_file_name):
+    """
+    Fit the problem of an alm file and write the lst file.
+    Returns:
+        The text ALAMO would print on stdout.
+    """
+    start = time.perf_counter()
+    settings, sections = read_alm_file(alm_file_name)
+    ninputs = int(settings["ninputs"][0])
+    noutputs = int(settings.get("noutputs", [1])[0])
+    xlabels = settings.get("xlabels") or ["X%d" % (j + 1) for j in range(ninputs)]
+    zlabels = settings.get("zlabels") or ["Z%d" % (k + 1) for k in range(noutputs)]
+    data = sections.get("data", np.empty((0, ninputs + noutputs)))
+    xdata, zdata = data[:, :ninputs], data[:, ninputs : ninputs + noutputs]
+
+    settings["custombas"] = sections.get("custombas")
+    sensmat, bases, _ = almbasis.basis_matrix(settings, xdata, xlabels)
+    # Bases undefined on the data are not considered
+    usable = np.all(np.isfinite(sensmat), axis=0)
+    sensmat = sensmat[:, usable]
+    bases = [basis for basis, keep in zip(bases, usable) if keep]
+    coeffs = np.linalg.lstsq(sensmat, zdata, rcond=None)[0].reshape(len(bases), -1)
+    fits = []
+    for k in range(noutputs):
+        chosen = np.flatnonzero(coeffs[:, k])
+        pred = sensmat[:, chosen] @ coeffs[chosen, k]
+        metrics = almsubset.quality_metrics(zdata[:, k], pred, len(chosen))
+        chosen_bases = [bases[i] for i in chosen]
+        fits.append((zlabels[k], chosen_bases, coeffs[chosen, k], metrics))
+
+    elapsed = time.perf_counter() - start
+    write_lst_file(lst_file_name, xlabels, zlabels, xdata, zdata, bases, fits, elapsed)
+    return format_stdout(xlabels, fits, elapsed)
+
+
+def read_alm_file(alm_file_name):
+    """
+    Parse an alm file.
+    Returns:
+        (settings, sections): the option lines as {lowercase name: [words]},
+        and the sections as {lowercase name: 2D array}, or lists of lines for
+        non-numeric sections.
+    """
+    settings = {}
+    sections = {}
+    with open(alm_file_name, "r") as alm_file:
+        for line in alm_file:
+            words = line.split()
+            if not words:
+                continue
+            name = words[0].lower()
+            if not name.startswith("begin_"):
+                settings[name] = words[1:]
+                continue
+            rows = []
+            for row in alm_file:
+                if row.strip().lower().startswith("end_"):
+                    break
+                rows.append(row)
+            try:
+                sections[name[len("begin_") :]] = np.loadtxt(rows, dtype=float, ndmin=2)
+            except ValueError:
+                sections[name[len("begin_") :]] = rows
+    return settings, sections
+
+
+def _label_row(label, column):
+    if len(column) == 0:
+        return " %s  0.0  0.0  F\n" % label
+    return " %s  %r  %r  F\n" % (label, float(column.min()), float(column.max()))
+
+
+def write_lst_file(
+    lst_file_name, xlabels, zlabels, xdata, zdata, bases, fits, elapsed
+):
+    """
+    Write a lst file in ALAMO's format, as parsed by almread.read_lst_file.
+    Args:
+        fits: One (zlabel, chosen bases, coefficients, metrics) per output.
+    """
+    with open(lst_file_name, "w") as lst_file:
+        lst_file.write(" ALAMO input summary\n")
+        lst_file.write(" NINPUTS        = %d\n" % len(xlabels))
+        lst_file.write(" NOUTPUTS       = %d\n" % len(zlabels))
+        lst_file.write(" NDATA          = %d\n" % len(xdata))
+        lst_file.write(_rule)
+        lst_file.write(" XLABELS    XMIN      XMAX      XISINT\n")
+        for label, column in zip(xlabels, xdata.T):
+            lst_file.write(_label_row(label, column))
+        lst_file.write(" ZLABELS    ZMIN      ZMAX      ZISINT\n")
+        for label, column in zip(zlabels, zdata.T):
+            lst_file.write(_label_row(label, column))
+        lst_file.write("\n XDATA and ZDATA\n")
+        np.savetxt(lst_file, np.hstack((xdata, zdata)), fmt="%.17g")
+        lst_file.write(_rule)
+        lst_file.write(" BASES considered\n")
+        for basis in bases:
+            lst_file.write(" %s\n" % almbasis.basis_label(basis, xlabels))
+        lst_file.write(_rule)
+        for zlabel, chosen, coeffs, metrics in fits:
+            lst_file.write("\n Quality metrics for output %s\n" % zlabel)
+            lst_file.write(" ----------------------------\n")
+            for name, value in metrics:
+                lst_file.write(" %-18s %r\n" % (name + ":", value))
+            lst_file.write("\n BETAS and BASES chosen for this output\n")
+            for basis, coeff in zip(chosen, coeffs):
+                lst_file.write(" %s\n" % almbasis.format_term(coeff, basis, xlabels))
+        lst_file.write("\n Total execution time %r s\n" % elapsed)
+        lst_file.write(" Times breakdown\n")
+        lst_file.write("     OLR time:        %r s\n" % elapsed)
+        lst_file.write("     CLR time:        0.0 s\n")
+        lst_file.write("     MIP time:        0.0 s\n")
+        lst_file.write("     Simulation time: 0.0 s\n")
+        lst_file.write("     All other time:  0.0 s\n")
+        lst_file.write("\n Normal termination\n")
+
+
+def format_stdout(xlabels, fits, elapsed):
+    """
+    Return the text ALAMO prints on stdout for the given fits.
+    """
+    lines = [
+        " ALAMO version %s" % version,
+        " Iteration 1 (Approx. elapsed time %r s)" % elapsed,
+        " Step 1: Model building using BIC",
+    ]
+    for zlabel, chosen, coeffs, metrics in fits:
+        terms = [
+            almbasis.format_term(coeff, basis, xlabels)
+            for basis, coeff in zip(chosen, coeffs)
+        ]
+        model = almutils.represent_model_str(terms)
+        lines.append(" Model building for variable %s" % zlabel)
+        lines.append(" BIC = %r with %s = %s" % (dict(metrics)["BIC"], zlabel, model))
+    lines.append(" Total execution time %r s" % elapsed)
+    lines.append(" Normal termination")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    """
+    Command line entry point: python -m alamopy.almfake [--latency S] file.alm
+    """
+    args = list(sys.argv[1:] if argv is None else argv)
+    latency = 0.0
+    if args[:1] == ["--latency"]:
+        latency = float(args[1])
+        args = args[2:]
+    time.sleep(latency)
+    sys.stdout.write(fake_alamo(args[0], almutils.alm2lst(args[0])))
+
+
+if __name__ == "__main__":
+    main()
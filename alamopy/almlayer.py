@@ -15,7 +15,8 @@ A layer that compassionates with the legacy IDAES interface.
 """
 
 from alamopy import almain
-from alamopy import almutils
+from alamopy import almexec
+from alamopy import almsubset
 
 
 def pre_process(xdata, zdata, **kwargs):
@@ -35,11 +36,15 @@ def pre_process(xdata, zdata, **kwargs):
         kwargs["keep_lst_file"] = kwargs["savescratch"] == 1
 
 
-def post_process(result):
+def post_process(result, backend=None):
     """
     Post-process the results and update result.
     """
-    result["version"] = almutils.get_alamo_version()
+    # No ALAMO is involved, nor maybe installed, with the in-process engine
+    if result["other"].get("engine") == "subset":
+        result["version"] = almsubset.version
+    else:
+        result["version"] = almexec.alamo_version({"backend": backend})
     if "XLABELS" in result["in"].keys():
         result["xlabels"] = result["in"]["XLABELS"]
     if "ZLABELS" in result["in"].keys():
@@ -53,8 +58,10 @@ def post_process(result):
         result["miptime"] = result["other"]["time"]["MIP"]
         result["othertime"] = result["other"]["time"]["other"]
         result["totaltime"] = result["other"]["time"]["total"]
-    if len(result["out"].keys()) > 0:
-        var_name = list(result["out"].keys())[0]
+    # result["out"] also holds the stdout and stderr of ALAMO
+    outputs = [name for name, value in result["out"].items() if isinstance(value, dict)]
+    if len(outputs) > 0:
+        var_name = outputs[0]
         var_dict = result["out"][var_name]
         result["R2"] = var_dict["R2"]
         result["f(model)"] = var_dict["model_fun"]
@@ -78,5 +85,19 @@ def alamo(xdata=None, zdata=None, **kwargs):
         kwargs["simulator"],
         **kwargs
     )
-    post_process(result)
+    post_process(result, kwargs.get("backend"))
+    return result
+
+
+async def alamo_async(xdata=None, zdata=None, **kwargs):
+    """
+    Coroutine counterpart of alamo(), built on almain.doalamo_async.
+    """
+    import asyncio
+
+    pre_process(xdata, zdata, **kwargs)
+    result = await almain.doalamo_async(xdata, zdata, **kwargs)
+    await asyncio.get_running_loop().run_in_executor(
+        None, post_process, result, kwargs.get("backend")
+    )
     return result
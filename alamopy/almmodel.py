@@ -0,0 +1,389 @@
+##############################################################################
+# Institute for the Design of Advanced Energy Systems Process Systems
+# Engineering Framework (IDAES PSE Framework) Copyright (c) 2018-2020, by the
+# software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia
+# University Research Corporation, et al. All rights reserved.
+#
+# Please see the files COPYRIGHT.txt and LICENSE.txt for full copyright and
+# license information, respectively. Both files are also available online
+# at the URL "https://github.com/IDAES/idaes-pse".
+##############################################################################
+"""
+almmodel.py
+Structured representation and vectorized evaluation of ALAMO models.
+
+A model is a coefficient vector and, for each term, a compact encoding of its
+basis function. A basis is a "monomial" tuple
+    (const, ((j, p), ...), ((func, monomial, power), ...))
+standing for const * prod_j x_j^p * prod func(monomial)^power, where j is the
+index of an input, ratios are negative powers, and func is one of exp, log,
+sin and cos. For example, with inputs [X1, X2]:
+    "X1^2"      -> (1.0, ((0, 2.0),), ())
+    "X1/X2"     -> (1.0, ((0, 1.0), (1, -1.0)), ())
+    "exp(X2)"   -> (1.0, (), (("exp", (1.0, ((1, 1.0),), ()), 1.0),))
+"""
+import re
+
+import numpy as np
+
+_functions = {"exp": np.exp, "log": np.log, "ln": np.log, "sin": np.sin, "cos": np.cos}
+
+_token_re = re.compile(
+    r"\s*(?:(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eEdD][+-]?\d+)?)"
+    r"|(?P<name>[A-Za-z_][A-Za-z0-9_]*)"
+    r"|(?P<op>\*\*|[*/^()+-]))"
+)
+
+class AlmModel:
+    """
+    A model chosen by ALAMO for one output, evaluated with NumPy only.
+
+    Args:
+        xlabels: The input labels, in the order of the columns of the data.
+        coeffs: The coefficient of each term.
+        bases: The basis of each term, as a monomial tuple (see module doc).
+
+    The model can be called like the lambdified model function,
+    model(x1, x2, ...), or evaluated on an (n, ninputs) array with predict.
+    Unlike the lambdified function it is cheap to build and can be pickled.
+    """
+
+    def __init__(self, xlabels, coeffs, bases):
+        self.xlabels = list(xlabels)
+        self.coeffs = np.asarray(coeffs, dtype=float)
+        self.bases = list(bases)
+
+    @classmethod
+    def from_terms(cls, term_list, xlabels):
+        """
+        Build a model from the lines of the "BETAS and BASES chosen for this
+        output" block of a lst file, e.g. ["1.0 X1^2", "-0.5 X1 X2", "2.0"].
+        Raises ValueError if a term cannot be represented.
+        """
+        return cls._from_term_strings(term_list, xlabels)
+
+    @classmethod
+    def from_model_str(cls, model_str, xlabels):
+        """
+        Build a model from a model string as produced by
+        almutils.represent_model_str, optionally preceded by "z = ".
+        Raises ValueError if a term cannot be represented.
+        """
+        if "=" in model_str:
+            model_str = model_str.split("=")[1]
+        return cls._from_term_strings(split_terms(model_str), xlabels)
+
+    @classmethod
+    def _from_term_strings(cls, term_list, xlabels):
+        index = {label: j for j, label in enumerate(xlabels)}
+        coeffs = []
+        bases = []
+        for term in term_list:
+            const, exps, funcs = parse_basis(term, index)
+            coeffs.append(const)
+            bases.append((1.0, exps, funcs))
+        return cls(xlabels, coeffs, bases)
+
+    @property
+    def nterms(self):
+        return len(self.bases)
+
+    @property
+    def labels(self):
+        """
+        The label of the basis of each term, e.g. "X1^2" or "1" for the
+        constant.
+        """
+        return [format_basis(basis, self.xlabels) for basis in self.bases]
+
+    def basis(self, xdata, cache=None):
+        """
+        Evaluate the basis of every term.
+        Args:
+            xdata: An (n, ninputs) array, or a 1D array for a single point.
+            cache: An optional dictionary reused across calls on the same
+                xdata, so that bases, powers and functions shared between
+                terms (or models) are evaluated only once.
+        Returns:
+            An (n, nterms) array, i.e. the sensitivity matrix of the model
+            with respect to its coefficients.
+        """
+        inputs = input_columns(xdata)
+        if cache is None:
+            cache = {}
+        columns = np.empty((inputs.shape[1], self.nterms))
+        for k, basis in enumerate(self.bases):
+            column = cache.get(basis)
+            if column is None:
+                column = evaluate_basis(basis, inputs, cache)
+                cache[basis] = column
+            columns[:, k] = column
+        return columns
+
+    def predict(self, xdata, chunk_size=2**14):
+        """
+        Evaluate the model on an (n, ninputs) array, in chunks of rows small
+        enough for the intermediate columns to stay in cache.
+        Returns:
+            An array of n predictions.
+        """
+        xdata = np.asarray(xdata, dtype=float)
+        if xdata.ndim == 1:
+            xdata = xdata.reshape(1, -1)
+        out = np.empty(xdata.shape[0])
+        for start in range(0, xdata.shape[0], chunk_size):
+            inputs = input_columns(xdata[start : start + chunk_size])
+            cache = {}
+            chunk_out = np.zeros(inputs.shape[1])
+            for coeff, basis in zip(self.coeffs, self.bases):
+                if basis[1] or basis[2]:
+                    chunk_out += coeff * evaluate_basis(basis, inputs, cache)
+                else:
+                    chunk_out += coeff * basis[0]
+            out[start : start + chunk_size] = chunk_out
+        return out
+
+    def __call__(self, *args):
+        arrays = np.broadcast_arrays(*[np.asarray(arg, dtype=float) for arg in args])
+        shape = arrays[0].shape if arrays else ()
+        xdata = np.column_stack([arr.ravel() for arr in arrays]) if arrays else []
+        out = self.predict(np.reshape(xdata, (-1, len(self.xlabels))))
+        if shape == ():
+            return float(out[0])
+        return out.reshape(shape)
+
+    def __repr__(self):
+        return "AlmModel(%r, %r, %r)" % (self.xlabels, self.coeffs.tolist(), self.bases)
+
+
+def split_terms(model_str):
+    """
+    Split a model string like " - 0.5 * X1 * X2 + exp(X1)" into signed terms,
+    e.g. ["-0.5 * X1 * X2", "exp(X1)"]. Signs inside parentheses or exponents
+    are left alone, since terms are separated by " + " and " - ".
+    """
+    terms = []
+    depth = 0
+    start = 0
+    sign = ""
+    for i, char in enumerate(model_str):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif (
+            depth == 0
+            and char in "+-"
+            and model_str[i - 1 : i] in ("", " ")
+            and model_str[i + 1 : i + 2] in ("", " ")
+        ):
+            if model_str[start:i].strip():
+                terms.append(sign + model_str[start:i].strip())
+            sign = "-" if char == "-" else ""
+            start = i + 1
+    if model_str[start:].strip():
+        terms.append(sign + model_str[start:].strip())
+    return terms
+
+
+def parse_basis(term, index):
+    """
+    Parse a single term, e.g. "-0.5 X1 X2", "2.0 * exp(X1)" or "X1^2/X2",
+    into a monomial tuple (see module doc). Whitespace between factors means
+    multiplication.
+    Args:
+        term: The term string.
+        index: A dictionary mapping input labels to column indices.
+    Raises:
+        ValueError if the term is not a product of powers of inputs, numbers
+        and exp/log/sin/cos of such products.
+    """
+    tokens = _tokenize(term)
+    pos, mono = _parse_product(tokens, 0, index)
+    if pos != len(tokens):
+        raise ValueError("Cannot parse term %r" % term)
+    return mono
+
+
+def _tokenize(term):
+    tokens = []
+    pos = 0
+    term = term.strip()
+    while pos < len(term):
+        match = _token_re.match(term, pos)
+        if match is None or match.end() == pos:
+            raise ValueError("Cannot parse term %r" % term)
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "number":
+            value = float(value.replace("d", "e").replace("D", "e"))
+        tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+
+def _parse_product(tokens, pos, index):
+    """
+    product := ["-"] power (("*" | "/" | implicit) power)*
+    """
+    sign = 1.0
+    if pos < len(tokens) and tokens[pos] == ("op", "-"):
+        sign = -1.0
+        pos += 1
+    pos, mono = _parse_power(tokens, pos, index)
+    while pos < len(tokens):
+        kind, value = tokens[pos]
+        if kind == "op" and value in ("*", "/"):
+            pos, factor = _parse_power(tokens, pos + 1, index)
+            if value == "/":
+                factor = _raise(factor, -1.0)
+        elif kind in ("number", "name") or value == "(":
+            pos, factor = _parse_power(tokens, pos, index)
+        else:
+            break
+        mono = _multiply(mono, factor)
+    return pos, _multiply((sign, (), ()), mono)
+
+
+def _parse_power(tokens, pos, index):
+    """
+    power := atom (("^" | "**") exponent)?
+    """
+    pos, mono = _parse_atom(tokens, pos, index)
+    if pos < len(tokens) and tokens[pos] in (("op", "^"), ("op", "**")):
+        pos, exponent = _parse_exponent(tokens, pos + 1, index)
+        mono = _raise(mono, exponent)
+    return pos, mono
+
+
+def _parse_exponent(tokens, pos, index):
+    """
+    exponent := ["-"] number | "(" product ")" evaluating to a number
+    """
+    sign = 1.0
+    if pos < len(tokens) and tokens[pos] in (("op", "-"), ("op", "+")):
+        sign = -1.0 if tokens[pos][1] == "-" else 1.0
+        pos += 1
+    pos, mono = _parse_atom(tokens, pos, index)
+    if mono[1] or mono[2]:
+        raise ValueError("Exponents must be numbers")
+    return pos, sign * mono[0]
+
+
+def _parse_atom(tokens, pos, index):
+    """
+    atom := number | label | func "(" product ")" | "(" product ")"
+    """
+    if pos >= len(tokens):
+        raise ValueError("Unexpected end of term")
+    kind, value = tokens[pos]
+    if kind == "number":
+        return pos + 1, (value, (), ())
+    if kind == "name" and value in index:
+        return pos + 1, (1.0, ((index[value], 1.0),), ())
+    if kind == "name" and value in _functions and tokens[pos + 1 : pos + 2] == [("op", "(")]:
+        pos, arg = _parse_product(tokens, pos + 2, index)
+        pos = _expect(tokens, pos, ")")
+        return pos, (1.0, (), (("log" if value == "ln" else value, arg, 1.0),))
+    if (kind, value) == ("op", "("):
+        pos, mono = _parse_product(tokens, pos + 1, index)
+        return _expect(tokens, pos, ")"), mono
+    raise ValueError("Unexpected token %r" % (value,))
+
+
+def _expect(tokens, pos, op):
+    if tokens[pos : pos + 1] != [("op", op)]:
+        raise ValueError("Expected %r" % op)
+    return pos + 1
+
+
+def _multiply(mono_a, mono_b):
+    """
+    Product of two monomial tuples, merging the powers of equal inputs and
+    functions.
+    """
+    exps = dict(mono_a[1])
+    for j, p in mono_b[1]:
+        exps[j] = exps.get(j, 0.0) + p
+    funcs = {}
+    for name, arg, power in mono_a[2] + mono_b[2]:
+        funcs[(name, arg)] = funcs.get((name, arg), 0.0) + power
+    return (
+        mono_a[0] * mono_b[0],
+        tuple(sorted((j, p) for j, p in exps.items() if p != 0.0)),
+        tuple(sorted((name, arg, p) for (name, arg), p in funcs.items() if p != 0.0)),
+    )
+
+
+def _raise(mono, exponent):
+    """
+    A monomial tuple raised to a numeric power.
+    """
+    const, exps, funcs = mono
+    return (
+        const**exponent,
+        tuple((j, p * exponent) for j, p in exps),
+        tuple((name, arg, p * exponent) for name, arg, p in funcs),
+    )
+
+
+def input_columns(xdata):
+    """
+    Return the inputs of an (n, ninputs) array (or a single 1D point) as a
+    C-contiguous (ninputs, n) array, so that each input is a contiguous row.
+    """
+    xdata = np.asarray(xdata, dtype=float)
+    if xdata.ndim == 1:
+        xdata = xdata.reshape(1, -1)
+    return np.ascontiguousarray(xdata.T)
+
+
+def evaluate_basis(mono, inputs, cache):
+    """
+    Evaluate a monomial tuple on the (ninputs, n) array returned by
+    input_columns. Powers of inputs and function values are memoized in cache,
+    keyed by their encoding.
+    """
+    const, exps, funcs = mono
+    column = None
+    for j, p in exps:
+        factor = cache.get((j, p))
+        if factor is None:
+            factor = inputs[j] if p == 1.0 else inputs[j] ** p
+            cache[(j, p)] = factor
+        column = factor if column is None else column * factor
+    for name, arg, power in funcs:
+        factor = cache.get((name, arg, power))
+        if factor is None:
+            factor = cache.get((name, arg, 1.0))
+            if factor is None:
+                factor = _functions[name](evaluate_basis(arg, inputs, cache))
+                cache[(name, arg, 1.0)] = factor
+            if power != 1.0:
+                factor = factor**power
+                cache[(name, arg, power)] = factor
+        column = factor if column is None else column * factor
+    if column is None:
+        return np.full(inputs.shape[1], const)
+    return column * const if const != 1.0 else column
+
+
+def format_basis(mono, xlabels):
+    """
+    Format a monomial tuple in ALAMO's term syntax, e.g. "X1^2 * exp(X2)".
+    The empty product (the constant basis) is formatted as "1".
+    """
+    const, exps, funcs = mono
+    factors = [] if const == 1.0 else [_format_number(const)]
+    for j, p in exps:
+        factors.append(xlabels[j] + ("" if p == 1.0 else "^" + _format_number(p)))
+    for name, arg, power in funcs:
+        factor = name + "(" + format_basis(arg, xlabels) + ")"
+        factors.append(factor + ("" if power == 1.0 else "^" + _format_number(power)))
+    return " * ".join(factors) if factors else "1"
+
+
+def _format_number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
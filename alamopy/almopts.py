@@ -30,6 +30,10 @@ To add a new user option to ALAMO:
         alm_file_name cannot exceed 1000 characters, add that check in
         validate_opts.
 """
+import numpy as np
+
+from alamopy import almsample
+from alamopy import almscreen
 from alamopy import almutils
 
 def prepare_default_opts():
@@ -48,6 +52,52 @@ def prepare_default_opts():
     default_opts["keep_alm_file"] = False
     default_opts["keep_lst_file"] = False
     default_opts["print_alm_output"] = False
+    default_opts["workspace"] = None
+    # None, True (process-wide memory cache) or an almcache.AlmCache; cached
+    # runs write files even with a named pipe workspace pool, since the cache
+    # hashes the alm file and stores the lst file
+    default_opts["cache"] = None
+    # None, True (process-wide pool) or an almworkspace.WorkspacePool
+    default_opts["workspace_pool"] = None
+    # Wall-clock limit in seconds of the ALAMO process, and cancel handle (any
+    # object with an is_set() method, e.g. a threading.Event)
+    default_opts["timeout"] = None
+    default_opts["cancel"] = None
+    # Called with a dictionary of progress fields (iteration, output, metric,
+    # value, nterms) while ALAMO runs, see almexec.OutputMonitor
+    default_opts["progress_callback"] = None
+    # Number of lines of ALAMO stdout and stderr retained, None to keep all
+    default_opts["max_output_lines"] = None
+    # None, True or an almprofile.Profile recording the time and memory of
+    # every phase into result["other"]["profile"]
+    default_opts["profile"] = None
+    # None (almexec.BinaryBackend) or an execution backend running ALAMO, e.g.
+    # almfake.FakeBackend
+    default_opts["backend"] = None
+    # None to run ALAMO, or "subset" to fit in process with the subset
+    # selection engine of almsubset
+    default_opts["engine"] = None
+    # None, True or the name of an almscreen method pruning the inputs and
+    # bases before the fit, the relative score below which they are pruned,
+    # and the maximum number of inputs kept
+    default_opts["screen"] = None
+    default_opts["screen_threshold"] = None
+    default_opts["screen_max_inputs"] = None
+    # Maximum number of data points fitted, the almsample method selecting
+    # them, and what becomes of the others: "valdata" or "score" (see
+    # almsample.subsample); the points held out for scoring are kept in
+    # holdout
+    default_opts["max_fit_points"] = None
+    default_opts["fit_sampling"] = None
+    default_opts["fit_holdout"] = None
+    default_opts["holdout"] = None
+    # printf-style format and block size of the streamed numeric sections,
+    # None for the defaults of almwrite.write_numeric_section
+    default_opts["float_format"] = None
+    default_opts["write_block_rows"] = None
+    # Skip parsing the XDATA/ZDATA echo of the lst file, e.g. when the caller
+    # already holds the data
+    default_opts["skip_data_echo"] = None
 
     # ALAMO opts
     # Contains options both necessary and optional that client can execute
@@ -180,27 +230,30 @@ def complete_opts(opts):
 
     # User passes in x and z data arrays
     if opts["xdata"] is not None and opts["zdata"] is not None:
-        # Make xdata and zdata 2D
-        opts["zdata"] = almutils.vector_2d(opts["zdata"])
-        opts["xdata"] = almutils.vector_2d(opts["xdata"])
+        # Make xdata and zdata 2D arrays
+        opts["zdata"] = almutils.array_2d(opts["zdata"])
+        opts["xdata"] = almutils.array_2d(opts["xdata"])
         # Infer ninputs from xdata
         if opts["ninputs"] is None:
             opts["ninputs"] = almutils.datadim(opts["xdata"])
         # Infer noutputs from zdata
         if opts["noutputs"] is None:
             opts["noutputs"] = almutils.datadim(opts["zdata"])
-        # Infer ndata from xdata
-        if opts["ndata"] is None:
-            opts["ndata"] = len(opts["xdata"])
         # Infer xmin from xdata
         if opts["xmin"] is None:
             opts["xmin"] = almutils.data2min(opts["xdata"])
         # Infer xmax from xdata
         if opts["xmax"] is None:
             opts["xmax"] = almutils.data2max(opts["xdata"])
+        # Keep a representative subset of large data sets, once the input
+        # bounds cover all the data
+        almsample.subsample(opts)
+        # Infer ndata from xdata
+        if opts["ndata"] is None:
+            opts["ndata"] = len(opts["xdata"])
         # Make data array from xdata and zdata
         if opts["data"] is None:
-            opts["data"] = almutils.zip_2d_lists(opts["xdata"], opts["zdata"])
+            opts["data"] = np.hstack((opts["xdata"], opts["zdata"]))
 
     # User passes in simulator, xmin, xmax, and noutputs
     if (
@@ -241,6 +294,24 @@ def validate_opts(opts):
                            and simulator)."
         )
 
+    # The in-process engine fits the given data only
+    if opts["engine"] not in (None, "subset"):
+        raise RuntimeError("Unknown engine %r." % (opts["engine"],))
+    if opts["engine"] == "subset" and not case_1:
+        raise RuntimeError("The subset engine needs xdata and zdata.")
+
+    # Screening methods are those of almscreen
+    if opts["screen"] not in (None, False, True) + tuple(almscreen.screen_methods):
+        raise RuntimeError("Unknown screening method %r." % (opts["screen"],))
+
+    # Subsampling methods and holdout modes are those of almsample
+    if opts["max_fit_points"] is not None and opts["max_fit_points"] < 1:
+        raise RuntimeError("max_fit_points must be at least 1.")
+    if opts["fit_sampling"] not in (None,) + tuple(almsample.sample_methods):
+        raise RuntimeError("Unknown sampling method %r." % (opts["fit_sampling"],))
+    if opts["fit_holdout"] not in (None,) + tuple(almsample.holdout_modes):
+        raise RuntimeError("Unknown holdout mode %r." % (opts["fit_holdout"],))
+
     # File path and name should not exceed 1000 characters in length
     if len(opts["alm_file_name"]) > 1000:
         raise RuntimeError("File name should not exceed 1000 " "characters in length.")
@@ -12,51 +12,231 @@
 ##############################################################################
 """
 Plot doalamo output including confidence intervals if they are calculated.
-    Args:
-        res: A dictionary that contains the results from the ALAMO running
-        show: defaulted to be true, unless indicated as false so plots are NOT SHOWN
+
+The model is evaluated vectorized through its basis (see almconfidence), so
+any fitted model can be plotted. Three kinds of plots are available:
+    "slice": one 1-D slice per input through the center of the data, with
+             the confidence band of the model if a covariance is available.
+    "parity": predicted against measured outputs.
+    "residual": residuals against predicted outputs.
+Data sets larger than max_points are decimated before rendering.
 """
+import numpy as np
+
+from alamopy import almconfidence
+from alamopy import almutils
 
 
-def almplot(res, show=True):
+def almplot(
+    res,
+    show=True,
+    xdata=None,
+    zdata=None,
+    kind="slice",
+    output=None,
+    npoints=100,
+    max_points=5000,
+    confidence=0.95,
+):
+    """
+    Plot doalamo output including confidence intervals if they are calculated.
+    Args:
+        res: A dictionary that contains the results from the ALAMO running,
+             either from doalamo or from the legacy alamo interface (with
+             almconfidence results if available).
+        show: defaulted to be true, unless indicated as false so plots are NOT SHOWN
+        xdata: The (ndata, ninputs) input data, overlaid on the plots and
+               required for the parity and residual plots.
+        zdata: The measured outputs matching xdata.
+        kind: "slice", "parity" or "residual".
+        output: The name of the output to plot, by default the first one.
+        npoints: The number of grid points of each 1-D slice.
+        max_points: The maximum number of data points rendered.
+        confidence: The two-sided confidence level of the bands.
+    Returns:
+        The matplotlib figure.
+    """
     try:
         import matplotlib.pyplot as plt
-        import numpy as np
-
-        #  from alamopy.writethis import writethis
-    except Exception:
+    except ImportError:
         print("Cannot plot, possibly missing matplotlib package")
+        return None
+
+    model_str, xlabels, covar = model_output(res, output)
+    if xdata is not None:
+        xdata = almutils.array_2d(xdata).reshape(-1, len(xlabels))
+        if zdata is not None:
+            zdata = almutils.array_2d(zdata).reshape(len(xdata), -1)
+            zdata = zdata[:, _output_column(res, output)]
+
+    if kind == "slice":
+        lower, upper, center = data_ranges(res, xdata)
+        quantile = band_quantile(res, confidence) if covar is not None else None
+        fig, axes = plt.subplots(1, len(xlabels), squeeze=False)
+        for j, axis in enumerate(axes[0]):
+            grid = slice_grid(center, lower, upper, j, npoints)
+            pred, band = evaluate_with_band(model_str, xlabels, grid, covar, quantile)
+            axis.plot(grid[:, j], pred, "b-")
+            if band is not None:
+                axis.fill_between(
+                    grid[:, j], pred - band, pred + band, color="r", alpha=0.2
+                )
+            if xdata is not None and zdata is not None:
+                index = decimate_points(xdata[:, j], zdata, max_points)
+                axis.plot(xdata[index, j], zdata[index], "k.", markersize=2)
+            axis.set_xlabel(xlabels[j])
+    elif kind in ("parity", "residual"):
+        if xdata is None or zdata is None:
+            raise ValueError("xdata and zdata are needed for a %s plot" % kind)
+        pred, _ = evaluate_with_band(model_str, xlabels, xdata)
+        fig, axis = plt.subplots()
+        if kind == "parity":
+            index = decimate_points(zdata, pred, max_points)
+            axis.plot(zdata[index], pred[index], "b.", markersize=2)
+            limits = [min(zdata.min(), pred.min()), max(zdata.max(), pred.max())]
+            axis.plot(limits, limits, "k--")
+            axis.set_xlabel("measured")
+            axis.set_ylabel("predicted")
+        else:
+            residual = zdata - pred
+            index = decimate_points(pred, residual, max_points)
+            axis.plot(pred[index], residual[index], "b.", markersize=2)
+            axis.axhline(0.0, color="k", linestyle="--")
+            axis.set_xlabel("predicted")
+            axis.set_ylabel("residual")
+    else:
+        raise ValueError("Unknown plot kind: %s" % kind)
 
-    model = res["model"].replace(" - ", " + -")
-    model = model.split("=")[1]
-    model = model.split(" + ")
-    if model[0] == " ":  # if there are more than one terms, the first split is ' '
-        model = model[1:]
-    ndp = 100
-    t = np.linspace(0.08, 1.7, ndp)
-    out = np.zeros([3, ndp])
-    clo = np.zeros(ndp)
-    chi = np.zeros(ndp)
-    coeff = np.zeros(ndp)
-
-    for i in range(len(model)):
-        coeff[i] = float(model[i].split(" * ")[0])
-        if "conf_inv" in res.keys():
-            clo[i] = coeff[i] - float(res["conf_inv"][i].split("+/-")[1])
-            chi[i] = coeff[i] + float(res["conf_inv"][i].split("+/-")[1])
-
-    for i in range(ndp):
-        out[0, i] = (
-            float(coeff[0]) * t[i] ** 1.2
-            - float(coeff[1]) * t[i] ** 2
-            - float(coeff[2])
-        )
-        if "conf_inv" in res.keys():  # If confidence intervals exist
-            out[1, i] = clo[0] * t[i] ** 1.2 - chi[1] * t[i] ** 2 - chi[2]
-            out[2, i] = chi[0] * t[i] ** 1.2 - clo[1] * t[i] ** 2 - clo[2]
-
-    plt.plot(t, out[0], "b-")
-    if "conf_inv" in res.keys():
-        plt.plot(t, out[1], "r--", t, out[2], "r--")
     if show:
         plt.show()
+    return fig
+
+
+def model_output(res, output=None):
+    """
+    Return (model_str, xlabels, covar) of an output of res, where covar is
+    None if no covariance matrix was computed for it.
+    """
+    if "out" in res and res["out"]:
+        if output is None:
+            output = _output_labels(res)[0]
+        model_str = output + " = " + res["out"][output]["model_str"]
+        xlabels = res["in"]["XLABELS"]
+    else:
+        model_str = res["model"]
+        if isinstance(model_str, dict):
+            if output is None:
+                output = list(model_str.keys())[0]
+            model_str = model_str[output]
+        xlabels = res["xlabels"]
+
+    covar = res.get("covariance")
+    if isinstance(covar, dict):
+        covar = covar.get(output)
+    return model_str, list(xlabels), covar
+
+
+def _output_column(res, output):
+    if output is None:
+        return 0
+    if "out" in res and res["out"]:
+        return _output_labels(res).index(output)
+    if isinstance(res.get("model"), dict):
+        return list(res["model"].keys()).index(output)
+    return 0
+
+
+def _output_labels(res):
+    # The outputs of a doalamo result, in the order of the zdata columns;
+    # res["out"] also holds the stdout and stderr of ALAMO
+    zlabels = res.get("in", {}).get("ZLABELS")
+    if zlabels:
+        return [zlabels] if isinstance(zlabels, str) else list(zlabels)
+    return [key for key, value in res["out"].items() if isinstance(value, dict)]
+
+
+def data_ranges(res, xdata=None):
+    """
+    Return the (lower, upper, center) input arrays of the slices: the range
+    of xdata if given, otherwise XMIN and XMAX from the lst file.
+    """
+    if xdata is not None:
+        lower, upper = xdata.min(axis=0), xdata.max(axis=0)
+        return lower, upper, np.median(xdata, axis=0)
+    if "in" in res and "XMIN" in res["in"] and "XMAX" in res["in"]:
+        lower = np.asarray(res["in"]["XMIN"], dtype=float)
+        upper = np.asarray(res["in"]["XMAX"], dtype=float)
+        return lower, upper, (lower + upper) / 2
+    raise ValueError("xdata is needed to know the range of the inputs")
+
+
+def slice_grid(center, lower, upper, j, npoints=100):
+    """
+    Return an (npoints, ninputs) grid where input j spans [lower, upper] and
+    the other inputs are fixed at center.
+    """
+    grid = np.tile(np.asarray(center, dtype=float), (npoints, 1))
+    grid[:, j] = np.linspace(lower[j], upper[j], npoints)
+    return grid
+
+
+def evaluate_with_band(model_str, xlabels, points, covar=None, quantile=None):
+    """
+    Evaluate a model at points, with the half-width of its confidence band.
+    Args:
+        model_str: A model string "z = c1 * b1 + c2 * b2 ...".
+        xlabels: The input labels of the model.
+        points: An (n, ninputs) array.
+        covar: The covariance matrix of the coefficients, or None.
+        quantile: The quantile of the band, see band_quantile.
+    Returns:
+        (pred, band), band being None without a covariance matrix.
+    """
+    coeffs, sensmat = almconfidence.sensitivity_matrix(model_str, xlabels, points)
+    pred = sensmat @ coeffs
+    if covar is None:
+        return pred, None
+    # diag(S C S^T) without forming the n x n matrix
+    variance = np.einsum("ij,ij->i", sensmat @ np.asarray(covar), sensmat)
+    return pred, quantile * np.sqrt(np.maximum(variance, 0.0))
+
+
+def band_quantile(res, confidence=0.95):
+    """
+    Return the quantile of the confidence bands: from the t distribution if
+    the number of data points is known, otherwise from the normal one.
+    """
+    from scipy.stats import norm, t
+
+    ndata = res.get("in", {}).get("NDATA")
+    covar = res.get("covariance")
+    if ndata is not None and covar is not None and not isinstance(covar, dict):
+        return t.ppf(1 - (1 - confidence) / 2, ndata - np.shape(covar)[0])
+    return norm.ppf(1 - (1 - confidence) / 2)
+
+
+def decimate_points(x, y, max_points=5000):
+    """
+    Return the indices of at most about max_points points of the scatter
+    (x, y) that preserve its shape: the plane is binned into a grid of
+    max_points cells and one point of every occupied cell is kept, along
+    with the extremes, so outliers and the envelope of the data survive the
+    decimation.
+    """
+    x = np.asarray(x, dtype=float).ravel()
+    y = np.asarray(y, dtype=float).ravel()
+    if len(x) <= max_points:
+        return np.arange(len(x))
+    nbins = max(int(np.sqrt(max_points)), 1)
+    cells = _bin_index(x, nbins) * nbins + _bin_index(y, nbins)
+    _, index = np.unique(cells, return_index=True)
+    extremes = [x.argmin(), x.argmax(), y.argmin(), y.argmax()]
+    return np.union1d(index, extremes)
+
+
+def _bin_index(values, nbins):
+    low, high = values.min(), values.max()
+    if high <= low:
+        return np.zeros(len(values), dtype=np.int64)
+    index = ((values - low) * (nbins / (high - low))).astype(np.int64)
+    return np.minimum(index, nbins - 1)
@@ -0,0 +1,162 @@
+##############################################################################
+# Institute for the Design of Advanced Energy Systems Process Systems
+# Engineering Framework (IDAES PSE Framework) Copyright (c) 2018-2020, by the
+# software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia
+# University Research Corporation, et al. All rights reserved.
+#
+# Please see the files COPYRIGHT.txt and LICENSE.txt for full copyright and
+# license information, respectively. Both files are also available online
+# at the URL "https://github.com/IDAES/idaes-pse".
+##############################################################################
+"""
+almprofile.py
+Per-phase timing and memory instrumentation of ALAMO fits.
+
+Profiling is opt-in through the "profile" option:
+    profile=True records every phase of doalamo into
+        result["other"]["profile"].
+    profile=Profile(memory=..., hook=...) does the same with the given
+        settings, and can be reused to time further steps, e.g.
+            with profile.span("almconfidence"):
+                almconfidence.almconfidence(data)
+"""
+import contextlib
+import threading
+import time
+
+# Number of open profiles tracing memory, and whether they started tracemalloc
+# (which they then stop once the last of them is closed)
+_tracing_profiles = 0
+_started_tracing = False
+_tracing_lock = threading.Lock()
+
+
+class Profile:
+    """
+    Records the wall time and the peak Python memory of named phases.
+
+    Every phase is aggregated under its name in the records dictionary as
+    {"calls": n, "wall": seconds, "peak_bytes": bytes}, peak_bytes being the
+    largest growth of the memory traced by tracemalloc during one call.
+
+    Args:
+        memory: Trace the peak memory of every phase with tracemalloc, which
+                slows down allocation-heavy code. tracemalloc is process-wide,
+                so peaks overlap for concurrent fits. It is started by the
+                first profile tracing memory, unless already tracing, and
+                stopped when the last of them is closed.
+        hook: Called as hook(name, span) at the end of every phase, where
+              span is {"start": epoch seconds, "wall": seconds,
+              "peak_bytes": bytes or None}, e.g. to forward the phases to
+              a tracing system.
+    """
+
+    def __init__(self, memory=True, hook=None):
+        self.memory = memory
+        self.hook = hook
+        self.records = {}
+        self._open_peaks = []
+        self._tracing = False
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """
+        Context manager recording one call of the phase name.
+        """
+        tracemalloc = self._tracemalloc()
+        if tracemalloc is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            # Keep the peak of the enclosing phases before resetting it
+            self._open_peaks = [max(p, peak) for p in self._open_peaks]
+            tracemalloc.reset_peak()
+            self._open_peaks.append(current)
+            base = current
+        start_epoch = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            peak_bytes = None
+            if tracemalloc is not None:
+                peak = max(tracemalloc.get_traced_memory()[1], self._open_peaks.pop())
+                peak_bytes = max(peak - base, 0)
+                self._open_peaks = [max(p, peak) for p in self._open_peaks]
+            self._record(name, start_epoch, wall, peak_bytes)
+
+    def close(self):
+        """
+        Stop tracing memory for this profile: tracemalloc is stopped if the
+        profiles started it and no other profile tracing memory is open.
+        """
+        global _tracing_profiles, _started_tracing
+        if not self._tracing:
+            return
+        import tracemalloc
+
+        with _tracing_lock:
+            self._tracing = False
+            _tracing_profiles -= 1
+            if _tracing_profiles == 0 and _started_tracing:
+                tracemalloc.stop()
+                _started_tracing = False
+
+    def _tracemalloc(self):
+        global _tracing_profiles, _started_tracing
+        if not self.memory:
+            return None
+        import tracemalloc
+
+        if not self._tracing:
+            with _tracing_lock:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _started_tracing = True
+                _tracing_profiles += 1
+                self._tracing = True
+        return tracemalloc
+
+    def _record(self, name, start_epoch, wall, peak_bytes):
+        record = self.records.setdefault(
+            name, {"calls": 0, "wall": 0.0, "peak_bytes": None}
+        )
+        record["calls"] += 1
+        record["wall"] += wall
+        if peak_bytes is not None:
+            record["peak_bytes"] = max(record["peak_bytes"] or 0, peak_bytes)
+        if self.hook is not None:
+            self.hook(
+                name, {"start": start_epoch, "wall": wall, "peak_bytes": peak_bytes}
+            )
+
+    def __getstate__(self):
+        # Profiles are returned from doalamo_batch workers without their hook
+        state = self.__dict__.copy()
+        state["hook"] = None
+        state["_open_peaks"] = []
+        state["_tracing"] = False
+        return state
+
+
+def get_profile(option):
+    """
+    Resolve the value of the "profile" option to a Profile or None.
+    """
+    if option is None or option is False:
+        return None
+    if option is True:
+        return Profile()
+    return option
+
+
+def span(opts, name):
+    """
+    Return a context manager recording the phase name into the profile of
+    opts, or doing nothing if the run is not profiled.
+    """
+    profile = opts.get("profile")
+    if isinstance(profile, Profile):
+        return profile.span(name)
+    return contextlib.nullcontext()
@@ -14,8 +14,10 @@
 almread.py
 Parse a .lst file generated by ALAMO.
 """
-from sympy.parsing import parse_expr
-from sympy import symbols, lambdify
+import numpy as np
+
+from alamopy import almmodel
+from alamopy import almprofile
 from alamopy import almutils
 
 
@@ -28,122 +30,298 @@ def read_lst_file(opts):
     """
     # Quick error checking to make sure file exists
     try:
-        with open(opts["lst_file_name"], "r") as lst_file:
-            lines = [line.strip() for line in lst_file]
+        lst_file = open(opts["lst_file_name"], "r")
     except FileNotFoundError:
         return
 
-    # Reading "in" part
-    # Reading listed options
-    i, curr = almutils.nets(lines, 0, lambda s: "=" in s)
+    with lst_file:
+        in_dict = {}
+        sections = iter_lst_sections(lst_file, opts.get("skip_data_echo"))
+        for section, value in sections:
+            if section in ("options", "labels"):
+                in_dict.update(value)
+            elif section == "data":
+                entry_name, entry_list = value
+                in_dict[entry_name] = entry_list
+            elif section == "bases":
+                # Storing "in" part results into return dict
+                in_dict["bases"] = value
+                opts["return"]["in"] = in_dict
+            elif section == "output":
+                z_name, this_dict = value
+                terms = this_dict.pop("terms")
+                this_dict["model_str"] = almutils.represent_model_str(terms)
+                with almprofile.span(opts, "build_model"):
+                    try:
+                        this_dict["model_fun"] = almmodel.AlmModel.from_terms(
+                            terms, in_dict["XLABELS"]
+                        )
+                    except ValueError:
+                        this_dict["model_fun"] = lambdify_model_str(
+                            this_dict["model_str"], in_dict["XLABELS"]
+                        )
+                # Storing this z variable into return dict
+                opts["return"]["out"][z_name] = this_dict
+            elif section == "time":
+                # Storing "time" part results into return dict
+                opts["return"]["other"]["time"] = value
+
+
+def iter_lst_sections(lines, skip_data=False):
+    """
+    Parse a lst file in a single pass, yielding its sections as soon as they
+    are complete.
+    Args:
+        lines: An iterable of lines, e.g. an open lst file.
+        skip_data: If True, the echoed data blocks are skipped without being
+            parsed, and no "data" sections are yielded.
+    Yields:
+        (section, value) pairs, in file order:
+            ("options", dict) the listed options, e.g. {"NINPUTS": 2}
+            ("labels", dict) the XLABELS and ZLABELS tables, column-wise
+            ("data", (name, array)) each echoed data block, e.g. XDATA and
+                ZDATA, see parse_data_block
+            ("bases", list) the bases considered
+            ("output", (z_name, dict)) the quality metrics of each output, and
+                the chosen terms in ALAMO's format under "terms"
+            ("time", dict) the total execution time and its breakdown
+    """
+    state = "seek_options"
     this_dict = {}
-    while not almutils.only_contains(curr, "="):
-        curr_list = curr.split("=")
-        entry_name = curr_list[0].strip()
-        entry_val = curr_list[-1].strip()
-        this_dict[entry_name] = almutils.cast(entry_val)
-        i, curr = almutils.increment(lines, i, 1)
-
-    # Reading organized input data, part 1 (XLABELS)
-    i, curr = almutils.nets(lines, i, lambda s: "XLABELS" in s)
-    entry_list = curr.split()
-    for entry_name in entry_list:
-        this_dict[entry_name] = []
-    i, curr = almutils.increment(lines, i, 1)
-    while "ZLABELS" not in curr:
-        for (entry_name, entry_val) in zip(entry_list, curr.split()):
-            this_dict[entry_name].append(almutils.cast(entry_val))
-        i, curr = almutils.increment(lines, i, 1)
-
-    # Reading organized input data, part 2 (ZLABELS)
-    i, curr = almutils.nets(lines, i, lambda s: "ZLABELS" in s)
-    entry_list = curr.split()
-    for entry_name in entry_list:
-        this_dict[entry_name] = []
-    i, curr = almutils.increment(lines, i, 1)
-    while curr != "":
-        for (entry_name, entry_val) in zip(entry_list, curr.split()):
-            this_dict[entry_name].append(almutils.cast(entry_val))
-        i, curr = almutils.increment(lines, i, 1)
-
-    # Reading organized input data, part 3 (XDATA and ZDATA, and all other)
-    i, curr = almutils.nets(lines, i, lambda s: "XDATA and ZDATA" in s)
-    while not almutils.only_contains(curr, "="):
-        i, curr = almutils.nets(lines, i, lambda s: s != "")
-        entry_name = curr.strip()
-        i, curr = almutils.increment(lines, i, 1)
-        entry_list = []
-        while not (almutils.only_contains(curr, "=") or curr == ""):
-            curr = curr.strip()
-            entry_list.append([almutils.cast(x) for x in curr.split()])
-            i, curr = almutils.increment(lines, i, 1)
-        if len(entry_list) == 1:
-            entry_list = entry_list[0]
-        this_dict[entry_name] = entry_list
-
-    # Reading bases considered
-    i, curr = almutils.nets(lines, i, lambda s: "BASES considered" in s)
-    i, curr = almutils.increment(lines, i, 1)
     entry_list = []
-    while not almutils.only_contains(curr, "="):
-        entry_list.append(almutils.cast(curr.strip()))
-        i, curr = almutils.increment(lines, i, 1)
-    this_dict["bases"] = entry_list
-
-    # Storing "in" part results into return dict
-    opts["return"]["in"] = this_dict
-
-    # Reading "out" part
-    # Reading output model
-    i, curr = almutils.nets(lines, i, lambda s: "Quality metrics for output" in s)
-    # Repeatedly reads for all z variables, if more than one
-    while "Quality metrics for output" in curr:
-        z_name = curr.split()[-1]
-        this_dict = {}
-        i, curr = almutils.nets(lines, i, lambda s: ":" in s)
-
-        # Reading all quality metrics
-        while ":" in curr:
-            entry_name, entry_val = curr.split(":")
-            entry_val = entry_val.strip()
-            this_dict[entry_name] = almutils.cast(entry_val)
-            i, curr = almutils.increment(lines, i, 1)
-        i, curr = almutils.nets(
-            lines, i, lambda s: "BETAS and BASES chosen for this output" in s
-        )
-
-        # Reading the final model
-        curr_list = []
-        i, curr = almutils.increment(lines, i, 1)
-        while curr != "":
-            curr_list.append(curr)
-            i, curr = almutils.increment(lines, i, 1)
-        this_dict["model_str"] = almutils.represent_model_str(curr_list)
-        this_dict["model_fun"] = lambdify(
-            symbols(opts["return"]["in"]["XLABELS"]),
-            parse_expr(this_dict["model_str"].replace("^", "**")),
-            "numpy",
-        )
-
-        # Storing this z variable into return dict
-        opts["return"]["out"][z_name] = this_dict
-        i, curr = almutils.nets(lines, i, lambda s: s != "")
-
-    # Reading "other" part
-    # Reading time total
-    i, curr = almutils.nets(lines, i, lambda s: "Total execution time" in s)
-    this_dict = {}
-    curr_list = curr.split()
-    this_dict["total"] = almutils.cast(curr_list[curr_list.index("s") - 1])
-    i, curr = almutils.increment(lines, i, 2)
-
-    # Reading all breakdown entries
-    while ":" in curr:
-        curr_list = curr.split()
-        entry_name = curr_list[curr_list.index("time:") - 1]
-        entry_val = almutils.cast(curr_list[curr_list.index("s") - 1])
-        this_dict[entry_name] = entry_val
-        i, curr = almutils.increment(lines, i, 1)
-
-    # Storing "time" part results into return dict
-    opts["return"]["other"]["time"] = this_dict
+    skip = 0
+    for line in lines:
+        curr = line.strip()
+        if skip:
+            skip -= 1
+            continue
+
+        # Reading "in" part
+        # Reading listed options
+        if state == "seek_options":
+            if "=" not in curr:
+                continue
+            state = "options"
+        if state == "options":
+            if _is_rule(curr):
+                yield "options", this_dict
+                this_dict = {}
+                state = "seek_xlabels"
+            else:
+                curr_list = curr.split("=")
+                entry_name = curr_list[0].strip()
+                entry_val = curr_list[-1].strip()
+                this_dict[entry_name] = almutils.cast(entry_val)
+            continue
+
+        # Reading organized input data (XLABELS and ZLABELS)
+        if state == "seek_xlabels":
+            if "XLABELS" not in curr:
+                continue
+            entry_list = curr.split()
+            this_dict.update((entry_name, []) for entry_name in entry_list)
+            state = "xlabels"
+            continue
+        if state == "xlabels" and "ZLABELS" in curr:
+            entry_list = curr.split()
+            this_dict.update((entry_name, []) for entry_name in entry_list)
+            state = "zlabels"
+            continue
+        if state in ("xlabels", "zlabels"):
+            if state == "zlabels" and curr == "":
+                yield "labels", this_dict
+                this_dict = {}
+                state = "seek_data"
+                continue
+            for (entry_name, entry_val) in zip(entry_list, curr.split()):
+                this_dict[entry_name].append(almutils.cast(entry_val))
+            continue
+
+        # Reading organized input data (XDATA and ZDATA, and all other)
+        if state == "seek_data":
+            if "XDATA and ZDATA" not in curr:
+                continue
+            state = "data_name"
+        if state == "data_name":
+            if curr == "":
+                continue
+            data_name = curr
+            entry_list = []
+            state = "data_rows"
+            continue
+        if state == "data_rows":
+            if not (_is_rule(curr) or curr == ""):
+                if not skip_data:
+                    entry_list.append(curr)
+                continue
+            if not skip_data:
+                yield "data", (data_name, parse_data_block(entry_list))
+            state = "seek_bases" if _is_rule(curr) else "data_name"
+            continue
+
+        # Reading bases considered
+        if state == "seek_bases":
+            if "BASES considered" in curr:
+                entry_list = []
+                state = "bases"
+            continue
+        if state == "bases":
+            if _is_rule(curr):
+                yield "bases", entry_list
+                state = "seek_output"
+            else:
+                entry_list.append(almutils.cast(curr))
+            continue
+
+        # Reading "out" part
+        # Reading all quality metrics, repeatedly for all z variables
+        if state == "seek_output":
+            if "Quality metrics for output" in curr:
+                z_name = curr.split()[-1]
+                this_dict = {}
+                state = "seek_metrics"
+            continue
+        if state == "seek_metrics":
+            if ":" not in curr:
+                continue
+            state = "metrics"
+        if state == "metrics":
+            if ":" in curr:
+                entry_name, entry_val = curr.split(":")
+                this_dict[entry_name] = almutils.cast(entry_val.strip())
+                continue
+            state = "seek_terms"
+        if state == "seek_terms":
+            if "BETAS and BASES chosen for this output" in curr:
+                this_dict["terms"] = []
+                state = "terms"
+            continue
+        if state == "terms":
+            if curr != "":
+                this_dict["terms"].append(curr)
+                continue
+            yield "output", (z_name, this_dict)
+            state = "after_output"
+            continue
+        if state == "after_output":
+            if curr == "":
+                continue
+            if "Quality metrics for output" in curr:
+                z_name = curr.split()[-1]
+                this_dict = {}
+                state = "seek_metrics"
+                continue
+            state = "seek_time"
+
+        # Reading "other" part
+        # Reading time total and all breakdown entries
+        if state == "seek_time":
+            if "Total execution time" in curr:
+                curr_list = curr.split()
+                this_dict = {}
+                this_dict["total"] = almutils.cast(curr_list[curr_list.index("s") - 1])
+                state = "time"
+                skip = 1
+            continue
+        if state == "time":
+            if ":" not in curr:
+                break
+            curr_list = curr.split()
+            entry_name = curr_list[curr_list.index("time:") - 1]
+            entry_val = almutils.cast(curr_list[curr_list.index("s") - 1])
+            this_dict[entry_name] = entry_val
+
+    if state == "time":
+        yield "time", this_dict
+
+
+def parse_data_block(rows):
+    """
+    Parse the rows of an echoed data block in bulk.
+    Args:
+        rows: A list of strings, each holding one whitespace-separated row.
+    Returns:
+        A float64 ndarray with one row per line, or a 1D array if the block
+        has a single row. Blocks that are not numeric and rectangular fall back
+        to a (nested) list of values cast by almutils.cast.
+    """
+    try:
+        block = np.loadtxt(rows, dtype=float, ndmin=2)
+    except ValueError:
+        block = [[almutils.cast(x) for x in row.split()] for row in rows]
+    if len(block) == 1:
+        block = block[0]
+    return block
+
+
+def _is_rule(line):
+    """
+    Return True iff line is a non-empty rule of "=" characters.
+    """
+    return line != "" and line.strip("=") == ""
+
+
+def build_model_fun(model_str, xlabels):
+    """
+    Build a callable model function from a model string.
+    Args:
+        model_str: A model string as produced by almutils.represent_model_str.
+        xlabels: The input labels, in the order of the function arguments.
+    Returns:
+        A function f(x1, x2, ...) evaluating the model: an almmodel.AlmModel,
+        or a lambdified sympy expression for terms AlmModel cannot represent.
+    """
+    try:
+        return almmodel.AlmModel.from_model_str(model_str, xlabels)
+    except ValueError:
+        return lambdify_model_str(model_str, xlabels)
+
+
+def lambdify_model_str(model_str, xlabels):
+    """
+    Build a numpy function from a model string through sympy, which is only
+    imported when needed.
+    """
+    from sympy import symbols, lambdify
+    from sympy.parsing import parse_expr
+
+    return lambdify(
+        symbols(xlabels), parse_expr(model_str.replace("^", "**")), "numpy"
+    )
+
+
+def strip_model_funs(result):
+    """
+    Remove the lambdified model functions from a result dictionary so that it
+    can be pickled, e.g. to be sent back from a worker process. Model
+    functions that are almmodel.AlmModel instances can be pickled and are
+    kept.
+    Args:
+        result: A dictionary shaped like opts["return"].
+    Returns:
+        The same dictionary, without "model_fun" entries.
+    """
+    for var_dict in result["out"].values():
+        if not isinstance(var_dict, dict):
+            continue
+        if not isinstance(var_dict.get("model_fun"), almmodel.AlmModel):
+            var_dict.pop("model_fun", None)
+    return result
+
+
+def restore_model_funs(result):
+    """
+    Rebuild the "model_fun" entries removed by strip_model_funs.
+    Args:
+        result: A dictionary shaped like opts["return"].
+    Returns:
+        The same dictionary, with "model_fun" entries rebuilt from "model_str".
+    """
+    for var_dict in result["out"].values():
+        if not isinstance(var_dict, dict) or "model_fun" in var_dict:
+            continue
+        if "model_str" in var_dict:
+            var_dict["model_fun"] = build_model_fun(
+                var_dict["model_str"], result["in"]["XLABELS"]
+            )
+    return result
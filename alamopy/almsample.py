@@ -0,0 +1,236 @@
+##############################################################################
+# Institute for the Design of Advanced Energy Systems Process Systems
+# Engineering Framework (IDAES PSE Framework) Copyright (c) 2018-2020, by the
+# software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia
+# University Research Corporation, et al. All rights reserved.
+#
+# Please see the files COPYRIGHT.txt and LICENSE.txt for full copyright and
+# license information, respectively. Both files are also available online
+# at the URL "https://github.com/IDAES/idaes-pse".
+##############################################################################
+"""
+almsample.py
+Selection of a representative subset of large data sets to fit.
+
+With the max_fit_points option, almopts.complete_opts keeps at most that
+many data points as DATA, chosen by the fit_sampling method:
+    "kdtree" (the default) splits the inputs into max_fit_points cells of
+        equal counts, halving the widest cell dimension at the median, and
+        keeps the point of every cell closest to its centroid. The subset
+        follows the density of the data, in O(n log max_fit_points) time.
+    "maximin" greedily picks, out of a kdtree subset a few times larger,
+        the point farthest from those already picked, filling the input
+        space evenly.
+    "kmeans" runs Lloyd iterations from a kdtree subset on a sample of the
+        data, and keeps the data point closest to every cluster center.
+Inputs are scaled by their ranges, and all methods are deterministic. The
+remaining points become VALDATA (see the fit_holdout option), or are scored
+in Python against the fitted models once the fit is done.
+"""
+import numpy as np
+
+from alamopy import almutils
+from alamopy import almvalidate
+
+# Values of the fit_sampling option
+sample_methods = ["kdtree", "maximin", "kmeans"]
+
+# Values of the fit_holdout option
+holdout_modes = ["valdata", "score"]
+
+# Size of the maximin candidate pool, relative to the number of points kept
+maximin_pool_factor = 4
+
+# Lloyd iterations, and size of the k-means sample relative to the number
+# of points kept
+kmeans_iterations = 10
+kmeans_sample_factor = 10
+
+# Number of point to center distances computed at once by k-means
+max_distances = 2**20
+
+
+def subsample(opts):
+    """
+    Keep at most opts["max_fit_points"] points of opts["xdata"] and
+    opts["zdata"], and hold the others out: as VALDATA if fit_holdout is
+    "valdata", or if it is None with ALAMO and no user valdata; otherwise
+    they are kept in opts["holdout"] for score_holdout. The summary is stored
+    into opts["return"]["other"]["subsampling"]:
+        {"method": name, "ndata": total, "nfit": kept, "nheldout": others,
+         "holdout": "valdata" or "score"}
+    """
+    xdata, zdata = opts["xdata"], opts["zdata"]
+    ndata = len(xdata)
+    if opts["max_fit_points"] is None or ndata <= opts["max_fit_points"]:
+        return
+    method = opts["fit_sampling"] or "kdtree"
+    rows = thin(xdata, int(opts["max_fit_points"]), method)
+    rest = np.ones(ndata, dtype=bool)
+    rest[rows] = False
+
+    mode = opts["fit_holdout"]
+    if mode is None:
+        in_alamo = opts["engine"] is None and opts["valdata"] is None
+        mode = "valdata" if in_alamo else "score"
+    if mode == "valdata":
+        opts["valdata"] = np.hstack((xdata[rest], zdata[rest]))
+        opts["nvaldata"] = len(opts["valdata"])
+    else:
+        opts["holdout"] = (xdata[rest], zdata[rest])
+    opts["xdata"], opts["zdata"] = xdata[rows], zdata[rows]
+
+    opts["return"]["other"]["subsampling"] = {
+        "method": method,
+        "ndata": ndata,
+        "nfit": len(rows),
+        "nheldout": int(rest.sum()),
+        "holdout": mode,
+    }
+
+
+def score_holdout(opts):
+    """
+    Score the fitted models of opts["return"] against the points held out by
+    subsample with almvalidate.validate, storing the metrics of every output
+    into opts["return"]["other"]["subsampling"]["scores"].
+    """
+    if opts["holdout"] is None:
+        return
+    xdata, zdata = opts["holdout"]
+    scores = almvalidate.validate(opts["return"], xdata, zdata)
+    opts["return"]["other"]["subsampling"]["scores"] = scores
+
+
+def thin(xdata, npoints, method="kdtree"):
+    """
+    Return the sorted indices of at most npoints representative rows of
+    xdata (all of them if there are fewer), selected by one of
+    sample_methods.
+    """
+    xdata = almutils.array_2d(xdata)
+    if npoints >= len(xdata):
+        return np.arange(len(xdata))
+    if method == "maximin":
+        return maximin_thin(xdata, npoints)
+    if method == "kmeans":
+        return kmeans_thin(xdata, npoints)
+    return kdtree_thin(xdata, npoints)
+
+
+def kdtree_thin(xdata, npoints):
+    """
+    Split the rows of xdata into npoints cells of (nearly) equal counts by
+    recursively cutting the widest dimension of a cell at its median, and
+    return the sorted indices of the row closest to the centroid of every
+    cell.
+    """
+    # A scaled single precision copy of the data, one contiguous row per
+    # input, reordered along with order so that every cell is a slice
+    points = np.array((xdata * _scale(xdata)).T, dtype=np.float32, order="C")
+    order = np.arange(len(xdata))
+    chosen = np.empty(npoints, dtype=np.int64)
+    # Cells as (start, stop, number of points to keep) slices of order
+    cells = [(0, len(xdata), npoints)]
+    nchosen = 0
+    while cells:
+        start, stop, keep = cells.pop()
+        cell = points[:, start:stop]
+        if keep == 1:
+            distance = np.sum((cell - cell.mean(axis=1)[:, None]) ** 2, axis=0)
+            chosen[nchosen] = order[start + np.argmin(distance)]
+            nchosen += 1
+            continue
+        dim = np.argmax(cell.max(axis=1) - cell.min(axis=1))
+        left = keep // 2
+        split = (stop - start) * left // keep
+        part = np.argpartition(cell[dim], split)
+        cell[:] = cell[:, part]
+        order[start:stop] = order[start:stop][part]
+        cells.append((start, start + split, left))
+        cells.append((start + split, stop, keep - left))
+    return np.sort(chosen)
+
+
+def maximin_thin(xdata, npoints, pool_factor=maximin_pool_factor):
+    """
+    Greedily select npoints rows of xdata, each farthest from the rows
+    already selected, out of a kdtree_thin pool of pool_factor * npoints
+    candidates, starting from the candidate closest to the center of the
+    data. Returns their sorted indices, fewer than npoints if the pool holds
+    fewer distinct points.
+    """
+    pool = kdtree_thin(xdata, min(len(xdata), pool_factor * npoints))
+    points = xdata[pool] * _scale(xdata)
+    distance = np.sum((points - points.mean(axis=0)) ** 2, axis=1)
+    chosen = [np.argmin(distance)]
+    distance = np.full(len(pool), np.inf)
+    for _ in range(npoints - 1):
+        step = np.sum((points - points[chosen[-1]]) ** 2, axis=1)
+        np.minimum(distance, step, out=distance)
+        distance[chosen[-1]] = -np.inf
+        farthest = np.argmax(distance)
+        # Only duplicates of the chosen points are left
+        if distance[farthest] <= 0:
+            break
+        chosen.append(farthest)
+    return np.sort(pool[chosen])
+
+
+def kmeans_thin(
+    xdata,
+    npoints,
+    iterations=kmeans_iterations,
+    sample_factor=kmeans_sample_factor,
+    seed=0,
+):
+    """
+    Cluster a sample of sample_factor * npoints rows of xdata with Lloyd
+    iterations started from a kdtree_thin subset, and return the sorted
+    indices of the sampled rows closest to the npoints cluster centers.
+    Centers sharing their closest row are completed by kdtree_thin rows.
+    """
+    rng = np.random.default_rng(seed)
+    nsample = min(len(xdata), sample_factor * npoints)
+    sample = np.sort(rng.choice(len(xdata), nsample, replace=False))
+    scale = _scale(xdata)
+    points = xdata[sample] * scale
+    centers = xdata[kdtree_thin(xdata, npoints)] * scale
+    for _ in range(iterations):
+        labels = _nearest(points, centers)
+        counts = np.bincount(labels, minlength=npoints)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, points)
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+    chosen = np.unique(sample[_nearest(centers, points)])
+    if len(chosen) < npoints:
+        extra = np.setdiff1d(kdtree_thin(xdata, npoints), chosen)
+        chosen = np.union1d(chosen, extra[: npoints - len(chosen)])
+    return chosen
+
+
+def _nearest(points, centers):
+    """
+    The index of the closest center of every point, computing the distances
+    of a block of points at a time.
+    """
+    nearest = np.empty(len(points), dtype=np.int64)
+    norms = np.sum(centers**2, axis=1)
+    step = max(1, max_distances // max(len(centers), 1))
+    for start in range(0, len(points), step):
+        block = points[start : start + step]
+        nearest[start : start + len(block)] = np.argmin(
+            norms - 2.0 * block @ centers.T, axis=1
+        )
+    return nearest
+
+
+def _scale(xdata):
+    """
+    The factors scaling every input of xdata to a unit range.
+    """
+    span = np.max(xdata, axis=0) - np.min(xdata, axis=0)
+    return 1.0 / np.where(span > 0, span, 1.0)
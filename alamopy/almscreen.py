@@ -0,0 +1,360 @@
+##############################################################################
+# Institute for the Design of Advanced Energy Systems Process Systems
+# Engineering Framework (IDAES PSE Framework) Copyright (c) 2018-2020, by the
+# software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia
+# University Research Corporation, et al. All rights reserved.
+#
+# Please see the files COPYRIGHT.txt and LICENSE.txt for full copyright and
+# license information, respectively. Both files are also available online
+# at the URL "https://github.com/IDAES/idaes-pse".
+##############################################################################
+"""
+almscreen.py
+Screening of the inputs and bases of a fit, before ALAMO runs.
+
+The size of ALAMO's selection problem grows quickly with the number of
+inputs and candidate bases. Screening is opt-in through the "screen" option,
+and runs in doalamo right after almopts.complete_opts:
+    screen=True or "correlation" scores every input by the largest absolute
+        correlation of an output with a candidate basis depending on it.
+    screen="mutual_information" scores every input by its mutual information
+        with the outputs, or that of a candidate basis of several inputs
+        depending on it, estimated on quantile bins.
+    Both scores are taken above the level of chance, the best score of any
+    input against shuffled outputs.
+    screen="lasso" scores every candidate basis by how early it enters the
+        lasso path of an output, and every input by its best basis.
+Inputs scoring below screen_threshold times the best score are excluded
+through the exclude option, and at most screen_max_inputs inputs are kept.
+The lasso also drops the basis options (e.g. a value of monomialpower, or
+expfcns) whose bases all score below the threshold. What was pruned is
+reported in result["other"]["screening"].
+"""
+import numpy as np
+
+from alamopy import almbasis
+from alamopy import almutils
+
+# Values of the screen option, True standing for "correlation"
+screen_methods = ["correlation", "mutual_information", "lasso"]
+
+# Relative score below which inputs and bases are pruned, by default
+default_threshold = 0.05
+
+# Number of data points sampled for screening larger data sets
+max_screen_points = 20000
+
+# Number of shuffles of the outputs estimating the level of chance scores
+chance_permutations = 4
+
+# Options whose values the lasso may drop, and the options it may turn off
+trimmable_powers = ["monomialpower", "multi2power", "multi3power", "ratiopower"]
+trimmable_functions = [option for option, _ in almbasis.function_options]
+
+
+def screen(opts):
+    """
+    Screen the inputs and bases of the completed opts (see
+    almopts.complete_opts), updating the exclude option and the basis
+    options, and store the report into opts["return"]["other"]["screening"]:
+        {"method": name, "scores": {xlabel: relative score},
+         "excluded": [xlabel, ...], "trimmed": {option: [value, ...]}}
+    Runs without data (e.g. with a simulator) are not screened.
+    """
+    if opts["xdata"] is None or opts["zdata"] is None:
+        return
+    method = "correlation" if opts["screen"] is True else opts["screen"]
+    threshold = opts["screen_threshold"]
+    threshold = default_threshold if threshold is None else threshold
+    xdata = almutils.array_2d(opts["xdata"])
+    zdata = almutils.array_2d(opts["zdata"])
+    rows = sample_rows(len(xdata), max_screen_points)
+    xdata, zdata = xdata[rows], zdata[rows]
+    ninputs = xdata.shape[1]
+    xlabels = opts["xlabels"] or ["X%d" % (j + 1) for j in range(ninputs)]
+    xlabels = [xlabels] if isinstance(xlabels, str) else list(xlabels)
+
+    trimmed = {}
+    if method == "lasso":
+        scores = lasso_input_scores(opts, xdata, zdata, xlabels, threshold, trimmed)
+    elif method == "mutual_information":
+        scores = above_chance(
+            lambda x, z: mutual_information_scores(
+                x, z, settings=opts, xlabels=xlabels
+            ),
+            xdata,
+            zdata,
+        )
+    else:
+        scores = above_chance(
+            lambda x, z: correlation_scores(opts, x, z, xlabels), xdata, zdata
+        )
+    if scores.max() > 0:
+        scores = scores / scores.max()
+
+    inputs = almbasis.included_inputs(opts, ninputs)
+    kept = sorted(
+        (j for j in inputs if scores[j] >= threshold), key=lambda j: -scores[j]
+    )
+    if opts["screen_max_inputs"] is not None:
+        kept = kept[: max(int(opts["screen_max_inputs"]), 1)]
+    if not kept and inputs:
+        kept = [max(inputs, key=lambda j: scores[j])]
+    excluded = [j for j in inputs if j not in kept]
+    if excluded:
+        flags = [int(flag) for flag in almbasis.option_values(opts["exclude"])]
+        flags = (flags + [0] * ninputs)[:ninputs]
+        for j in excluded:
+            flags[j] = 1
+        opts["exclude"] = flags
+
+    opts["return"]["other"]["screening"] = {
+        "method": method,
+        "scores": {label: float(score) for label, score in zip(xlabels, scores)},
+        "excluded": [xlabels[j] for j in excluded],
+        "trimmed": trimmed,
+    }
+
+
+def above_chance(score, xdata, zdata, npermutations=chance_permutations, seed=0):
+    """
+    The scores of the inputs, score(xdata, zdata), minus the largest score
+    any input reaches against outputs shuffled across the data points, so
+    that inputs unrelated to the outputs score 0 rather than the (sample
+    size dependent) level of chance.
+    """
+    rng = np.random.default_rng(seed)
+    chance = max(
+        score(xdata, zdata[rng.permutation(len(zdata))]).max()
+        for _ in range(npermutations)
+    )
+    return np.maximum(score(xdata, zdata) - chance, 0.0)
+
+
+def correlation_scores(settings, xdata, zdata, xlabels=None):
+    """
+    Score every input by the largest absolute correlation of an output with
+    a candidate basis of settings depending on it, as credited by
+    credit_scores. The xlabels are those custom bases are written with.
+    """
+    matrix, bases, _ = almbasis.basis_matrix(settings, xdata, xlabels)
+    column_scores = np.max(abs_correlations(matrix, zdata), axis=1)
+    single = np.zeros(xdata.shape[1])
+    for basis, score in zip(bases, column_scores):
+        inputs = almbasis.basis_inputs(basis)
+        if len(inputs) == 1:
+            j = next(iter(inputs))
+            single[j] = max(single[j], score)
+    return credit_scores(single, bases, column_scores)
+
+
+def mutual_information_scores(xdata, zdata, nbins=None, settings=None, xlabels=None):
+    """
+    Score every input by its largest mutual information (in nats) with an
+    output, estimated on the joint histogram of quantile bins, so that the
+    scores do not depend on monotonic transformations of the data. With
+    settings, the candidate bases of several inputs (e.g. of multi2power)
+    are scored too, as credited by credit_scores, custom bases being
+    written with the xlabels.
+    """
+    single = column_information(xdata, zdata, nbins)
+    if settings is None:
+        return single
+    matrix, bases, _ = almbasis.basis_matrix(settings, xdata, xlabels)
+    multiple = [
+        i for i, basis in enumerate(bases) if len(almbasis.basis_inputs(basis)) > 1
+    ]
+    if not multiple:
+        return single
+    column_scores = column_information(matrix[:, multiple], zdata, nbins)
+    return credit_scores(single, [bases[i] for i in multiple], column_scores)
+
+
+def credit_scores(single, bases, column_scores):
+    """
+    Credit every input with its single input score, and with the scores of
+    the bases of several inputs depending on it, less the best single input
+    score of their other inputs, so that an input is not kept merely for
+    multiplying (or dividing) an input that matters.
+    """
+    scores = np.array(single, dtype=float)
+    for basis, score in zip(bases, column_scores):
+        inputs = almbasis.basis_inputs(basis)
+        if len(inputs) < 2:
+            continue
+        for j in inputs:
+            others = max(single[i] for i in inputs if i != j)
+            scores[j] = max(scores[j], score - others)
+    return scores
+
+
+def column_information(matrix, zdata, nbins=None):
+    """
+    The largest mutual information of every column of matrix with an
+    output, 0 for columns with undefined values.
+    """
+    ndata = len(matrix)
+    if nbins is None:
+        nbins = int(np.clip(np.sqrt(ndata / 5.0), 2, 32))
+    finite = np.all(np.isfinite(matrix), axis=0)
+    xbins = quantile_bins(np.where(finite, matrix, 0.0), nbins)
+    zbins = quantile_bins(zdata, nbins)
+    scores = np.zeros(matrix.shape[1])
+    for k in range(zdata.shape[1]):
+        for j in np.flatnonzero(finite):
+            cells = xbins[:, j] * nbins + zbins[:, k]
+            joint = np.bincount(cells, minlength=nbins**2).reshape(nbins, nbins)
+            joint = joint / ndata
+            marginals = np.outer(joint.sum(axis=1), joint.sum(axis=0))
+            observed = joint > 0
+            information = np.sum(
+                joint[observed] * np.log(joint[observed] / marginals[observed])
+            )
+            scores[j] = max(scores[j], information)
+    return scores
+
+
+def lasso_input_scores(settings, xdata, zdata, xlabels, threshold, trimmed):
+    """
+    Score every candidate basis by lasso_scores and every input by its best
+    basis, dropping from settings the basis options whose bases all score
+    below threshold times the best basis. The dropped values are recorded
+    into the trimmed dictionary.
+    """
+    ninputs = xdata.shape[1]
+    groups = almbasis.candidate_groups(settings, ninputs, xlabels)
+    matrix, bases, _ = almbasis.basis_matrix(settings, xdata, xlabels)
+    column_scores = lasso_scores(matrix, zdata)
+    best = column_scores.max() if len(column_scores) else 0.0
+
+    start = 0
+    for option, value, group in groups:
+        group_score = column_scores[start : start + len(group)].max(initial=0.0)
+        start += len(group)
+        if best > 0 and group_score < threshold * best:
+            if option in trimmable_powers:
+                trimmed.setdefault(option, []).append(value)
+            elif option in trimmable_functions:
+                trimmed[option] = [value]
+    for option, values in trimmed.items():
+        if option in trimmable_functions:
+            settings[option] = 0
+            continue
+        kept = [p for p in almbasis.option_values(settings[option]) if p not in values]
+        settings[option] = kept or None
+    return input_scores(bases, column_scores, ninputs)
+
+
+def lasso_scores(matrix, zdata, nlambdas=30, min_ratio=1e-3):
+    """
+    Score the columns of matrix by the largest penalty, relative to the
+    smallest penalty selecting no column, at which they enter the lasso path
+    of an output. Columns are standardized first; constant and undefined
+    columns score 0.
+    Args:
+        matrix: The (n, ncolumns) values of the candidate bases.
+        zdata: The (n, noutputs) outputs.
+        nlambdas: The number of penalties of the path, log-spaced from the
+            largest one down to min_ratio times it.
+    """
+    ndata = len(matrix)
+    scores = np.zeros(matrix.shape[1])
+    columns = standardize(matrix)
+    usable = np.flatnonzero(np.any(columns != 0, axis=0))
+    columns = columns[:, usable]
+    gram = columns.T @ columns / ndata
+    for z in standardize(zdata).T:
+        corr = columns.T @ z / ndata
+        lambda_max = np.abs(corr).max(initial=0.0)
+        if lambda_max == 0:
+            continue
+        beta = np.zeros(len(usable))
+        for ratio in np.logspace(0, np.log10(min_ratio), nlambdas):
+            coordinate_descent(gram, corr, beta, ratio * lambda_max)
+            entered = usable[beta != 0]
+            scores[entered] = np.maximum(scores[entered], ratio)
+    return scores
+
+
+def coordinate_descent(gram, corr, beta, penalty, max_sweeps=100, tol=1e-6):
+    """
+    Minimize 1/2 b'Gb - c'b + penalty * |b|_1 in place, starting from beta,
+    for standardized columns (unit diagonal of the Gram matrix G). Every
+    sweep only visits the coefficients that are nonzero or violate the
+    optimality conditions.
+    """
+    grad = corr - gram @ beta
+    for _ in range(max_sweeps):
+        active = np.flatnonzero((beta != 0) | (np.abs(grad) > penalty))
+        max_change = 0.0
+        for j in active:
+            rho = grad[j] + beta[j]
+            new = np.sign(rho) * max(abs(rho) - penalty, 0.0)
+            change = new - beta[j]
+            if change != 0.0:
+                grad -= gram[:, j] * change
+                beta[j] = new
+                max_change = max(max_change, abs(change))
+        if max_change < tol:
+            break
+    return beta
+
+
+def input_scores(bases, column_scores, ninputs):
+    """
+    Score every input by the best score of the bases depending on it.
+    """
+    scores = np.zeros(ninputs)
+    for basis, score in zip(bases, column_scores):
+        for j in almbasis.basis_inputs(basis):
+            scores[j] = max(scores[j], score)
+    return scores
+
+
+def abs_correlations(matrix, zdata):
+    """
+    The (ncolumns, noutputs) absolute correlations of the columns of matrix
+    with the outputs, 0 for constant or undefined columns.
+    """
+    return np.abs(standardize(matrix).T @ standardize(zdata)) / len(matrix)
+
+
+def standardize(matrix):
+    """
+    Center the columns of matrix and scale them to unit variance. Constant
+    columns and columns with undefined values are zeroed.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    columns = np.where(np.all(np.isfinite(matrix), axis=0), matrix, 0.0)
+    magnitude = np.abs(columns).max(axis=0, initial=0.0)
+    columns = columns - columns.mean(axis=0)
+    scale = np.sqrt(np.mean(columns**2, axis=0))
+    # Round-off is all that is left of constant columns once centered
+    scale[scale <= 1e-12 * magnitude] = np.inf
+    return columns / scale
+
+
+def quantile_bins(data, nbins):
+    """
+    The quantile bin in [0, nbins) of every value of every column of data.
+    Equal values share their bin.
+    """
+    bins = np.empty(data.shape, dtype=np.int64)
+    levels = np.linspace(0.0, 1.0, nbins + 1)[1:-1]
+    for j, column in enumerate(data.T):
+        edges = np.quantile(column, levels)
+        bins[:, j] = np.searchsorted(edges, column, side="right")
+    return bins
+
+
+def sample_rows(ndata, max_points, seed=0):
+    """
+    The sorted indices of at most max_points rows out of ndata, sampled
+    without replacement with a fixed seed so that screening is reproducible.
+    """
+    if ndata <= max_points:
+        return np.arange(ndata)
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(ndata, max_points, replace=False))
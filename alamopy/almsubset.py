@@ -0,0 +1,375 @@
+##############################################################################
+# Institute for the Design of Advanced Energy Systems Process Systems
+# Engineering Framework (IDAES PSE Framework) Copyright (c) 2018-2020, by the
+# software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia
+# University Research Corporation, et al. All rights reserved.
+#
+# Please see the files COPYRIGHT.txt and LICENSE.txt for full copyright and
+# license information, respectively. Both files are also available online
+# at the URL "https://github.com/IDAES/idaes-pse".
+##############################################################################
+"""
+almsubset.py
+An in-process subset selection engine, used instead of ALAMO with the option
+engine="subset".
+
+The engine builds the candidate bases of the ALAMO options (see almbasis),
+selects a subset of them for every output by greedy forward selection and
+backward elimination on the criterion of the "modeler" option, and stores
+the result into opts["return"] in the shape produced by read_lst_file. No
+file is written and no process is spawned, which makes small fits cheap; the
+selected models are heuristic, where ALAMO solves the selection exactly.
+"""
+import time
+
+import numpy as np
+
+from alamopy import almbasis
+from alamopy import almmodel
+from alamopy import almutils
+
+# Version reported for fits of the engine, e.g. by almlayer.post_process
+version = "almsubset"
+
+# Fit criteria by value of the ALAMO "modeler" option
+criteria = {1: "BIC", 2: "Cp", 3: "AICc", 4: "HQC"}
+
+# Relative size of the residual below which a fit counts as exact, so that
+# round-off does not reward terms that fit nothing but noise
+exact_fit_tolerance = 1e-10
+
+# Norm below which a candidate, scaled to unit norm and orthogonalized against
+# the chosen terms, is taken as linearly dependent on them
+dependence_tolerance = 1e-8
+
+# Relative decrease of the sum of squared errors needed to accept a swap of
+# terms, so that round-off cannot make the swaps cycle
+improvement_tolerance = 1e-9
+
+
+def fit_subset(opts):
+    """
+    Fit every output of the completed opts (see almopts.complete_opts) and
+    store the results into opts["return"], like read_lst_file.
+    Raises:
+        RuntimeError if the modeler option is not supported by the engine.
+    """
+    start = time.perf_counter()
+    xdata = almutils.array_2d(opts["xdata"])
+    zdata = almutils.array_2d(opts["zdata"])
+    ndata, ninputs = xdata.shape
+    noutputs = zdata.shape[1]
+    xlabels = _labels(opts["xlabels"], "X", ninputs)
+    zlabels = _labels(opts["zlabels"], "Z", noutputs)
+    modeler = 1 if opts["modeler"] is None else int(opts["modeler"])
+    if modeler not in criteria:
+        raise RuntimeError(
+            "The subset engine supports the modelers %s, not %d."
+            % (sorted(criteria), modeler)
+        )
+    criterion = criteria[modeler]
+
+    matrix, bases, labels = almbasis.basis_matrix(opts, xdata, xlabels)
+    # Bases undefined on the data, e.g. logarithms of negative inputs
+    usable = np.flatnonzero(np.all(np.isfinite(matrix), axis=0))
+    matrix = matrix[:, usable]
+
+    in_dict = {"NINPUTS": ninputs, "NOUTPUTS": noutputs, "NDATA": ndata}
+    in_dict.update(_ranges("X", xlabels, xdata))
+    in_dict.update(_ranges("Z", zlabels, zdata))
+    if not opts.get("skip_data_echo"):
+        in_dict["XDATA and ZDATA"] = np.hstack((xdata, zdata))
+    in_dict["bases"] = labels
+    opts["return"]["in"] = in_dict
+
+    select_time = 0.0
+    for k, zlabel in enumerate(zlabels):
+        if _option(opts["ignore"], k, 0):
+            continue
+        z = zdata[:, k]
+        select_start = time.perf_counter()
+        chosen = select_terms(
+            matrix,
+            z,
+            criterion,
+            maxterms=_option(opts["maxterms"], k, None),
+            minterms=_option(opts["minterms"], k, 0),
+            sse_floor=_option(opts["tolsse"], k, 0.0),
+        )
+        select_time += time.perf_counter() - select_start
+        coeffs = np.linalg.lstsq(matrix[:, chosen], z, rcond=None)[0]
+        chosen_bases = [bases[usable[j]] for j in chosen]
+
+        out_dict = dict(quality_metrics(z, matrix[:, chosen] @ coeffs, len(chosen)))
+        terms = [
+            almbasis.format_term(coeff, basis, xlabels)
+            for basis, coeff in zip(chosen_bases, coeffs)
+        ]
+        out_dict["model_str"] = almutils.represent_model_str(terms)
+        out_dict["model_fun"] = almmodel.AlmModel(xlabels, coeffs, chosen_bases)
+        opts["return"]["out"][zlabel] = out_dict
+
+    total = time.perf_counter() - start
+    opts["return"]["other"]["time"] = {
+        "total": total,
+        "OLR": select_time,
+        "MIP": 0.0,
+        "other": total - select_time,
+    }
+    opts["return"]["other"]["termination"] = "normal"
+    opts["return"]["other"]["engine"] = "subset"
+
+
+def select_terms(matrix, z, criterion="BIC", maxterms=None, minterms=0, sse_floor=0.0):
+    """
+    Select the columns of matrix best explaining z.
+
+    Terms are added greedily, from no term and from the constant term, each
+    step taking the column that most reduces the sum of squared errors once
+    orthogonalized against the chosen ones. The models of these paths are
+    then refined by swapping single terms while their sum of squared errors
+    decreases, and by backward elimination of the terms whose removal
+    improves the criterion, and the best refined model by the criterion is
+    chosen.
+    Args:
+        matrix: The (n, ncandidates) values of the candidate bases.
+        z: The n values of the output.
+        criterion: "BIC", "Cp", "AICc" or "HQC".
+        maxterms, minterms: Bounds on the number of terms, None for no bound.
+        sse_floor: Sum of squared errors below which fits are exact.
+    Returns:
+        The sorted indices of the chosen columns.
+    """
+    ndata, ncandidates = matrix.shape
+    limit = min(ncandidates, ndata)
+    if maxterms is not None and maxterms >= 0:
+        limit = min(limit, int(maxterms))
+    minterms = min(int(minterms or 0), limit)
+    sse_floor = max(
+        sse_floor, exact_fit_tolerance**2 * float(z @ z), np.finfo(float).tiny
+    )
+    sigma2 = _error_variance(matrix, z, sse_floor) if criterion == "Cp" else None
+
+    def score(sse, nterms):
+        return criterion_value(criterion, max(sse, sse_floor), ndata, nterms, sigma2)
+
+    norms = np.linalg.norm(matrix, axis=0)
+    columns = matrix / np.where(norms > 0, norms, 1.0)
+    # Searching from the empty model and, since most models have one, from
+    # the model made of the constant term
+    constant = np.flatnonzero((norms > 0) & (np.ptp(matrix, axis=0) == 0))
+    starts = [[]] + ([[int(constant[0])]] if len(constant) and limit else [])
+    best_score, best = np.inf, []
+    for start in starts:
+        path = _forward_path(columns, z, start, limit, score)
+        # Refining the models of the path up to one term past its best model
+        # by swapping terms, since greedy choices made early cannot be undone
+        path = [entry for entry in path if len(entry[1]) >= minterms] or path[-1:]
+        path_best = min(range(len(path)), key=lambda k: path[k][0])
+        for _, subset in path[: path_best + 2]:
+            subset, sse = _swap_terms(columns, z, subset, sse_floor, start)
+            subset, sse = _eliminate_terms(columns, z, subset, sse, score, minterms)
+            subset_score = score(sse, len(subset))
+            if subset_score < best_score:
+                best_score, best = subset_score, subset
+    return sorted(best)
+
+
+def _forward_path(columns, z, start, limit, score):
+    """
+    Add columns to the start subset one at a time, each time the one most
+    reducing the sum of squared errors once orthogonalized against those
+    already chosen, up to limit columns.
+    Returns:
+        The list of (score, subset) of the successive models.
+    """
+    work = columns.copy()
+    residual = np.array(z, dtype=float)
+    chosen = list(start)
+    if chosen:
+        q = np.linalg.qr(columns[:, chosen])[0]
+        residual -= q @ (q.T @ residual)
+        work -= q @ (q.T @ work)
+    path = [(score(float(residual @ residual), len(chosen)), list(chosen))]
+    while len(chosen) < limit:
+        norm2 = np.einsum("ij,ij->j", work, work)
+        independent = norm2 > dependence_tolerance**2
+        independent[chosen] = False
+        candidates = np.flatnonzero(independent)
+        if len(candidates) == 0:
+            break
+        gain = (work[:, candidates].T @ residual) ** 2 / norm2[candidates]
+        j = int(candidates[np.argmax(gain)])
+        q = work[:, j] / np.sqrt(norm2[j])
+        residual -= q * (q @ residual)
+        work -= np.outer(q, q @ work)
+        chosen.append(j)
+        path.append((score(float(residual @ residual), len(chosen)), list(chosen)))
+    return path
+
+
+def criterion_value(criterion, sse, ndata, nterms, sigma2=None):
+    """
+    Value of a fit criterion of a model with nterms terms and the given sum
+    of squared errors on ndata points. Smaller is better.
+    """
+    if criterion == "Cp":
+        return sse / sigma2 - ndata + 2 * nterms
+    fit = ndata * np.log(sse / ndata)
+    if criterion == "BIC":
+        return fit + nterms * np.log(ndata)
+    if criterion == "AICc":
+        if ndata - nterms - 1 <= 0:
+            return np.inf
+        return fit + 2 * nterms + 2 * nterms * (nterms + 1) / (ndata - nterms - 1)
+    if criterion == "HQC":
+        return fit + 2 * nterms * np.log(np.log(ndata)) if ndata > 2 else fit
+    raise ValueError("Unknown criterion %r" % criterion)
+
+
+def quality_metrics(zdata, pred, nterms):
+    """
+    Return the quality metrics ALAMO reports for an output, as
+    [(name, value), ...].
+    """
+    ndata = len(zdata)
+    error = zdata - pred
+    sse = float(error @ error)
+    sst = float(np.sum((zdata - zdata.mean()) ** 2)) if ndata else 0.0
+    r2 = 1.0 - sse / sst if sst > 0 else 1.0
+    dof = ndata - nterms - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        madp = 100.0 * float(np.mean(np.abs(error / zdata))) if ndata else 0.0
+        bic = ndata * np.log(sse / ndata) + nterms * np.log(ndata) if ndata else 0.0
+    return [
+        ("SSE", sse),
+        ("RMSE", float(np.sqrt(sse / ndata)) if ndata else 0.0),
+        ("R2", r2),
+        ("R2 adjusted", 1.0 - (1.0 - r2) * (ndata - 1) / dof if dof > 0 else r2),
+        ("Model size", nterms),
+        ("BIC", float(bic)),
+        ("MADp", madp),
+    ]
+
+
+def _sse(columns, z):
+    if columns.shape[1] == 0:
+        return float(z @ z)
+    residual = z - columns @ np.linalg.lstsq(columns, z, rcond=None)[0]
+    return float(residual @ residual)
+
+
+def _swap_terms(columns, z, subset, sse_floor, fixed=()):
+    """
+    Swap terms of a subset of columns, except the fixed ones, for others,
+    best swap first, while the sum of squared errors of the fit decreases
+    and is above sse_floor.
+    Returns:
+        The final subset and its sum of squared errors.
+    """
+    subset = list(subset)
+    sse = _sse(columns[:, subset], z)
+    while subset and sse > sse_floor:
+        swaps = []
+        for i in subset:
+            if i in fixed:
+                continue
+            rest = [j for j in subset if j != i]
+            j, swap_sse = _best_addition(columns, z, rest, exclude=[i])
+            if j is not None:
+                swaps.append((swap_sse, rest + [j]))
+        if not swaps:
+            break
+        swap_sse, swapped = min(swaps, key=lambda swap: swap[0])
+        if swap_sse >= sse * (1.0 - improvement_tolerance):
+            break
+        sse, subset = swap_sse, swapped
+    return subset, sse
+
+
+def _eliminate_terms(columns, z, subset, sse, score, minterms=0):
+    """
+    Remove terms from a subset of columns, best removal first, while this
+    improves the score of the fit and leaves more than minterms terms. Since
+    score judges sums of squared errors below the exact fit floor as equal,
+    terms only fitting round-off are removed.
+    Returns:
+        The final subset and its sum of squared errors.
+    """
+    subset = list(subset)
+    current = score(sse, len(subset))
+    while len(subset) > minterms:
+        removals = []
+        for i in subset:
+            rest = [j for j in subset if j != i]
+            rest_sse = _sse(columns[:, rest], z)
+            removals.append((score(rest_sse, len(rest)), rest_sse, rest))
+        best_score, rest_sse, rest = min(removals, key=lambda removal: removal[0])
+        if best_score >= current:
+            break
+        current, sse, subset = best_score, rest_sse, rest
+    return subset, sse
+
+
+def _best_addition(columns, z, subset, exclude=()):
+    """
+    Return the column, other than those excluded, most reducing the sum of
+    squared errors of the least squares fit of z on the given subset of
+    columns, and the reduced sum, or (None, None) if every column depends on
+    the subset.
+    """
+    if subset:
+        q = np.linalg.qr(columns[:, subset])[0]
+        work = columns - q @ (q.T @ columns)
+        residual = z - q @ (q.T @ z)
+    else:
+        work, residual = columns, z
+    norm2 = np.einsum("ij,ij->j", work, work)
+    independent = norm2 > dependence_tolerance**2
+    independent[subset] = False
+    independent[list(exclude)] = False
+    candidates = np.flatnonzero(independent)
+    if len(candidates) == 0:
+        return None, None
+    gain = (work[:, candidates].T @ residual) ** 2 / norm2[candidates]
+    best = int(np.argmax(gain))
+    return int(candidates[best]), float(residual @ residual - gain[best])
+
+
+def _error_variance(matrix, z, sse_floor):
+    """
+    The error variance estimated from the fit on every candidate, used by
+    Mallows' Cp.
+    """
+    rank = np.linalg.matrix_rank(matrix)
+    dof = len(z) - rank
+    return max(_sse(matrix, z), sse_floor) / dof if dof > 0 else sse_floor
+
+
+def _labels(labels, prefix, count):
+    if labels is None:
+        return ["%s%d" % (prefix, j + 1) for j in range(count)]
+    return [labels] if isinstance(labels, str) else list(labels)
+
+
+def _ranges(prefix, labels, data):
+    return {
+        prefix + "LABELS": labels,
+        prefix + "MIN": [float(value) for value in data.min(axis=0)],
+        prefix + "MAX": [float(value) for value in data.max(axis=0)],
+        prefix + "ISINT": [False] * len(labels),
+    }
+
+
+def _option(option, k, default):
+    """
+    The value for output k of an ALAMO option given for every output, as a
+    list, or for all of them, as a scalar.
+    """
+    if option is None:
+        return default
+    if isinstance(option, (list, tuple, np.ndarray)):
+        return option[k] if k < len(option) else default
+    return option
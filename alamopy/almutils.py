@@ -15,10 +15,21 @@ almutils.py
 Various utilities that can be used by other parts of ALAMOpy.
 """
 import os
+import re
+import shutil
 import subprocess
+import tempfile
+import threading
+from pathlib import Path
 import numpy as np
 
-from alamopy import exec_path
+import alamopy
+
+# Memoized executable discovery and version probing, see get_alamo_path and
+# get_alamo_version
+_alamo_path_cache = {}
+_alamo_version_cache = {}
+_alamo_lock = threading.Lock()
 
 
 def datadim(arr):
@@ -153,10 +164,7 @@ def data2min(data):
     Example:
         [[0,1],[2,-1]] -> [0,-1]
     """
-    res = data[0]
-    for item in data:
-        res = np.minimum(res, item)
-    return res
+    return np.min(np.asarray(data), axis=0)
 
 
 def data2max(data):
@@ -172,10 +180,7 @@ def data2max(data):
     Example:
         [[0,1],[2,-1]] -> [2,1]
     """
-    res = data[0]
-    for item in data:
-        res = np.maximum(res, item)
-    return res
+    return np.max(np.asarray(data), axis=0)
 
 
 def only_contains(line, char):
@@ -337,18 +342,85 @@ def parse_term_code(alm_stdout):
         code.
     Args:
         alm_stdout: A string captured from stdout through running the ALAMO
-            executable.
+            executable, or an iterable of its lines (e.g. the stdout stream
+            itself), which is consumed up to the termination code.
     Returns:
         The termination code codified in the argument string. If no code is in
             the string, that means ALAMO has run successfully: return 0.
     """
-    lines = alm_stdout.split("\n")
+    lines = alm_stdout.split("\n") if isinstance(alm_stdout, str) else alm_stdout
     for line in lines:
-        if "ALAMO terminated with termination code" in line:
-            return int(line.split()[-1])
+        code = term_code_of_line(line)
+        if code is not None:
+            return code
     return 0
 
 
+def term_code_of_line(line):
+    """
+    Return the termination code announced by a line of ALAMO stdout, or None.
+    """
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", "replace")
+    if "ALAMO terminated with termination code" in line:
+        return int(line.split()[-1])
+    return None
+
+
+# e.g. "Iteration 1 (Approx. elapsed time 0.44E-02 s)"
+_iteration_re = re.compile(r"^\s*Iteration\s+(\d+)(?:.*elapsed time\s+(\S+))?")
+# e.g. "Model building for variable z"
+_variable_re = re.compile(r"^\s*Model building for variable\s+(\S+)")
+# e.g. "BIC = -84.0 with z = 1.0 * X1^2 + 1.0 * X2^2"
+_metric_re = re.compile(r"^\s*(\S+)\s*=\s*(\S+)\s+with\s+(\S+)\s*=\s*(.*?)\s*$")
+
+
+def _count_terms(model):
+    try:
+        # e.g. "z = 0.00" while no term is selected yet
+        return 0 if float(model) == 0.0 else 1
+    except ValueError:
+        return model.count(" + ") + model.count(" - ") + 1
+
+
+def parse_progress_line(line):
+    """
+    Parse a line of ALAMO stdout into the progress fields it reports.
+    Args:
+        line: A line of ALAMO stdout.
+    Returns:
+        A dictionary with some of the keys "iteration", "elapsed", "output",
+        "metric", "value" and "nterms", or None if the line reports no
+        progress.
+    """
+    match = _iteration_re.match(line)
+    if match:
+        progress = {"iteration": int(match.group(1))}
+        if match.group(2) is not None:
+            try:
+                progress["elapsed"] = float(match.group(2))
+            except ValueError:
+                pass
+        return progress
+    match = _variable_re.match(line)
+    if match:
+        return {"output": match.group(1)}
+    match = _metric_re.match(line)
+    if match:
+        try:
+            value = float(match.group(2))
+        except ValueError:
+            return None
+        model = match.group(4)
+        return {
+            "metric": match.group(1),
+            "value": value,
+            "output": match.group(3),
+            "nterms": _count_terms(model),
+        }
+    return None
+
+
 def vector_2d(arr):
     """
     Given any array, return a 2D representation of it.
@@ -368,14 +440,87 @@ def vector_2d(arr):
     return [[x for x in item] for item in arr]
 
 
+def array_2d(arr):
+    """
+    Given any numeric array, return a 2D float ndarray representation of it,
+    without copying if it already is one (e.g. a np.memmap).
+    Example:
+        1 -> [[1.]]
+        [1, 2, 3] -> [[1.], [2.], [3.]]
+        [[1], [2], [3]] -> [[1.], [2.], [3.]]
+    """
+    arr = np.asarray(arr, dtype=float)
+    if arr.ndim == 0:
+        return arr.reshape(1, 1)
+    if arr.ndim == 1:
+        return arr.reshape(-1, 1)
+    return arr
+
+
+def get_alamo_path():
+    """
+    Locate the ALAMO executable. The lookup order is the ALAMO_EXEC_PATH
+    environment variable, alamopy.exec_path, an "alamo" executable on the
+    PATH, and finally ~/alamo-linux64/alamo. The result is memoized for as
+    long as these settings do not change.
+    Returns: The path of the executable, as a pathlib.Path.
+    """
+    settings = (
+        os.environ.get("ALAMO_EXEC_PATH"),
+        alamopy.exec_path,
+        os.environ.get("PATH"),
+    )
+    with _alamo_lock:
+        path = _alamo_path_cache.get(settings)
+        if path is None:
+            env_path, config_path, _ = settings
+            if env_path:
+                path = Path(env_path)
+            elif config_path is not None:
+                path = Path(config_path)
+            elif shutil.which("alamo") is not None:
+                path = Path(shutil.which("alamo"))
+            else:
+                path = Path.home() / "alamo-linux64" / "alamo"
+            _alamo_path_cache.clear()
+            _alamo_path_cache[settings] = path
+    return path
+
+
 def get_alamo_version():
     """
-    Get the version of alamo.
+    Get the version of alamo. The executable is probed only once per process,
+    and again only if its modification time changes.
     Returns: The version number, e.g. 2020.5.27
     """
-    exec_result = subprocess.run(
-        [str(exec_path)], check=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-    )
+    path = get_alamo_path()
+    mtime = os.stat(path).st_mtime_ns
+    with _alamo_lock:
+        cached = _alamo_version_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    version = probe_alamo_version(path)
+    with _alamo_lock:
+        _alamo_version_cache[path] = (mtime, version)
+    return version
+
+
+def probe_alamo_version(path):
+    """
+    Run the ALAMO executable at path without arguments and parse its version
+    from the banner, in a scratch directory so that nothing it writes lands
+    in the working directory.
+    Returns: The version number, e.g. 2020.5.27, or 0 if none is printed.
+    """
+    with tempfile.TemporaryDirectory() as scratch:
+        exec_result = subprocess.run(
+            [str(path)],
+            check=False,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=scratch,
+        )
     alm_stdout = exec_result.stdout.decode("utf-8")
     lines = alm_stdout.split("\n")
     for line in lines:
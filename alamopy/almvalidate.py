@@ -0,0 +1,182 @@
+##############################################################################
+# Institute for the Design of Advanced Energy Systems Process Systems
+# Engineering Framework (IDAES PSE Framework) Copyright (c) 2018-2020, by the
+# software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia
+# University Research Corporation, et al. All rights reserved.
+#
+# Please see the files COPYRIGHT.txt and LICENSE.txt for full copyright and
+# license information, respectively. Both files are also available online
+# at the URL "https://github.com/IDAES/idaes-pse".
+##############################################################################
+"""
+almvalidate.py
+Validation of fitted models against (large) held-out data sets, in Python.
+"""
+import numpy as np
+
+from alamopy import almconfidence
+from alamopy import almmodel
+
+# Number of rows evaluated at once by default
+default_chunk_size = 65536
+
+
+def validate(
+    result, xdata, zdata=None, chunk_size=None, threads=None, residuals=False
+):
+    """
+    Compute, for every output of a doalamo result, the metrics ALAMO reports
+    for its models on the given data (see almread.read_lst_file), without
+    ALAMO and without holding more than a few chunks of the data in memory.
+    Args:
+        result: A doalamo result, whose outputs hold a model_fun.
+        xdata: An (n, ninputs) array or np.memmap, or an iterable of
+            (xchunk, zchunk) pairs as for almconfidence.iter_chunks.
+        zdata: The (n, noutputs) array or np.memmap of the outputs, None
+            when xdata is an iterable of chunks.
+        chunk_size: The number of rows evaluated at once, default_chunk_size
+            by default.
+        threads: If given, the number of threads evaluating chunks
+            concurrently (NumPy releases the GIL in most of the work).
+        residuals: If True, also return the residuals (data minus
+            predictions) of every point.
+    Returns:
+        {zlabel: {"SSE": ..., "RMSE": ..., "R2": ..., "MADp": ...,
+                  "max error": ..., "ndata": n}}, with a "residuals" array
+        per output if requested. Outputs without a model are left out.
+    """
+    zlabels = result["in"].get("ZLABELS") or [
+        label for label, output in result["out"].items() if isinstance(output, dict)
+    ]
+    zlabels = [zlabels] if isinstance(zlabels, str) else list(zlabels)
+    models = [_model(result["out"].get(label)) for label in zlabels]
+    chunks = almconfidence.iter_chunks(
+        xdata, zdata, chunk_size or default_chunk_size
+    )
+
+    def evaluate(chunk):
+        xchunk = np.asarray(chunk[0], dtype=float)
+        zchunk = np.asarray(chunk[1], dtype=float)
+        partials = []
+        for k, model in enumerate(models):
+            if model is None:
+                partials.append(None)
+                continue
+            error = zchunk[:, k] - _predict(model, xchunk)
+            partials.append((_chunk_totals(zchunk[:, k], error), error))
+        return partials
+
+    totals = [_Totals() if model is not None else None for model in models]
+    kept = [[] for _ in models]
+    for partials in _map(evaluate, chunks, threads):
+        for k, partial in enumerate(partials):
+            if partial is None:
+                continue
+            totals[k].merge(*partial[0])
+            if residuals:
+                kept[k].append(partial[1])
+
+    metrics = {}
+    for k, label in enumerate(zlabels):
+        if totals[k] is None:
+            continue
+        metrics[label] = totals[k].metrics()
+        if residuals:
+            metrics[label]["residuals"] = np.concatenate(kept[k] or [np.empty(0)])
+    return metrics
+
+
+def _chunk_totals(z, error):
+    """
+    The (ndata, mean, sum of squares about the mean, SSE, sum of relative
+    errors, max error) of the outputs z and errors of a chunk.
+    """
+    if len(z) == 0:
+        return 0, 0.0, 0.0, 0.0, 0.0, 0.0
+    mean = float(z.mean())
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = float(np.sum(np.abs(error / z)))
+    return (
+        len(z),
+        mean,
+        float(np.sum((z - mean) ** 2)),
+        float(error @ error),
+        relative,
+        float(np.abs(error).max()),
+    )
+
+
+class _Totals:
+    """
+    Totals of the chunk totals of an output. The sums of squares about the
+    chunk means are merged as by Chan et al., which stays accurate for
+    outputs far from 0.
+    """
+
+    def __init__(self):
+        self.ndata = 0
+        self.mean = 0.0
+        self.sst = 0.0
+        self.sse = 0.0
+        self.sum_relative = 0.0
+        self.max_error = 0.0
+
+    def merge(self, ndata, mean, sst, sse, sum_relative, max_error):
+        if ndata == 0:
+            return
+        total = self.ndata + ndata
+        delta = mean - self.mean
+        self.sst += sst + delta**2 * self.ndata * ndata / total
+        self.mean += delta * ndata / total
+        self.ndata = total
+        self.sse += sse
+        self.sum_relative += sum_relative
+        self.max_error = max(self.max_error, max_error)
+
+    def metrics(self):
+        n = self.ndata
+        return {
+            "SSE": self.sse,
+            "RMSE": float(np.sqrt(self.sse / n)) if n else 0.0,
+            "R2": 1.0 - self.sse / self.sst if self.sst > 0 else 1.0,
+            "MADp": 100.0 * self.sum_relative / n if n else 0.0,
+            "max error": self.max_error,
+            "ndata": n,
+        }
+
+
+def _model(output):
+    if not isinstance(output, dict):
+        return None
+    return output.get("model_fun")
+
+
+def _predict(model, xchunk):
+    if isinstance(model, almmodel.AlmModel):
+        return model.predict(xchunk)
+    return np.broadcast_to(model(*xchunk.T), (len(xchunk),))
+
+
+def _map(function, chunks, threads):
+    """
+    Yield function(chunk) for every chunk, in order, with at most
+    2 * threads chunks in flight when threads are used.
+    """
+    if not threads or threads <= 1:
+        for chunk in chunks:
+            yield function(chunk)
+        return
+
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(threads) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(function, chunk))
+            if len(pending) >= 2 * threads:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
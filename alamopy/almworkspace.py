@@ -0,0 +1,271 @@
+##############################################################################
+# Institute for the Design of Advanced Energy Systems Process Systems
+# Engineering Framework (IDAES PSE Framework) Copyright (c) 2018-2020, by the
+# software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia
+# University Research Corporation, et al. All rights reserved.
+#
+# Please see the files COPYRIGHT.txt and LICENSE.txt for full copyright and
+# license information, respectively. Both files are also available online
+# at the URL "https://github.com/IDAES/idaes-pse".
+##############################################################################
+"""
+almworkspace.py
+Pooled workspaces for ALAMO runs.
+
+Without a pool, every run creates and removes its own temporary directory.
+A WorkspacePool instead keeps emptied directories around for the next runs,
+preferably on a memory-backed filesystem (/dev/shm), so that repeated fits
+do not churn a possibly networked TMPDIR. The pool is opt-in through the
+"workspace_pool" option:
+    workspace_pool=True uses a process-wide pool (see default_pool).
+    workspace_pool=WorkspacePool(...) uses the given pool.
+"""
+import atexit
+import getpass
+import os
+import shutil
+import tempfile
+import threading
+
+# Directory of memory-backed files, preferred as the root of the pools
+shm_dir = "/dev/shm"
+
+
+class WorkspacePool:
+    """
+    A thread-safe pool of reusable workspace directories.
+
+    Args:
+        root: Directory under which the workspaces are created. Defaults to
+              /dev/shm if it is available, the temporary directory otherwise.
+        size: Number of workspaces created upfront, and maximum number of
+              idle workspaces kept for reuse.
+        fifo: Hand the alm and lst files to ALAMO through named pipes instead
+              of files, when the run allows it (see fifo_usable): runs with
+              a cache or kept files still use files.
+    """
+
+    def __init__(self, root=None, size=None, fifo=False):
+        self.root = root if root is not None else default_root()
+        self.size = size if size is not None else (os.cpu_count() or 1)
+        self.fifo = fifo
+        self._prefix = pool_prefix() + str(os.getpid()) + "-"
+        self._idle = []
+        self._lock = threading.Lock()
+        sweep_stale_workspaces(self.root)
+        for _ in range(self.size):
+            self._idle.append(self._create())
+
+    def acquire(self):
+        """
+        Return an empty workspace reserved for the caller until release.
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._create()
+
+    def release(self, workspace):
+        """
+        Empty a workspace and give it back to the pool. Workspaces that cannot
+        be emptied, or exceed the pool size, are removed instead.
+        """
+        try:
+            clear_directory(workspace)
+        except OSError:
+            shutil.rmtree(workspace, ignore_errors=True)
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(workspace)
+                return
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    def detach(self, workspace):
+        """
+        Take a workspace out of the pool, e.g. to keep the files of a run,
+        and return its new location. Detached workspaces are never swept.
+        """
+        kept = tempfile.mkdtemp(prefix=getpass.getuser() + "-", dir=self.root)
+        os.rmdir(kept)
+        os.rename(workspace, kept)
+        return kept
+
+    def close(self):
+        """
+        Remove every idle workspace of the pool.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for workspace in idle:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    def _create(self):
+        workspace = tempfile.mkdtemp(prefix=self._prefix, dir=self.root)
+        os.chmod(workspace, 0o755)  ## read and write by me, readable for everone else
+        return workspace
+
+
+def default_root():
+    """
+    Return /dev/shm if it is a writable directory, the temporary directory
+    otherwise.
+    """
+    if os.path.isdir(shm_dir) and os.access(shm_dir, os.W_OK | os.X_OK):
+        return shm_dir
+    return tempfile.gettempdir()
+
+
+def pool_prefix():
+    """
+    Return the name prefix of the pooled workspaces of the current user,
+    followed in every name by the id of the owning process.
+    """
+    return getpass.getuser() + "-almpool-"
+
+
+def sweep_stale_workspaces(root):
+    """
+    Remove the pooled workspaces under root left behind by processes of the
+    current user that no longer exist, e.g. after a crash.
+    """
+    prefix = pool_prefix()
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return
+    for name in names:
+        if not name.startswith(prefix):
+            continue
+        try:
+            pid = int(name[len(prefix) :].split("-", 1)[0])
+        except ValueError:
+            continue
+        if not _process_exists(pid):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def _process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def clear_directory(directory):
+    """
+    Remove every entry of a directory, but not the directory itself.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+
+
+_default_pool = None
+_default_pool_pid = None
+_default_pool_lock = threading.Lock()
+
+
+def default_pool():
+    """
+    Return the process-wide pool used by workspace_pool=True. Each process
+    (e.g. each doalamo_batch worker) gets its own, whose idle workspaces are
+    removed when the interpreter exits.
+    """
+    global _default_pool, _default_pool_pid
+    with _default_pool_lock:
+        if _default_pool is None or _default_pool_pid != os.getpid():
+            _default_pool = WorkspacePool()
+            _default_pool_pid = os.getpid()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+
+def get_pool(option):
+    """
+    Resolve the value of the "workspace_pool" option to a WorkspacePool or
+    None.
+    """
+    if option is None or option is False:
+        return None
+    if option is True:
+        return default_pool()
+    return option
+
+
+def fifo_usable(opts):
+    """
+    Whether the alm and lst files of a run can go through named pipes: they
+    are read only once, so nothing else may need them (cache, kept files).
+    """
+    return (
+        hasattr(os, "mkfifo")
+        and opts["cache"] in (None, False)
+        and not opts["keep_alm_file"]
+        and not opts["keep_lst_file"]
+    )
+
+
+def run_through_fifos(opts, write, execute, read):
+    """
+    Run ALAMO with its alm and lst files replaced by named pipes: write()
+    feeds the alm pipe and read() parses the lst pipe in threads while
+    execute() runs ALAMO, so neither file ever touches the filesystem and
+    parsing overlaps with the run.
+    If ALAMO exits without opening a pipe, the waiting thread is released
+    by opening the other end of the pipe, so that the run cannot hang.
+    """
+    alm_fifo, lst_fifo = opts["alm_file_name"], opts["lst_file_name"]
+    os.mkfifo(alm_fifo)
+    os.mkfifo(lst_fifo)
+    errors = []
+
+    def guarded(func):
+        def run():
+            try:
+                func(opts)
+            except BrokenPipeError:
+                pass
+            except Exception as err:  # re-raised in the calling thread
+                errors.append(err)
+
+        return threading.Thread(target=run, daemon=True)
+
+    writer, reader = guarded(write), guarded(read)
+    writer.start()
+    reader.start()
+    try:
+        execute(opts)
+    finally:
+        _release_fifo(alm_fifo, os.O_RDONLY, writer)
+        _release_fifo(lst_fifo, os.O_WRONLY, reader)
+    if errors:
+        raise errors[0]
+    if os.path.isfile(lst_fifo):
+        # ALAMO replaced the pipe by a regular file
+        read(opts)
+
+
+def _release_fifo(path, flags, thread):
+    """
+    Wait for the thread using a pipe, unblocking it by opening the pipe from
+    the other end in case it is still waiting for ALAMO to open it.
+    """
+    thread.join(0.1)
+    while thread.is_alive():
+        try:
+            handle = os.open(path, flags | os.O_NONBLOCK)
+        except OSError:
+            # No reader yet on a write-only open: try again shortly
+            thread.join(0.05)
+            continue
+        os.close(handle)
+        thread.join(0.5)
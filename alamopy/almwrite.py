@@ -16,8 +16,13 @@ Write a .alm file according to the grammar specified by ALAMO. Essentially
     changing the file passed in by the client to fit the syntax necesary for the
     ALAMO to parse through. 
 """
+import numpy as np
+
 from alamopy import almutils
 
+# Sections holding numeric data rows, streamed by write_numeric_section
+numeric_section_names = ["data", "xpredata", "valdata"]
+
 
 def write_alm_file(opts):
     """
@@ -31,7 +36,7 @@ def write_alm_file(opts):
     """
 
     # open the file the client has passed in to write into
-    with open(opts["alm_file_name"], "w+") as alm_file:
+    with open(opts["alm_file_name"], "w") as alm_file:
 
         # Writing all options
         for entry_name in opts["entry_names"]:
@@ -41,6 +46,47 @@ def write_alm_file(opts):
 
         # Writing all sections
         for section_name in opts["section_names"]:
-            if opts[section_name] is not None:
+            if opts[section_name] is None:
+                continue
+            if section_name in numeric_section_names:
+                # stream numeric sections in row blocks
+                write_numeric_section(
+                    alm_file,
+                    section_name,
+                    opts[section_name],
+                    opts.get("float_format") or "%.17g",
+                    opts.get("write_block_rows") or 4096,
+                )
+            else:
                 # write into the file with the sections
                 alm_file.write(almutils.format_section(section_name, opts))
+
+
+def write_numeric_section(
+    alm_file, section_name, values, float_format="%.17g", block_rows=4096
+):
+    """
+    Write a numeric section (e.g. BEGIN_DATA ... END_DATA) to an open alm file
+    in blocks of rows, formatting each block with a single vectorized string
+    operation instead of building the whole section in memory.
+
+    Args:
+        alm_file: A file object opened for writing.
+        section_name: The name of the section, e.g. "data".
+        values: A 1D or 2D array-like of numbers (including np.memmap); a 1D
+            array is written as a single column.
+        float_format: The printf-style format of each value, e.g. "%.17g"
+            (exact round trip) or "%.8g" (smaller files).
+        block_rows: The number of rows formatted and written at a time.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim < 2:
+        values = values.reshape(-1, 1)
+    row_format = " ".join([float_format] * values.shape[1]) + "\n"
+
+    section_name = section_name.upper()
+    alm_file.write("\nBEGIN_" + section_name + "\n")
+    for start in range(0, values.shape[0], block_rows):
+        block = values[start : start + block_rows]
+        alm_file.write((row_format * block.shape[0]) % tuple(block.ravel().tolist()))
+    alm_file.write("END_" + section_name + "\n")
@@ -0,0 +1,126 @@
+"""
+Necessary testing for all functions from almbasis.py
+"""
+
+# import functions from testing from almbasis
+import alamopy.almain as almain
+import alamopy.almbasis as almbasis
+import alamopy.almfake as almfake
+import alamopy.almmodel as almmodel
+import numpy as np
+
+# data setup for tests
+rng = np.random.default_rng(0)
+xdata = rng.random((50, 4)) - 0.2
+all_opts = {
+    "monomialpower": [2, 0.5, -1],
+    "multi2power": [1, 2],
+    "multi3power": [1],
+    "ratiopower": [1],
+    "expfcns": 1,
+    "logfcns": 1,
+    "sinfcns": 1,
+    "cosfcns": 1,
+    "exclude": [0, 0, 1, 0],
+    "custombas": ["X1*exp(X2)", "X4^2/X1"],
+}
+
+
+# candidate_bases test checks
+def testCandidateBases():
+    print("Testing candidateBases...", end="")
+    labels = [
+        almbasis.basis_label(basis, ["X1", "X2"])
+        for basis in almbasis.candidate_bases({"ratiopower": [1]}, 2)
+    ]
+    assert labels == ["X1", "X2", "X1*X2^-1", "X1^-1*X2", "1"]
+    bases = almbasis.candidate_bases(all_opts, 4)
+    # 3 linear, 9 monomials, 12 functions, 6 pairs, 1 triple, 6 ratios,
+    # 2 custom and the constant
+    assert len(bases) == 40
+    assert almbasis.candidate_bases({"linfcns": 0, "constant": 0}, 3) == []
+    print("Passed.")
+
+
+# basis_matrix test checks
+def testBasisMatrix():
+    print("Testing basisMatrix...", end="")
+    matrix, bases, labels = almbasis.basis_matrix(all_opts, xdata)
+    assert matrix.shape == (50, 40)
+    assert labels[0] == "X1" and labels[-1] == "1"
+    assert "X1*X2*X4" in labels and "X1*X2^-1" in labels and "log(X2)" in labels
+    assert labels[-3:-1] == ["X1*exp(X2)", "X1^-1*X4^2"]
+    with np.errstate(all="ignore"):
+        model = almmodel.AlmModel(["X1", "X2", "X3", "X4"], np.ones(40), bases)
+        reference = model.basis(xdata)
+    assert np.array_equal(matrix, reference, equal_nan=True)
+    # Undefined bases, e.g. logarithms of negative inputs, hold nan
+    assert np.isnan(matrix[:, labels.index("log(X1)")]).any()
+    print("Passed.")
+
+
+def testMemo():
+    print("Testing memo...", end="")
+    almbasis.clear_memo()
+    first = almbasis.basis_matrix(all_opts, xdata)[0]
+    # The same data, in another memory layout, hits the memo
+    assert almbasis.basis_matrix(all_opts, np.asfortranarray(xdata))[0] is first
+    assert not first.flags.writeable
+    changed = xdata.copy()
+    changed[0, 0] += 1.0
+    assert almbasis.basis_matrix(all_opts, changed)[0] is not first
+    assert almbasis.basis_matrix({"expfcns": 1}, xdata)[0] is not first
+    labels = almbasis.basis_matrix({"expfcns": 1}, xdata, ["a", "b", "c", "d"])[2]
+    assert labels[:5] == ["a", "b", "c", "d", "exp(a)"]
+    print("Passed.")
+
+
+def testMemoSize():
+    print("Testing memoSize...", end="")
+    almbasis.clear_memo()
+    limits = almbasis.max_memoized_bytes, almbasis.max_memoized_matrix_bytes
+    nbytes = almbasis.basis_matrix(all_opts, xdata)[0].nbytes
+    try:
+        # Matrices above the size threshold are not memoized
+        almbasis.max_memoized_matrix_bytes = nbytes // 2
+        first = almbasis.basis_matrix(all_opts, xdata[1:])[0]
+        assert almbasis.basis_matrix(all_opts, xdata[1:])[0] is not first
+        # The memo holds at most max_memoized_bytes
+        almbasis.max_memoized_matrix_bytes = nbytes
+        almbasis.max_memoized_bytes = 2 * nbytes
+        for scale in range(1, 5):
+            almbasis.basis_matrix(all_opts, scale * xdata)
+        assert len(almbasis._memo) == 2 and almbasis._memo_bytes == 2 * nbytes
+    finally:
+        almbasis.max_memoized_bytes, almbasis.max_memoized_matrix_bytes = limits
+        almbasis.clear_memo()
+    print("Passed.")
+
+
+def testCustomBases():
+    print("Testing customBases...", end="")
+    x = rng.random((30, 2)) + 0.5
+    z = 2.0 * x[:, 0] * np.exp(x[:, 1]) - x[:, 1]
+    opts = {"linfcns": 1, "constant": 0, "custombas": ["X1*exp(X2)"]}
+    result = almain.doalamo(x, z, engine="subset", **opts)
+    assert set(result["out"]["Z1"]["model_fun"].labels) == {"X2", "X1 * exp(X2)"}
+    result = almain.doalamo(x, z, backend=almfake.FakeBackend(), **opts)
+    assert result["in"]["bases"] == ["X1", "X2", "X1*exp(X2)"]
+    assert result["out"]["Z1"]["R2"] > 0.999999
+    print("Passed.")
+
+
+def testAll():
+    testCandidateBases()
+    testBasisMatrix()
+    testMemo()
+    testMemoSize()
+    testCustomBases()
+
+
+def main():
+    testAll()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Import-time benchmark of the ALAMOpy entry points, with a regression budget.
+
+Each module is imported in a fresh interpreter under python -X importtime.
+The benchmark fails if the best cumulative import time over a few runs
+exceeds the budget, or if a heavy optional dependency (sympy, scipy,
+matplotlib) is loaded eagerly.
+
+Usage:
+    python benchmarks/importBench.py [budget_ms]
+"""
+
+import subprocess
+import sys
+
+# Modules that must only be imported by the features that need them
+lazy_modules = ["sympy", "scipy", "matplotlib"]
+entry_points = ["alamopy", "alamopy.almain", "alamopy.almlayer"]
+default_budget_ms = 250.0
+repeats = 5
+
+
+def import_profile(module):
+    """
+    Import module in a fresh interpreter and return ({module: cumulative
+    microseconds}, set of modules loaded).
+    """
+    code = "import sys, %s; print(' '.join(sorted(sys.modules)))" % module
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times, set(result.stdout.split())
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else default_budget_ms
+    failures = []
+    print("%20s %12s   %s" % ("module", "best ms", "eager heavy imports"))
+    for module in entry_points:
+        best = None
+        for _ in range(repeats):
+            times, loaded = import_profile(module)
+            elapsed = times[module] / 1000.0
+            best = elapsed if best is None else min(best, elapsed)
+        eager = [name for name in lazy_modules if name in loaded]
+        print("%20s %12.1f   %s" % (module, best, ", ".join(eager) or "-"))
+        if best > budget_ms:
+            failures.append("%s took %.1f ms (budget %.1f ms)" % (module, best, budget_ms))
+        if eager:
+            failures.append("%s imports %s eagerly" % (module, ", ".join(eager)))
+
+    for failure in failures:
+        print("FAILED: " + failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
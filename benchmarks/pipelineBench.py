@@ -0,0 +1,236 @@
+"""
+Benchmark of the Python side of the ALAMOpy pipeline: almopts.complete_opts,
+almwrite.write_alm_file, almread.read_lst_file, model construction and
+evaluation, and almconfidence, reporting wall time and peak Python memory
+against ndata and ninputs.
+
+read_lst_file runs on synthetic .lst files in the format written by ALAMO,
+so no ALAMO binary is needed. Results can be saved as JSON and compared
+against a previous run to catch regressions before a release.
+
+Usage:
+    python benchmarks/pipelineBench.py [options]
+
+Options:
+    --max-ndata N       Largest ndata, in decades from 1e2 (default 1e6).
+    --ninputs A,B,...   Values of ninputs (default 1,10,50).
+    --max-values N      Skip the cases with more than N data values
+                        ndata * (ninputs + 1) (default 5e7).
+    --phases A,B,...    Only run these phases.
+    --save FILE         Save the results as JSON.
+    --compare FILE      Compare against saved results, and exit with an error
+                        if a phase got slower than --tolerance.
+    --tolerance X       Allowed relative slowdown (default 0.25).
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+# Run from a checkout, without installing alamopy
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import alamopy.almconfidence as almconfidence
+import alamopy.almmodel as almmodel
+import alamopy.almopts as almopts
+import alamopy.almread as almread
+import alamopy.almwrite as almwrite
+
+phase_names = ["complete_opts", "write_alm_file", "read_lst_file", "model", "confidence"]
+
+
+def measure(func, *args):
+    """
+    Return (seconds, peak_bytes) of func(*args). The time is measured on an
+    untraced call, since tracemalloc slows down allocation-heavy code.
+    """
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def synthetic_case(ndata, ninputs, seed=0):
+    """
+    Return (xdata, zdata, model_str, xlabels) of a synthetic fit: zdata is a
+    quadratic in all inputs, plus noise.
+    """
+    rng = np.random.default_rng(seed)
+    xdata = rng.random((ndata, ninputs)) + 0.1
+    coeffs = rng.uniform(-2.0, 2.0, ninputs)
+    zdata = (xdata**2) @ coeffs + 0.01 * rng.standard_normal(ndata)
+    xlabels = ["X%d" % (j + 1) for j in range(ninputs)]
+    terms = ["%.15g * %s^2" % (coeff, label) for coeff, label in zip(coeffs, xlabels)]
+    model_str = "z = " + " + ".join(terms).replace("+ -", "- ")
+    return xdata, zdata, model_str, xlabels
+
+
+def write_synthetic_lst(path, xdata, zdata, model_str, xlabels):
+    """
+    Write an .lst file in ALAMO's format: input summary, labels, data echo,
+    bases, quality metrics, chosen terms and times.
+    """
+    ndata, ninputs = xdata.shape
+    terms = model_str.split("=")[1].replace(" - ", " + -").split(" + ")
+    with open(path, "w") as lst_file:
+        lst_file.write(" ALAMO input summary\n")
+        lst_file.write(" NINPUTS        = %d\n" % ninputs)
+        lst_file.write(" NOUTPUTS       = 1\n")
+        lst_file.write(" NDATA          = %d\n" % ndata)
+        lst_file.write(" " + "=" * 75 + "\n")
+        lst_file.write(" XLABELS    XMIN      XMAX      XISINT\n")
+        for j, label in enumerate(xlabels):
+            lst_file.write(
+                " %s  %.6g  %.6g  F\n" % (label, xdata[:, j].min(), xdata[:, j].max())
+            )
+        lst_file.write(" ZLABELS    ZMIN      ZMAX      ZISINT\n")
+        lst_file.write(" z  %.6g  %.6g  F\n\n" % (zdata.min(), zdata.max()))
+        lst_file.write(" XDATA and ZDATA\n")
+        np.savetxt(lst_file, np.column_stack((xdata, zdata)), fmt="%.10g")
+        lst_file.write(" " + "=" * 75 + "\n")
+        lst_file.write(" BASES considered\n")
+        for label in xlabels:
+            lst_file.write(" %s\n %s^2\n" % (label, label))
+        lst_file.write(" " + "=" * 75 + "\n")
+        lst_file.write("\n Quality metrics for output z\n ----\n")
+        lst_file.write(" SSE:               0.1\n R2:                0.99\n\n")
+        lst_file.write(" BETAS and BASES chosen for this output\n")
+        for term in terms:
+            coeff, basis = term.strip().split(" * ")
+            lst_file.write(" %s     %s\n" % (coeff, basis))
+        lst_file.write("\n Total execution time 0.1 s\n Times breakdown\n")
+        lst_file.write("     OLR time:        0.1 s\n     MIP time:        0.1 s\n")
+        lst_file.write("     All other time:  0.1 s\n\n Normal termination\n")
+
+
+def make_opts(xdata, zdata, path):
+    opts = almopts.prepare_default_opts()
+    opts["xdata"] = xdata
+    opts["zdata"] = zdata
+    opts["alm_file_name"] = path
+    return opts
+
+
+def bench_complete_opts(xdata, zdata, path):
+    opts = make_opts(xdata, zdata, path)
+    almopts.validate_opts(opts)
+    almopts.complete_opts(opts)
+
+
+def bench_write(opts):
+    almwrite.write_alm_file(opts)
+
+
+def bench_read(path):
+    opts = {"lst_file_name": path, "return": {"in": {}, "out": {}, "other": {}}}
+    almread.read_lst_file(opts)
+
+
+def bench_model(model_str, xlabels, xdata):
+    almmodel.AlmModel.from_model_str(model_str, xlabels).predict(xdata)
+
+
+def bench_confidence(model_str, xlabels, xdata):
+    data = {"model": model_str, "xlabels": xlabels, "ssr": 1.0}
+    almconfidence.almconfidence(data, xdata)
+
+
+def run_case(ndata, ninputs, phases, workdir):
+    """
+    Return {phase: (seconds, peak_bytes)} of one (ndata, ninputs) case.
+    """
+    xdata, zdata, model_str, xlabels = synthetic_case(ndata, ninputs)
+    alm_path = os.path.join(workdir, "bench.alm")
+    lst_path = os.path.join(workdir, "bench.lst")
+    results = {}
+    if "complete_opts" in phases:
+        results["complete_opts"] = measure(bench_complete_opts, xdata, zdata, alm_path)
+    if "write_alm_file" in phases:
+        opts = make_opts(xdata, zdata, alm_path)
+        almopts.complete_opts(opts)
+        results["write_alm_file"] = measure(bench_write, opts)
+        del opts
+        os.remove(alm_path)
+    if "read_lst_file" in phases:
+        write_synthetic_lst(lst_path, xdata, zdata, model_str, xlabels)
+        results["read_lst_file"] = measure(bench_read, lst_path)
+        os.remove(lst_path)
+    if "model" in phases:
+        results["model"] = measure(bench_model, model_str, xlabels, xdata)
+    if "confidence" in phases:
+        results["confidence"] = measure(bench_confidence, model_str, xlabels, xdata)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return the list of (key, seconds, baseline seconds) slower than the
+    baseline by more than tolerance.
+    """
+    slower = []
+    for key, (seconds, _) in results.items():
+        if key in baseline and seconds > baseline[key][0] * (1 + tolerance):
+            slower.append((key, seconds, baseline[key][0]))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--max-ndata", type=float, default=1e6)
+    parser.add_argument("--ninputs", default="1,10,50")
+    parser.add_argument("--max-values", type=float, default=5e7)
+    parser.add_argument("--phases", default=",".join(phase_names))
+    parser.add_argument("--save")
+    parser.add_argument("--compare")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    ninputs_values = [int(value) for value in args.ninputs.split(",")]
+    phases = args.phases.split(",")
+    workdir = tempfile.mkdtemp()
+    # Warming up, so that lazy imports are not timed in the first case
+    run_case(100, 1, phases, workdir)
+
+    print("%-16s %10s %8s %12s %12s" % ("phase", "ndata", "ninputs", "seconds", "peak MiB"))
+    results = {}
+    ndata = 100
+    while ndata <= args.max_ndata:
+        for ninputs in ninputs_values:
+            if ndata * (ninputs + 1) > args.max_values:
+                print("%-16s %10d %8d %12s" % ("(skipped)", ndata, ninputs, "-"))
+                continue
+            for phase, (seconds, peak) in run_case(ndata, ninputs, phases, workdir).items():
+                results["%s/%d/%d" % (phase, ndata, ninputs)] = (seconds, peak)
+                print(
+                    "%-16s %10d %8d %12.4f %12.2f"
+                    % (phase, ndata, ninputs, seconds, peak / 2**20)
+                )
+                sys.stdout.flush()
+        ndata *= 10
+    os.rmdir(workdir)
+
+    if args.save:
+        with open(args.save, "w") as save_file:
+            json.dump(results, save_file, indent=1)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        slower = compare(results, baseline, args.tolerance)
+        for key, seconds, reference in slower:
+            print("REGRESSION %s: %.4f s against %.4f s" % (key, seconds, reference))
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
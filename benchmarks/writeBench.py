@@ -0,0 +1,84 @@
+"""
+Benchmark of writing the DATA section of an alm file: the legacy
+almutils.format_section path against the streamed
+almwrite.write_numeric_section, reporting wall time and peak Python memory
+against ndata.
+
+Usage:
+    python benchmarks/writeBench.py [max_ndata] [ninputs]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+# Run from a checkout, without installing alamopy
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import alamopy.almutils as almutils
+import alamopy.almwrite as almwrite
+
+
+def measure(func, *args):
+    """
+    Return (seconds, peak_bytes) of func(*args). The time is measured on an
+    untraced call, since tracemalloc slows down allocation-heavy code.
+    """
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def write_legacy(path, data):
+    opts = {"data": almutils.zip_2d_lists(data[0].tolist(), data[1].tolist())}
+    with open(path, "w") as alm_file:
+        alm_file.write(almutils.format_section("data", opts))
+
+
+def write_streamed(path, data):
+    with open(path, "w") as alm_file:
+        almwrite.write_numeric_section(alm_file, "data", np.hstack(data))
+
+
+def main():
+    max_ndata = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10**6
+    ninputs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    path = os.path.join(tempfile.mkdtemp(), "bench.alm")
+
+    print(
+        "%10s %14s %14s %14s %14s"
+        % ("ndata", "legacy s", "legacy MiB", "streamed s", "streamed MiB")
+    )
+    ndata = 100
+    while ndata <= max_ndata:
+        xdata = np.random.rand(ndata, ninputs)
+        zdata = np.sum(xdata**2, axis=1, keepdims=True)
+        legacy_time, legacy_peak = measure(write_legacy, path, (xdata, zdata))
+        streamed_time, streamed_peak = measure(write_streamed, path, (xdata, zdata))
+        print(
+            "%10d %14.4f %14.2f %14.4f %14.2f"
+            % (
+                ndata,
+                legacy_time,
+                legacy_peak / 2**20,
+                streamed_time,
+                streamed_peak / 2**20,
+            )
+        )
+        ndata *= 10
+
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Necessary testing for all functions from almcache.py
+"""
+
+import os
+import tempfile
+
+# import functions from testing from almcache
+import alamopy.almain as almain
+import alamopy.almcache as almcache
+import alamopy.almfake as almfake
+import numpy as np
+
+
+def make_result(model_str):
+    result = {"in": {"XLABELS": ["X1", "X2"]}, "out": {}, "other": {}}
+    result["out"]["stdout"] = ""
+    result["out"]["z"] = {"model_str": model_str, "R2": 1.0}
+    return result
+
+
+# memory tier test checks
+def testMemoryTier():
+    print("Testing memoryTier...", end="")
+    cache = almcache.AlmCache(max_entries=2)
+    cache.put("a", "lst a", make_result("1.0 * X1"))
+    cache.put("b", "lst b", make_result("2.0 * X1"))
+    assert cache.get("a")["lst"] == "lst a"
+    # "b" is now the least recently used entry
+    cache.put("c", "lst c", make_result("3.0 * X1"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    print("Passed.")
+
+
+# disk tier test checks
+def testDiskTier():
+    print("Testing diskTier...", end="")
+    directory = tempfile.mkdtemp()
+    cache = almcache.AlmCache(directory=directory)
+    cache.put("a", "lst a", make_result("1.0 * X1 - 0.5 * X2^3"))
+
+    # A fresh cache on the same directory reads the result back from disk
+    entry = almcache.AlmCache(directory=directory).get("a")
+    assert entry["lst"] == "lst a"
+    assert entry["result"]["out"]["z"]["R2"] == 1.0
+    assert entry["result"]["out"]["z"]["model_fun"](2.0, 1.0) == 1.5
+
+    cache.clear()
+    assert os.listdir(directory) == []
+    os.rmdir(directory)
+    print("Passed.")
+
+
+# disk eviction test checks
+def testDiskEviction():
+    print("Testing diskEviction...", end="")
+    directory = tempfile.mkdtemp()
+    cache = almcache.AlmCache(directory=directory, max_disk_bytes=3000)
+    for key in ["a", "b", "c"]:
+        cache.put(key, "x" * 1200, make_result("1.0 * X1"))
+    sizes = [os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)]
+    assert len(sizes) == 2 and sum(sizes) <= 3000
+    assert not os.path.exists(os.path.join(directory, "a.pkl"))
+    cache.clear()
+    os.rmdir(directory)
+    print("Passed.")
+
+
+# load test checks
+def testLoadFlagsCached():
+    print("Testing loadFlagsCached...", end="")
+    cache = almcache.AlmCache()
+    cache.put("a", "lst a", make_result("1.0 * X1"))
+    opts = {"return": None, "keep_lst_file": False}
+    assert almcache.load(cache, "a", opts)
+    assert opts["return"]["other"]["cached"]
+    assert not almcache.load(cache, "b", opts)
+    print("Passed.")
+
+
+def testResultOptions():
+    print("Testing resultOptions...", end="")
+    cache = almcache.AlmCache()
+    xdata = np.random.rand(20, 2)
+    zdata = xdata[:, 0] + 2.0 * xdata[:, 1]
+    opts = {"backend": almfake.FakeBackend(), "cache": cache}
+    first = almain.doalamo(xdata, zdata, skip_data_echo=True, **opts)
+    assert "XDATA and ZDATA" not in first["in"]
+    # The same alm file, parsed with the data echo, is another entry
+    second = almain.doalamo(xdata, zdata, **opts)
+    assert not second["other"]["cached"]
+    assert second["in"]["XDATA and ZDATA"].shape == (20, 3)
+    third = almain.doalamo(xdata, zdata, **opts)
+    assert third["other"]["cached"]
+    print("Passed.")
+
+
+def testAll():
+    testMemoryTier()
+    testDiskTier()
+    testDiskEviction()
+    testLoadFlagsCached()
+    testResultOptions()
+
+
+def main():
+    testAll()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Necessary testing for all functions from almconfidence.py
+"""
+
+import os
+import tempfile
+
+# import functions from testing from almconfidence
+import alamopy.almconfidence as almconfidence
+import numpy as np
+from scipy.stats import t
+
+xdata = np.random.rand(200, 2) + 0.1
+xlabels = ["X1", "X2"]
+
+
+def reference_intervals(sensmat, ssr):
+    """
+    Covariance and intervals through the explicit inverse of X^T X.
+    """
+    ndata, nterms = sensmat.shape
+    sigma = ssr / (ndata - nterms)
+    covar = sigma * np.linalg.inv(sensmat.T @ sensmat)
+    return covar, t.ppf(0.975, ndata - nterms) * np.sqrt(np.diag(covar))
+
+
+# almconfidence test checks
+def testAlmconfidence():
+    print("Testing almconfidence...", end="")
+    x1, x2 = xdata[:, 0], xdata[:, 1]
+    data = {}
+    data["model"] = "z = 1.5 * X1^2 - 0.5 * X1 * X2 + 2.0 * exp(X2) + 0.3 * X1/X2 - 1.25"
+    data["xlabels"] = xlabels
+    data["ssr"] = 0.37
+    data["xdata"] = xdata
+    data = almconfidence.almconfidence(data)
+
+    sensmat = np.column_stack([x1**2, x1 * x2, np.exp(x2), x1 / x2, np.ones(len(x1))])
+    covar, ci = reference_intervals(sensmat, 0.37)
+    assert np.allclose(data["covariance"], covar, rtol=1e-8, atol=0)
+    coeffs = [1.5, -0.5, 2.0, 0.3, -1.25]
+    for j, interval in enumerate(data["conf_inv"]):
+        name, value = interval.split(" : ")
+        assert name == "B" + str(j + 1)
+        coeff, half_width = value.split("+/-")
+        assert float(coeff) == coeffs[j]
+        assert abs(float(half_width) - ci[j]) < 1e-8 * ci[j]
+    print("Passed.")
+
+
+# multi-output almconfidence test checks
+def testAlmconfidenceMultiOutput():
+    print("Testing almconfidenceMultiOutput...", end="")
+    x1, x2 = xdata[:, 0], xdata[:, 1]
+    data = {}
+    data["model"] = {
+        "z1": "z1 = 1.5 * X1^2 + 2.0 * exp(X2) - 1.25",
+        "z2": "z2 = -0.5 * X1 * X2 + 2.0 * exp(X2) + 0.75 * tanh(X1)",
+    }
+    data["xlabels"] = xlabels
+    data["ssr"] = {"z1": 0.37, "z2": 0.12}
+    data["xdata"] = xdata
+    result = almconfidence.almconfidence(data)
+    assert result is data
+
+    sensmats = {
+        "z1": np.column_stack([x1**2, np.exp(x2), np.ones(len(x1))]),
+        "z2": np.column_stack([x1 * x2, np.exp(x2), np.tanh(x1)]),
+    }
+    coeffs = {"z1": [1.5, 2.0, -1.25], "z2": [-0.5, 2.0, 0.75]}
+    for okey, sensmat in sensmats.items():
+        covar, ci = reference_intervals(sensmat, data["ssr"][okey])
+        assert np.allclose(data["covariance"][okey], covar, rtol=1e-8, atol=0)
+        assert np.allclose(data["ci"][okey], ci, rtol=1e-8, atol=0)
+        assert data["coeffs"][okey].tolist() == coeffs[okey]
+        assert len(data["conf_inv"][okey]) == len(coeffs[okey])
+    print("Passed.")
+
+
+# chunked almconfidence test checks
+def testAlmconfidenceChunked():
+    print("Testing almconfidenceChunked...", end="")
+    models = {
+        "z1": "z1 = 1.5 * X1^2 + 2.0 * exp(X2) - 1.25",
+        "z2": "z2 = -0.5 * X1 * X2 + 0.75 * tanh(X1)",
+    }
+    noise = 0.01 * np.random.randn(len(xdata), 2)
+    zdata = np.column_stack(
+        [
+            1.5 * xdata[:, 0] ** 2 + 2.0 * np.exp(xdata[:, 1]) - 1.25,
+            -0.5 * xdata[:, 0] * xdata[:, 1] + 0.75 * np.tanh(xdata[:, 0]),
+        ]
+    ) + noise
+    ssr = {"z1": float(noise[:, 0] @ noise[:, 0]), "z2": float(noise[:, 1] @ noise[:, 1])}
+    expected = almconfidence.almconfidence(
+        {"model": models, "xlabels": xlabels, "ssr": ssr, "xdata": xdata}
+    )
+
+    workdir = tempfile.mkdtemp()
+    xpath = os.path.join(workdir, "xdata.npy")
+    zpath = os.path.join(workdir, "zdata.npy")
+    np.save(xpath, xdata)
+    np.save(zpath, zdata)
+    try:
+        xmap = np.load(xpath, mmap_mode="r")
+        zmap = np.load(zpath, mmap_mode="r")
+        from_memmap = almconfidence.almconfidence(
+            {"model": dict(models), "xlabels": xlabels}, xmap, zmap, chunk_size=64
+        )
+        del xmap, zmap
+    finally:
+        os.remove(xpath)
+        os.remove(zpath)
+        os.rmdir(workdir)
+    chunks = ((xdata[i : i + 50], zdata[i : i + 50]) for i in range(0, len(xdata), 50))
+    from_generator = almconfidence.almconfidence(
+        {"model": dict(models), "xlabels": xlabels}, chunks
+    )
+
+    for result in [from_memmap, from_generator]:
+        for okey in models:
+            assert np.allclose(
+                result["covariance"][okey], expected["covariance"][okey], rtol=1e-8, atol=0
+            )
+            assert np.allclose(result["ci"][okey], expected["ci"][okey], rtol=1e-8, atol=0)
+    print("Passed.")
+
+
+# sympy fallback test checks
+def testSensitivityMatrixFallback():
+    print("Testing sensitivityMatrixFallback...", end="")
+    x1, x2 = xdata[:, 0], xdata[:, 1]
+    model = "z = 1.5 * X1^2 - 2.0 * tanh(X2) + 3"
+    coeffs, sensmat = almconfidence.sensitivity_matrix(model, xlabels, xdata)
+    assert coeffs.tolist() == [1.5, -2.0, 3.0]
+    assert np.allclose(sensmat, np.column_stack([x1**2, np.tanh(x2), np.ones(len(x1))]))
+    print("Passed.")
+
+
+def testAll():
+    testAlmconfidence()
+    testAlmconfidenceMultiOutput()
+    testAlmconfidenceChunked()
+    testSensitivityMatrixFallback()
+
+
+def main():
+    testAll()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Necessary testing for all functions from almfake.py
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# import functions from testing from almfake
+import alamopy.almain as almain
+import alamopy.almcache as almcache
+import alamopy.almexec as almexec
+import alamopy.almfake as almfake
+import alamopy.almlayer as almlayer
+import numpy as np
+
+# data setup for tests
+xdata = np.random.rand(20, 2) + 0.5
+zdata = 3.0 * xdata[:, 0] ** 2 - 2.0 * xdata[:, 0] / xdata[:, 1] + 1.0
+
+
+def check_fit(result):
+    assert result["other"]["termination"] == "normal"
+    output = result["out"]["Z1"]
+    assert output["R2"] > 0.999999
+    assert "Model building for variable Z1" in result["out"]["stdout"]
+    pred = output["model_fun"](xdata[:, 0], xdata[:, 1])
+    assert np.allclose(pred, zdata)
+
+
+# FakeBackend test checks
+def testFakeBackend():
+    print("Testing fakeBackend...", end="")
+    backend = almfake.FakeBackend()
+    result = almain.doalamo(
+        xdata, zdata, backend=backend, monomialpower=[2], ratiopower=[1]
+    )
+    check_fit(result)
+    assert result["out"]["Z1"]["Model size"] == 7
+    print("Passed.")
+
+
+def testFakeLatency():
+    print("Testing fakeLatency...", end="")
+    backend = almfake.FakeBackend(latency=5.0)
+    start = time.perf_counter()
+    result = almain.doalamo(xdata, zdata, backend=backend, timeout=0.2)
+    assert time.perf_counter() - start < 4
+    assert result["other"]["termination"] == "timeout"
+    cancel = threading.Event()
+    threading.Timer(0.2, cancel.set).start()
+    start = time.perf_counter()
+    result = asyncio.run(
+        almain.doalamo_async(xdata, zdata, backend=backend, cancel=cancel)
+    )
+    assert time.perf_counter() - start < 4
+    assert result["other"]["termination"] == "cancelled"
+
+    async def run_all():
+        backend = almfake.FakeBackend(latency=0.5)
+        # The fake does not use the CPU while waiting, so the runs are not
+        # bounded by the default limit of one run per CPU
+        semaphore = asyncio.Semaphore(8)
+        opts = {"backend": backend, "monomialpower": [2], "ratiopower": [1]}
+        return await asyncio.gather(
+            *[
+                almain.doalamo_async(xdata, zdata, semaphore=semaphore, **opts)
+                for _ in range(8)
+            ]
+        )
+
+    start = time.perf_counter()
+    results = asyncio.run(run_all())
+    # The runs overlap instead of taking 8 * 0.5 s in a row
+    assert time.perf_counter() - start < 3
+    for result in results:
+        check_fit(result)
+    print("Passed.")
+
+
+def testFakeSubprocess():
+    print("Testing fakeSubprocess...", end="")
+    package_dir = os.path.dirname(os.path.abspath(almfake.__file__))
+    pythonpath = os.environ.get("PYTHONPATH")
+    os.environ["PYTHONPATH"] = os.path.dirname(package_dir)
+    try:
+        backend = almexec.BinaryBackend([sys.executable, "-m", "alamopy.almfake"])
+        result = almain.doalamo(
+            xdata, zdata, backend=backend, monomialpower=[2], ratiopower=[1]
+        )
+    finally:
+        if pythonpath is None:
+            del os.environ["PYTHONPATH"]
+        else:
+            os.environ["PYTHONPATH"] = pythonpath
+    check_fit(result)
+    assert result["other"]["return_code"] == 0
+    print("Passed.")
+
+
+def testFakeCache():
+    print("Testing fakeCache...", end="")
+    cache = almcache.AlmCache()
+    backend = almfake.FakeBackend()
+    opts = {"backend": backend, "cache": cache, "monomialpower": [2], "ratiopower": [1]}
+    first = almain.doalamo(xdata, zdata, **opts)
+    second = almain.doalamo(xdata, zdata, **opts)
+    assert not first["other"].get("cached")
+    assert second["other"]["cached"]
+    assert second["out"]["Z1"]["model_str"] == first["out"]["Z1"]["model_str"]
+    print("Passed.")
+
+
+def testAlamoAsync():
+    print("Testing alamoAsync...", end="")
+    backend = almfake.FakeBackend()
+    result = asyncio.run(
+        almlayer.alamo_async(
+            xdata, zdata, backend=backend, monomialpower=[2], ratiopower=[1]
+        )
+    )
+    check_fit(result)
+    # The legacy keys describe the first output, not the ALAMO stdout
+    assert result["model"].startswith("Z1 = ")
+    assert result["R2"] == result["out"]["Z1"]["R2"]
+    assert result["version"] == backend.version()
+    print("Passed.")
+
+
+def testAll():
+    testFakeBackend()
+    testFakeLatency()
+    testFakeSubprocess()
+    testFakeCache()
+    testAlamoAsync()
+
+
+def main():
+    testAll()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Necessary testing for all functions from almain.py
+"""
+
+import asyncio
+import getpass
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# import functions from testing from almain
+import alamopy.almain as almain
+import numpy as np
+
+def list_workspaces():
+    prefix = getpass.getuser() + "-"
+    return {name for name in os.listdir(tempfile.gettempdir()) if name.startswith(prefix)}
+
+
+# data setup for tests
+xdata = np.random.rand(10, 2)
+zdata = xdata[:, 0] ** 2 + xdata[:, 1] ** 2
+
+
+# doalamo test checks
+def testDoalamoKeepsCwd():
+    print("Testing doalamoKeepsCwd...", end="")
+    initial_directory = os.getcwd()
+    workspaces = list_workspaces()
+    try:
+        almain.doalamo(xdata, zdata)
+    except OSError:
+        # No ALAMO executable available on this machine
+        pass
+    assert os.getcwd() == initial_directory
+    assert list_workspaces() == workspaces
+    print("Passed.")
+
+
+# doalamo_batch test checks
+def testDoalamoBatchErrors():
+    print("Testing doalamoBatchErrors...", end="")
+    jobs = {"no_data": {}, "no_zdata": {"xdata": xdata}}
+    results = list(almain.doalamo_batch(jobs, max_workers=2))
+    assert sorted(job_id for job_id, _, _ in results) == ["no_data", "no_zdata"]
+    for _, result, error in results:
+        assert result is None
+        assert isinstance(error, RuntimeError)
+    print("Passed.")
+
+
+# doalamo_async test checks
+def testDoalamoAsyncCancel():
+    print("Testing doalamoAsyncCancel...", end="")
+    # Stand-in for ALAMO that never finishes on its own
+    script_dir = tempfile.mkdtemp()
+    script = os.path.join(script_dir, "alamo")
+    with open(script, "w") as script_file:
+        script_file.write("#!/bin/sh\nexec sleep 30\n")
+    os.chmod(script, stat.S_IRWXU)
+    workspaces = list_workspaces()
+
+    async def run_and_cancel():
+        task = asyncio.ensure_future(almain.doalamo_async(xdata, zdata))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    os.environ["ALAMO_EXEC_PATH"] = script
+    try:
+        start = time.perf_counter()
+        assert asyncio.run(run_and_cancel())
+        assert time.perf_counter() - start < 10
+    finally:
+        del os.environ["ALAMO_EXEC_PATH"]
+        os.remove(script)
+        os.rmdir(script_dir)
+    assert list_workspaces() == workspaces
+    print("Passed.")
+
+
+def process_gone(pid):
+    """
+    Whether a process no longer runs (a zombie waiting for init counts).
+    """
+    try:
+        with open("/proc/%d/stat" % pid) as stat_file:
+            return stat_file.read().split(")")[-1].split()[0] == "Z"
+    except FileNotFoundError:
+        return True
+
+
+# doalamo timeout and cancel test checks
+def testDoalamoTimeoutAndCancel():
+    print("Testing doalamoTimeoutAndCancel...", end="")
+    # Stand-in for ALAMO that hangs in a child process after some output
+    script_dir = tempfile.mkdtemp()
+    script = os.path.join(script_dir, "alamo")
+    pid_file = os.path.join(script_dir, "child.pid")
+    with open(script, "w") as script_file:
+        script_file.write(
+            "#!/bin/sh\necho 'Iteration 1'\nsleep 30 &\necho $! > %s\nwait\n" % pid_file
+        )
+    os.chmod(script, stat.S_IRWXU)
+    workspaces = list_workspaces()
+
+    os.environ["ALAMO_EXEC_PATH"] = script
+    try:
+        start = time.perf_counter()
+        result = almain.doalamo(xdata, zdata, timeout=0.5)
+        assert time.perf_counter() - start < 10
+        assert result["other"]["termination"] == "timeout"
+        assert result["other"]["return_code"] == -1
+        assert "Iteration 1" in result["out"]["stdout"]
+        with open(pid_file) as child_pid:
+            child = int(child_pid.read())
+        deadline = time.perf_counter() + 5
+        while not process_gone(child) and time.perf_counter() < deadline:
+            time.sleep(0.05)
+        assert process_gone(child)
+
+        cancel = threading.Event()
+        threading.Timer(0.3, cancel.set).start()
+        start = time.perf_counter()
+        result = almain.doalamo(xdata, zdata, cancel=cancel)
+        assert time.perf_counter() - start < 10
+        assert result["other"]["termination"] == "cancelled"
+
+        result = asyncio.run(almain.doalamo_async(xdata, zdata, timeout=0.5))
+        assert result["other"]["termination"] == "timeout"
+
+        cancel = threading.Event()
+        threading.Timer(0.3, cancel.set).start()
+        start = time.perf_counter()
+        result = asyncio.run(almain.doalamo_async(xdata, zdata, cancel=cancel))
+        assert time.perf_counter() - start < 10
+        assert result["other"]["termination"] == "cancelled"
+    finally:
+        del os.environ["ALAMO_EXEC_PATH"]
+        shutil.rmtree(script_dir)
+    assert list_workspaces() == workspaces
+    print("Passed.")
+
+
+# streamed output and progress test checks
+def testDoalamoProgress():
+    print("Testing doalamoProgress...", end="")
+    script_dir = tempfile.mkdtemp()
+    script = os.path.join(script_dir, "alamo")
+    lines = [" filler line %d" % i for i in range(1000)] + [
+        " Iteration 1 (Approx. elapsed time 0.44E-02 s)",
+        " Model building for variable z",
+        " BIC = -52.8 with z = 0.00",
+        " BIC = -84.0 with z =  - 0.19 * X1 + 0.20 * X2",
+        " ALAMO terminated with termination code 5",
+    ]
+    with open(script, "w") as script_file:
+        script_file.write("#!/bin/sh\ncat <<'EOF'\n" + "\n".join(lines) + "\nEOF\n")
+    os.chmod(script, stat.S_IRWXU)
+    events = []
+
+    os.environ["ALAMO_EXEC_PATH"] = script
+    try:
+        result = almain.doalamo(
+            xdata, zdata, progress_callback=events.append, max_output_lines=3
+        )
+    finally:
+        del os.environ["ALAMO_EXEC_PATH"]
+        shutil.rmtree(script_dir)
+    assert [event.get("nterms") for event in events] == [None, None, 0, 2]
+    assert events[-1] == {
+        "iteration": 1,
+        "elapsed": 0.0044,
+        "output": "z",
+        "metric": "BIC",
+        "value": -84.0,
+        "nterms": 2,
+    }
+    assert result["other"]["progress"] == events[-1]
+    assert result["out"]["stdout"].splitlines() == lines[-3:]
+    assert result["other"]["return_code"] == 5
+    print("Passed.")
+
+
+# lazy import test checks
+def testLazyImports():
+    print("Testing lazyImports...", end="")
+    code = "import sys, alamopy.almain, alamopy.almlayer; print(' '.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True)
+    loaded = result.stdout.decode("utf-8").split()
+    for name in ["sympy", "scipy", "matplotlib", "asyncio"]:
+        assert name not in loaded, name
+    print("Passed.")
+
+
+def testAll():
+    testDoalamoKeepsCwd()
+    testDoalamoBatchErrors()
+    testDoalamoAsyncCancel()
+    testDoalamoTimeoutAndCancel()
+    testDoalamoProgress()
+    testLazyImports()
+
+
+def main():
+    testAll()
+
+
+if __name__ == "__main__":
+    main()
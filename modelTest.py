@@ -0,0 +1,122 @@
+"""
+Necessary testing for all functions from almmodel.py
+"""
+
+import os
+import pickle
+
+# import functions from testing from almmodel
+import alamopy.almmodel as almmodel
+import alamopy.almopts as almopts
+import alamopy.almread as almread
+import alamopy.almutils as almutils
+import numpy as np
+
+xlabels = ["X1", "X2", "X3"]
+terms = [
+    "1.0 X1^2",
+    "-0.5 X1 X2",
+    "2.0 exp(X1)",
+    "-1.25",
+    "0.3 X1/X2",
+    "0.1E-02 (X1/X3)^2",
+    "1.5 log(X2)",
+    "0.7 sin(X3)",
+    "0.2 cos(X1)",
+    "3 X2^-1",
+    "0.5 X1^0.5",
+    "-2.5 X1^3 X2 X3^2",
+]
+xdata = np.random.rand(500, 3) + 0.1
+
+
+# from_terms test checks
+def testFromTermsMatchesLambdify():
+    print("Testing fromTermsMatchesLambdify...", end="")
+    model = almmodel.AlmModel.from_terms(terms, xlabels)
+    model_fun = almread.lambdify_model_str(almutils.represent_model_str(terms), xlabels)
+    expected = model_fun(xdata[:, 0], xdata[:, 1], xdata[:, 2])
+    assert np.allclose(model.predict(xdata), expected, rtol=1e-12, atol=1e-12)
+    assert np.allclose(model(xdata[:, 0], xdata[:, 1], xdata[:, 2]), expected)
+    assert np.allclose(model.basis(xdata) @ model.coeffs, expected)
+    assert abs(model(0.5, 0.6, 0.7) - model_fun(0.5, 0.6, 0.7)) < 1e-12
+    print("Passed.")
+
+
+# from_model_str test checks
+def testFromModelStr():
+    print("Testing fromModelStr...", end="")
+    model_str = "z = " + almutils.represent_model_str(terms)
+    model = almmodel.AlmModel.from_model_str(model_str, xlabels)
+    assert np.allclose(model.coeffs, almmodel.AlmModel.from_terms(terms, xlabels).coeffs)
+    assert model.labels[:4] == ["X1^2", "X1 * X2", "exp(X1)", "1"]
+    print("Passed.")
+
+
+# split_terms test checks
+def testSplitTerms():
+    print("Testing splitTerms...", end="")
+    assert almmodel.split_terms(" - 0.5 * X1 * X2 + 2.0 * exp(X1) - 1.25") == [
+        "-0.5 * X1 * X2",
+        "2.0 * exp(X1)",
+        "-1.25",
+    ]
+    assert almmodel.split_terms("0.1E-02 * X1^-1") == ["0.1E-02 * X1^-1"]
+    print("Passed.")
+
+
+# parse_basis test checks
+def testParseBasis():
+    print("Testing parseBasis...", end="")
+    index = {"X1": 0, "X2": 1}
+    assert almmodel.parse_basis("X1^2", index) == (1.0, ((0, 2.0),), ())
+    assert almmodel.parse_basis("X1/X2", index) == (1.0, ((0, 1.0), (1, -1.0)), ())
+    assert almmodel.parse_basis("-2 X1 X1", index) == (-2.0, ((0, 2.0),), ())
+    for term in ["X3", "X1 + X2", "tanh(X1)", "X1^X2"]:
+        try:
+            almmodel.parse_basis(term, index)
+            assert False, term
+        except ValueError:
+            pass
+    print("Passed.")
+
+
+# pickling test checks
+def testPickle():
+    print("Testing pickle...", end="")
+    model = almmodel.AlmModel.from_terms(terms, xlabels)
+    copy = pickle.loads(pickle.dumps(model))
+    assert np.array_equal(copy.predict(xdata), model.predict(xdata))
+    print("Passed.")
+
+
+# read_lst_file test checks
+def testReadLstFileModel():
+    print("Testing readLstFileModel...", end="")
+    opts = almopts.prepare_default_opts()
+    opts["lst_file_name"] = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "fixtures", "sample.lst"
+    )
+    almread.read_lst_file(opts)
+    model = opts["return"]["out"]["z2"]["model_fun"]
+    assert isinstance(model, almmodel.AlmModel)
+    assert model.coeffs.tolist() == [-0.5, 2.0, -1.25]
+    assert abs(model(0.5, 2.0) - (-0.5 + 2.0 * np.exp(0.5) - 1.25)) < 1e-12
+    print("Passed.")
+
+
+def testAll():
+    testFromTermsMatchesLambdify()
+    testFromModelStr()
+    testSplitTerms()
+    testParseBasis()
+    testPickle()
+    testReadLstFileModel()
+
+
+def main():
+    testAll()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Necessary testing for all functions from almplot.py
+"""
+
+# import functions from testing from almplot
+import alamopy.almain as almain
+import alamopy.almplot as almplot
+import alamopy.almconfidence as almconfidence
+import alamopy.almfake as almfake
+import numpy as np
+
+xdata = np.random.rand(300, 2) + 0.1
+xlabels = ["X1", "X2"]
+model = "z = 1.5 * X1^2 - 0.5 * X1 * X2 + 2.0 * exp(X2) - 1.25"
+
+
+# evaluate_with_band test checks
+def testEvaluateWithBand():
+    print("Testing evaluateWithBand...", end="")
+    x1, x2 = xdata[:, 0], xdata[:, 1]
+    res = {"model": model, "xlabels": xlabels, "ssr": 0.2, "xdata": xdata}
+    res = almconfidence.almconfidence(res)
+    grid = almplot.slice_grid([0.5, 0.7], [0.1, 0.1], [1.1, 1.1], 1, 50)
+    assert grid.shape == (50, 2)
+    assert np.all(grid[:, 0] == 0.5)
+    assert np.allclose(grid[:, 1], np.linspace(0.1, 1.1, 50))
+
+    pred, band = almplot.evaluate_with_band(model, xlabels, grid, res["covariance"], 2.0)
+    g1, g2 = grid[:, 0], grid[:, 1]
+    assert np.allclose(pred, 1.5 * g1**2 - 0.5 * g1 * g2 + 2.0 * np.exp(g2) - 1.25)
+    sensmat = np.column_stack([g1**2, g1 * g2, np.exp(g2), np.ones(len(g1))])
+    expected = 2.0 * np.sqrt(np.diag(sensmat @ res["covariance"] @ sensmat.T))
+    assert np.allclose(band, expected)
+    assert almplot.evaluate_with_band(model, xlabels, xdata)[1] is None
+    assert almplot.model_output(res) == (model, xlabels, res["covariance"])
+    print("Passed.")
+
+
+# decimate_points test checks
+def testDecimatePoints():
+    print("Testing decimatePoints...", end="")
+    x = np.random.randn(10**6)
+    y = x + 0.1 * np.random.randn(10**6)
+    y[123] = 50.0
+    index = almplot.decimate_points(x, y, max_points=2500)
+    assert len(index) <= 2500
+    assert np.all(np.diff(index) > 0)
+    # The extremes of the scatter are kept
+    for values in [x, y]:
+        assert values[index].min() == values.min()
+        assert values[index].max() == values.max()
+    assert 123 in index
+    assert np.array_equal(almplot.decimate_points(x[:10], y[:10]), np.arange(10))
+    print("Passed.")
+
+
+# model_output test checks
+def testModelOutput():
+    print("Testing modelOutput...", end="")
+    zdata = np.column_stack((xdata[:, 0] ** 2, 2.0 * xdata[:, 1]))
+    res = almain.doalamo(
+        xdata, zdata, backend=almfake.FakeBackend(), monomialpower=[2]
+    )
+    # The stdout and stderr of ALAMO come first in res["out"]
+    assert list(res["out"])[:2] == ["stdout", "stderr"]
+    model_str, labels, covar = almplot.model_output(res)
+    assert model_str == "Z1 = " + res["out"]["Z1"]["model_str"]
+    assert labels == xlabels and covar is None
+    assert almplot.model_output(res, "Z2")[0].startswith("Z2 = ")
+    assert almplot._output_column(res, "Z1") == 0
+    assert almplot._output_column(res, "Z2") == 1
+    print("Passed.")
+
+
+def testAll():
+    testEvaluateWithBand()
+    testDecimatePoints()
+    testModelOutput()
+
+
+def main():
+    testAll()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Necessary testing for all functions from almprofile.py
+"""
+
+import os
+import shutil
+import stat
+import tempfile
+import tracemalloc
+
+# import functions from testing from almprofile
+import alamopy.almain as almain
+import alamopy.almprofile as almprofile
+import numpy as np
+
+sample_lst = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "sample.lst")
+xdata = np.random.rand(10, 2)
+zdata = np.column_stack([xdata[:, 0] ** 2, xdata[:, 1] ** 2])
+
+
+# Profile test checks
+def testProfile():
+    print("Testing profile...", end="")
+    spans = []
+    profile = almprofile.Profile(hook=lambda name, span: spans.append(name))
+    with profile.span("outer"):
+        with profile.span("inner"):
+            big = np.ones(10**6)
+            del big
+        with profile.span("inner"):
+            pass
+    profile.close()
+    assert not tracemalloc.is_tracing()
+    assert spans == ["inner", "inner", "outer"]
+    assert profile.records["inner"]["calls"] == 2
+    # The peak of the inner phase is part of the outer one
+    assert profile.records["inner"]["peak_bytes"] >= 8 * 10**6
+    assert profile.records["outer"]["peak_bytes"] >= 8 * 10**6
+    assert profile.records["outer"]["wall"] >= profile.records["inner"]["wall"]
+
+    timing = almprofile.Profile(memory=False)
+    with timing.span("phase"):
+        pass
+    assert timing.records["phase"]["peak_bytes"] is None
+    assert not tracemalloc.is_tracing()
+    print("Passed.")
+
+
+def testOverlappingProfiles():
+    print("Testing overlappingProfiles...", end="")
+    # Tracing goes on until the last open profile is closed
+    first = almprofile.Profile()
+    second = almprofile.Profile()
+    with first.span("phase"):
+        with second.span("phase"):
+            pass
+    first.close()
+    assert tracemalloc.is_tracing()
+    with second.span("phase"):
+        pass
+    assert second.records["phase"]["peak_bytes"] is not None
+    second.close()
+    second.close()
+    assert not tracemalloc.is_tracing()
+    # Reused after closing, as by successive fits
+    with first.span("phase"):
+        pass
+    assert tracemalloc.is_tracing()
+    first.close()
+    assert not tracemalloc.is_tracing()
+    # Tracing started by the caller is left on
+    tracemalloc.start()
+    try:
+        with first.span("phase"):
+            pass
+        first.close()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    print("Passed.")
+
+
+# doalamo profiling test checks
+def testDoalamoProfile():
+    print("Testing doalamoProfile...", end="")
+    script_dir = tempfile.mkdtemp()
+    script = os.path.join(script_dir, "alamo")
+    with open(script, "w") as script_file:
+        script_file.write('#!/bin/sh\ncat ' + sample_lst + ' > "${1%.alm}.lst"\n')
+    os.chmod(script, stat.S_IRWXU)
+    spans = []
+
+    os.environ["ALAMO_EXEC_PATH"] = script
+    try:
+        result = almain.doalamo(xdata, zdata, profile=True)
+        profile = almprofile.Profile(memory=False, hook=lambda *span: spans.append(span))
+        timed = almain.doalamo(xdata, zdata, profile=profile)
+    finally:
+        del os.environ["ALAMO_EXEC_PATH"]
+        shutil.rmtree(script_dir)
+
+    phases = [
+        "complete_opts",
+        "write_alm_file",
+        "spawn",
+        "exec_alamo",
+        "build_model",
+        "read_lst_file",
+        "cleanup",
+    ]
+    records = result["other"]["profile"]
+    assert sorted(records) == sorted(phases)
+    assert records["build_model"]["calls"] == 2
+    for record in records.values():
+        assert record["wall"] >= 0 and record["peak_bytes"] >= 0
+    assert timed["other"]["profile"] is profile.records
+    assert [name for name, _ in spans] == [
+        "complete_opts",
+        "write_alm_file",
+        "spawn",
+        "exec_alamo",
+        "build_model",
+        "build_model",
+        "read_lst_file",
+        "cleanup",
+    ]
+    print("Passed.")
+
+
+def testAll():
+    testProfile()
+    testOverlappingProfiles()
+    testDoalamoProfile()
+
+
+def main():
+    testAll()
+
+
+if __name__ == "__main__":
+    main()
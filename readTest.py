@@ -0,0 +1,105 @@
+"""
+Necessary testing for all functions from almread.py
+"""
+
+import os
+
+# import functions from testing from almread
+import alamopy.almopts as almopts
+import alamopy.almread as almread
+import numpy as np
+
+sample_lst = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "sample.lst")
+
+
+# iter_lst_sections test checks
+def testIterLstSections():
+    print("Testing iterLstSections...", end="")
+    with open(sample_lst) as lst_file:
+        sections = list(almread.iter_lst_sections(lst_file))
+    assert [section for section, _ in sections] == [
+        "options",
+        "labels",
+        "data",
+        "bases",
+        "output",
+        "output",
+        "time",
+    ]
+    assert sections[0][1]["NINPUTS"] == 2 and sections[0][1]["LINFCNS"] == True
+    assert sections[1][1]["XLABELS"] == ["X1", "X2"]
+    assert sections[2][1][0] == "XDATA and ZDATA"
+    assert sections[4][1][1]["terms"] == ["1.00000000000000     X1^2", "0.999999999999999    X2^2"]
+    print("Passed.")
+
+
+# read_lst_file test checks
+def testReadLstFile():
+    print("Testing readLstFile...", end="")
+    opts = almopts.prepare_default_opts()
+    opts["lst_file_name"] = sample_lst
+    almread.read_lst_file(opts)
+    result = opts["return"]
+
+    assert result["in"]["ZLABELS"] == ["z1", "z2"]
+    assert result["in"]["XMAX"] == [0.9, 1.5]
+    assert result["in"]["bases"][-1] == "X1*X2"
+    assert result["in"]["XDATA and ZDATA"].shape == (4, 4)
+    assert result["in"]["XDATA and ZDATA"].dtype == np.float64
+    assert result["out"]["z1"]["R2"] == 0.998
+    assert result["out"]["z1"]["Model size"] == 2
+    assert result["out"]["z2"]["model_str"] == " - 0.5 * X1 * X2 + 2.0 * exp(X1) - 1.25"
+    assert abs(result["out"]["z1"]["model_fun"](0.5, 2.0) - 4.25) < 1e-12
+    assert result["other"]["time"]["total"] == 0.16
+    assert result["other"]["time"]["other"] == 0.0097
+    print("Passed.")
+
+
+# skip_data_echo test checks
+def testSkipDataEcho():
+    print("Testing skipDataEcho...", end="")
+    opts = almopts.prepare_default_opts()
+    opts["lst_file_name"] = sample_lst
+    opts["skip_data_echo"] = True
+    almread.read_lst_file(opts)
+    assert "XDATA and ZDATA" not in opts["return"]["in"]
+    assert opts["return"]["in"]["bases"][0] == "X1"
+    assert "z2" in opts["return"]["out"]
+    print("Passed.")
+
+
+# parse_data_block test checks
+def testParseDataBlock():
+    print("Testing parseDataBlock...", end="")
+    block = almread.parse_data_block(["1 2.5", "0.1E-02 -3"])
+    assert block.tolist() == [[1.0, 2.5], [0.001, -3.0]]
+    assert almread.parse_data_block(["1 2 3"]).tolist() == [1.0, 2.0, 3.0]
+    assert almread.parse_data_block(["1 2", "3"]) == [[1, 2], [3]]
+    print("Passed.")
+
+
+# read_lst_file on a truncated file test checks
+def testReadTruncatedLstFile():
+    print("Testing readTruncatedLstFile...", end="")
+    with open(sample_lst) as lst_file:
+        lines = lst_file.readlines()
+    end = next(i for i, line in enumerate(lines) if "Quality metrics for output z2" in line)
+    sections = dict(almread.iter_lst_sections(lines[:end]))
+    assert "bases" in sections and "time" not in sections
+    print("Passed.")
+
+
+def testAll():
+    testIterLstSections()
+    testReadLstFile()
+    testSkipDataEcho()
+    testParseDataBlock()
+    testReadTruncatedLstFile()
+
+
+def main():
+    testAll()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Necessary testing for all functions from almsample.py
+"""
+
+# import functions from testing from almsample
+import alamopy.almain as almain
+import alamopy.almfake as almfake
+import alamopy.almopts as almopts
+import alamopy.almsample as almsample
+import numpy as np
+
+# data setup for tests: the inputs crowd around a corner of the unit square
+rng = np.random.default_rng(0)
+xdata = rng.random((5000, 2)) ** 3
+zdata = 3.0 * xdata[:, 0] ** 2 - 2.0 * xdata[:, 1] + 1.0
+
+
+def min_distance(points):
+    distance = np.sum((points[:, None] - points[None]) ** 2, axis=2)
+    np.fill_diagonal(distance, np.inf)
+    return np.sqrt(distance.min())
+
+
+# thin test checks
+def testThin():
+    print("Testing thin...", end="")
+    for method in almsample.sample_methods:
+        rows = almsample.thin(xdata, 100, method)
+        assert len(rows) == 100 and len(np.unique(rows)) == 100
+        assert np.all(np.diff(rows) > 0)
+        # Deterministic
+        assert np.array_equal(rows, almsample.thin(xdata, 100, method))
+    assert np.array_equal(almsample.thin(xdata[:50], 100), np.arange(50))
+    # The kdtree cells hold the same number of points: every quarter of the
+    # data, by the first input, keeps a quarter of the points
+    rows = almsample.kdtree_thin(xdata, 64)
+    quartiles = np.quantile(xdata[:, 0], [0.25, 0.5, 0.75])
+    counts = np.bincount(np.searchsorted(quartiles, xdata[rows, 0]), minlength=4)
+    assert np.all(np.abs(counts - 16) <= 4)
+    # The maximin points spread farther apart than a random subset
+    spread = min_distance(xdata[almsample.maximin_thin(xdata, 100)])
+    assert spread > 5 * min_distance(xdata[rng.choice(5000, 100, replace=False)])
+    print("Passed.")
+
+
+def testValdata():
+    print("Testing valdata...", end="")
+    backend = almfake.FakeBackend()
+    result = almain.doalamo(
+        xdata, zdata, backend=backend, monomialpower=[2], max_fit_points=200
+    )
+    assert result["in"]["NDATA"] == 200
+    assert result["other"]["subsampling"] == {
+        "method": "kdtree",
+        "ndata": 5000,
+        "nfit": 200,
+        "nheldout": 4800,
+        "holdout": "valdata",
+    }
+    assert result["out"]["Z1"]["R2"] > 0.999999
+    # The input bounds of the alm file cover all the data
+    opts = almain.prepare_opts(xdata, zdata, None, None, None, None, {})
+    opts["max_fit_points"] = 200
+    almopts.complete_opts(opts)
+    assert np.array_equal(opts["xmax"], xdata.max(axis=0))
+    assert opts["data"].shape == (200, 3) and opts["valdata"].shape == (4800, 3)
+    assert opts["nvaldata"] == 4800
+    print("Passed.")
+
+
+def testScore():
+    print("Testing score...", end="")
+    result = almain.doalamo(
+        xdata,
+        zdata,
+        engine="subset",
+        monomialpower=[2],
+        max_fit_points=100,
+        fit_sampling="maximin",
+    )
+    subsampling = result["other"]["subsampling"]
+    assert subsampling["holdout"] == "score" and subsampling["nfit"] == 100
+    assert result["in"]["NDATA"] == 100
+    assert subsampling["scores"]["Z1"]["R2"] > 0.999999
+    assert subsampling["scores"]["Z1"]["RMSE"] < 1e-6
+    # Also with ALAMO, on request
+    backend = almfake.FakeBackend()
+    result = almain.doalamo(
+        xdata,
+        zdata,
+        backend=backend,
+        monomialpower=[2],
+        max_fit_points=100,
+        fit_sampling="kmeans",
+        fit_holdout="score",
+    )
+    assert result["other"]["subsampling"]["scores"]["Z1"]["R2"] > 0.999999
+    try:
+        almain.doalamo(xdata, zdata, max_fit_points=100, fit_sampling="sobol")
+    except RuntimeError:
+        pass
+    else:
+        assert False, "sobol is not a sampling method"
+    print("Passed.")
+
+
+def testDuplicates():
+    print("Testing duplicates...", end="")
+    # 5 distinct points, 40 times each
+    x = np.repeat(rng.random((5, 2)), 40, axis=0)
+    z = x[:, 0] - x[:, 1]
+    rows = almsample.maximin_thin(x, 10)
+    assert len(rows) == 5 and len(np.unique(x[rows], axis=0)) == 5
+    result = almain.doalamo(
+        x, z, engine="subset", max_fit_points=10, fit_sampling="maximin"
+    )
+    subsampling = result["other"]["subsampling"]
+    assert subsampling["nfit"] == 5 and subsampling["nheldout"] == 195
+    assert subsampling["scores"]["Z1"]["ndata"] == 195
+    print("Passed.")
+
+
+def testAll():
+    testThin()
+    testValdata()
+    testScore()
+    testDuplicates()
+
+
+def main():
+    testAll()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Necessary testing for all functions from almscreen.py
+"""
+
+# import functions from testing from almscreen
+import alamopy.almain as almain
+import alamopy.almfake as almfake
+import alamopy.almprofile as almprofile
+import alamopy.almscreen as almscreen
+import numpy as np
+
+# data setup for tests: 2 of 40 inputs matter
+rng = np.random.default_rng(0)
+xdata = rng.random((300, 40)) + 0.5
+zdata = 3.0 * xdata[:, 3] ** 2 - 2.0 * np.exp(xdata[:, 17])
+xlabels = ["x%d" % j for j in range(40)]
+
+
+def check_screening(result, method):
+    screening = result["other"]["screening"]
+    assert screening["method"] == method
+    assert set(screening["excluded"]) == set(xlabels) - {"x3", "x17"}
+    assert screening["scores"]["x3"] > 0.05 and screening["scores"]["x17"] > 0.05
+
+
+# screen test checks
+def testCorrelation():
+    print("Testing correlation...", end="")
+    profile = almprofile.Profile(memory=False)
+    result = almain.doalamo(
+        xdata,
+        zdata,
+        engine="subset",
+        xlabels=xlabels,
+        screen=True,
+        expfcns=1,
+        monomialpower=[2],
+        profile=profile,
+    )
+    check_screening(result, "correlation")
+    assert set(result["out"]["Z1"]["model_fun"].labels) == {"x3^2", "exp(x17)"}
+    assert result["out"]["Z1"]["R2"] > 0.999999
+    assert profile.records["screen"]["calls"] == 1
+    print("Passed.")
+
+
+def testMutualInformation():
+    print("Testing mutualInformation...", end="")
+    result = almain.doalamo(
+        xdata, zdata, engine="subset", xlabels=xlabels, screen="mutual_information"
+    )
+    check_screening(result, "mutual_information")
+    # The scores do not depend on monotonic transformations of the inputs
+    scores = almscreen.mutual_information_scores(xdata, zdata[:, None])
+    transformed = almscreen.mutual_information_scores(np.log(xdata), zdata[:, None])
+    assert np.allclose(scores, transformed)
+    print("Passed.")
+
+
+def testLasso():
+    print("Testing lasso...", end="")
+    opts = {"monomialpower": [2, 3, 4], "expfcns": 1, "logfcns": 1, "sinfcns": 1}
+    result = almain.doalamo(
+        xdata, zdata, engine="subset", xlabels=xlabels, screen="lasso", **opts
+    )
+    check_screening(result, "lasso")
+    # Only the squares and exponentials are left of the candidate bases
+    trimmed = result["other"]["screening"]["trimmed"]
+    assert trimmed == {"monomialpower": [3, 4], "logfcns": [1], "sinfcns": [1]}
+    assert "x3^3" not in result["in"]["bases"] and "x3^2" in result["in"]["bases"]
+    assert "log(x3)" not in result["in"]["bases"]
+    assert result["out"]["Z1"]["R2"] > 0.999999
+    print("Passed.")
+
+
+def testInteractions():
+    print("Testing interactions...", end="")
+    # x1 and x2 only matter through their product, uncorrelated with either
+    x = rng.uniform(-1.0, 1.0, (200, 3))
+    z = x[:, 0] * x[:, 1] + 0.5 * x[:, 2]
+    for method in almscreen.screen_methods:
+        result = almain.doalamo(x, z, engine="subset", multi2power=[1], screen=method)
+        assert result["other"]["screening"]["excluded"] == []
+        assert result["out"]["Z1"]["R2"] > 0.999999
+    # Inputs paired with an input that matters are still screened out
+    result = almain.doalamo(
+        xdata, zdata, engine="subset", xlabels=xlabels, screen=True, multi2power=[1]
+    )
+    check_screening(result, "correlation")
+    print("Passed.")
+
+
+def testCustomBases():
+    print("Testing customBases...", end="")
+    # Custom bases are written with the custom labels
+    x = rng.random((200, 3)) + 0.5
+    z = x[:, 0] * x[:, 1]
+    for method in almscreen.screen_methods:
+        result = almain.doalamo(
+            x,
+            z,
+            engine="subset",
+            xlabels=["a", "b", "c"],
+            custombas=["a*b"],
+            screen=method,
+        )
+        assert result["other"]["screening"]["excluded"] == ["c"]
+        assert result["out"]["Z1"]["R2"] > 0.999999
+    print("Passed.")
+
+
+def testMaxInputs():
+    print("Testing maxInputs...", end="")
+    result = almain.doalamo(
+        xdata,
+        zdata,
+        engine="subset",
+        screen=True,
+        screen_threshold=0.0,
+        screen_max_inputs=1,
+        expfcns=1,
+    )
+    assert len(result["other"]["screening"]["excluded"]) == 39
+    try:
+        almain.doalamo(xdata, zdata, engine="subset", screen="ridge")
+    except RuntimeError:
+        pass
+    else:
+        assert False, "ridge is not a screening method"
+    print("Passed.")
+
+
+def testExcludeFlags():
+    print("Testing excludeFlags...", end="")
+    backend = almfake.FakeBackend()
+    z = 3.0 * xdata[:, 3] ** 2 + 0.5 * np.exp(xdata[:, 3])
+    result = almain.doalamo(
+        xdata[:, :8],
+        z,
+        backend=backend,
+        screen=True,
+        expfcns=1,
+        monomialpower=[2],
+        exclude=[0, 0, 0, 0, 0, 1, 0, 0],
+    )
+    screening = result["other"]["screening"]
+    # Inputs excluded by the caller are not reported as screened out
+    assert "X6" not in screening["excluded"]
+    assert len(screening["excluded"]) == 6
+    # The fake ALAMO reads the exclude flags from the alm file
+    assert result["in"]["bases"] == ["X4", "X4^2", "exp(X4)", 1]
+    assert result["out"]["Z1"]["R2"] > 0.99
+    print("Passed.")
+
+
+def testAll():
+    testCorrelation()
+    testMutualInformation()
+    testLasso()
+    testInteractions()
+    testCustomBases()
+    testMaxInputs()
+    testExcludeFlags()
+
+
+def main():
+    testAll()
+
+
+if __name__ == "__main__":
+    main()
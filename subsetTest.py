@@ -0,0 +1,132 @@
+"""
+Necessary testing for all functions from almsubset.py
+"""
+
+import asyncio
+
+# import functions from testing from almsubset
+import alamopy.almain as almain
+import alamopy.almlayer as almlayer
+import alamopy.almsubset as almsubset
+import numpy as np
+
+# data setup for tests
+rng = np.random.default_rng(0)
+xdata = rng.random((200, 3)) + 0.5
+zdata = 3.0 * xdata[:, 0] ** 2 - 2.0 * xdata[:, 0] / xdata[:, 1] + 1.0
+zdata = zdata + 0.01 * rng.standard_normal(200)
+bases_opts = {
+    "monomialpower": [2, 3],
+    "multi2power": [1],
+    "ratiopower": [1],
+    "expfcns": 1,
+    "logfcns": 1,
+}
+
+
+# fit_subset test checks
+def testRecoversModel():
+    print("Testing recoversModel...", end="")
+    result = almain.doalamo(xdata, zdata, engine="subset", **bases_opts)
+    output = result["out"]["Z1"]
+    assert set(output["model_fun"].labels) == {"X1^2", "X1 * X2^-1", "1"}
+    assert output["Model size"] == 3
+    assert output["R2"] > 0.9999
+    assert np.allclose(output["model_fun"].coeffs, [3.0, -2.0, 1.0], atol=0.01)
+    pred = output["model_fun"](xdata[:, 0], xdata[:, 1], xdata[:, 2])
+    assert np.sqrt(np.mean((pred - zdata) ** 2)) < 0.02
+    print("Passed.")
+
+
+def testResultShape():
+    print("Testing resultShape...", end="")
+    z2 = np.column_stack((zdata, 2.0 * xdata[:, 2]))
+    result = almain.doalamo(
+        xdata, z2, engine="subset", zlabels=["y", "w"], **bases_opts
+    )
+    assert result["in"]["NINPUTS"] == 3 and result["in"]["NOUTPUTS"] == 2
+    assert result["in"]["XLABELS"] == ["X1", "X2", "X3"]
+    assert result["in"]["ZLABELS"] == ["y", "w"]
+    assert result["in"]["XDATA and ZDATA"].shape == (200, 5)
+    assert "X1*X2^-1" in result["in"]["bases"]
+    assert "exp(X1)" in result["in"]["bases"]
+    for name in ("SSE", "RMSE", "R2", "R2 adjusted", "Model size", "BIC", "MADp"):
+        assert name in result["out"]["y"]
+    assert result["out"]["w"]["model_str"].endswith(" * X3")
+    assert result["other"]["termination"] == "normal"
+    assert result["other"]["engine"] == "subset"
+    # No ALAMO binary is probed for the version of the engine
+    almlayer.post_process(result)
+    assert result["version"] == almsubset.version
+    assert result["model"] == "y = " + result["out"]["y"]["model_str"]
+    assert set(result["other"]["time"]) >= {"total", "OLR", "MIP", "other"}
+    print("Passed.")
+
+
+def testTermBounds():
+    print("Testing termBounds...", end="")
+    result = almain.doalamo(
+        xdata, zdata, engine="subset", maxterms=2, modeler=3, **bases_opts
+    )
+    assert result["out"]["Z1"]["Model size"] <= 2
+    result = almain.doalamo(xdata, zdata, engine="subset", minterms=5, **bases_opts)
+    assert result["out"]["Z1"]["Model size"] >= 5
+    try:
+        almain.doalamo(xdata, zdata, engine="subset", modeler=8)
+    except RuntimeError:
+        pass
+    else:
+        assert False, "modeler 8 is not supported"
+    print("Passed.")
+
+
+def testSelectTerms():
+    print("Testing selectTerms...", end="")
+    columns = rng.random((50, 6))
+    z = columns[:, 1] - 2.0 * columns[:, 4]
+    # An exact fit is found, without the terms that only fit round-off
+    assert almsubset.select_terms(columns, z) == [1, 4]
+    # A duplicated column does not add a term
+    columns = np.column_stack((columns, columns[:, 1]))
+    assert len(almsubset.select_terms(columns, z)) == 2
+    print("Passed.")
+
+
+def testCorrelatedBases():
+    print("Testing correlatedBases...", end="")
+    # X2 and X2^2 are strongly correlated on [1, 2]: the forward path takes
+    # X2 first, and only backward elimination drops it once X2^2 is in
+    x = rng.uniform(1.0, 2.0, (50, 2))
+    z = 2.0 * x[:, 0] + x[:, 1] ** 2
+    for modeler in almsubset.criteria:
+        result = almain.doalamo(
+            x, z, engine="subset", monomialpower=[2], modeler=modeler
+        )
+        assert set(result["out"]["Z1"]["model_fun"].labels) == {"X1", "X2^2"}
+    print("Passed.")
+
+
+def testAsync():
+    print("Testing async...", end="")
+    result = asyncio.run(
+        almain.doalamo_async(xdata, zdata, engine="subset", **bases_opts)
+    )
+    assert result["out"]["Z1"]["Model size"] == 3
+    print("Passed.")
+
+
+def testAll():
+    testRecoversModel()
+    testResultShape()
+    testTermBounds()
+    testSelectTerms()
+    testCorrelatedBases()
+    testAsync()
+
+
+def main():
+    testAll()
+
+
+if __name__ == "__main__":
+    main()
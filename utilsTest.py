@@ -2,6 +2,10 @@
 Necessary testing for all functions from almutils.py
 """
 
+import os
+import stat
+import tempfile
+
 # import functions from testing from almutils
 import alamopy.almutils as almutils
 
@@ -115,6 +119,32 @@ def testFormatSection():
 
 
 # parse_term_code test checks
+def testParseTermCode():
+    print("Testing parseTermCode...", end="")
+    stdout = " Iteration 1\n ALAMO terminated with termination code 3\n"
+    assert almutils.parse_term_code(stdout) == 3
+    assert almutils.parse_term_code(" Normal termination\n") == 0
+    lines = iter(stdout.splitlines(True) + ["never read\n"])
+    assert almutils.parse_term_code(lines) == 3
+    assert next(lines) == "never read\n"
+    print("Passed.")
+
+
+# parse_progress_line test checks
+def testParseProgressLine():
+    print("Testing parseProgressLine...", end="")
+    assert almutils.parse_progress_line(
+        " Iteration 2 (Approx. elapsed time 0.44E-02 s)\n"
+    ) == {"iteration": 2, "elapsed": 0.0044}
+    assert almutils.parse_progress_line(" Model building for variable z\n") == {
+        "output": "z"
+    }
+    assert almutils.parse_progress_line(
+        " BIC = -84.0 with z =  - 0.19 * X1 + 0.20 * X2 - 0.86E-01 * X1^2\n"
+    ) == {"metric": "BIC", "value": -84.0, "output": "z", "nterms": 3}
+    assert almutils.parse_progress_line(" BIC = -52.8 with z = 0.00\n")["nterms"] == 0
+    assert almutils.parse_progress_line(" Step 1: Model building using BIC\n") is None
+    print("Passed.")
 
 
 # vector_2d test checks
@@ -127,6 +157,39 @@ def testVector2D():
 
 
 # get_alamo_version test checks
+def testGetAlamoVersion():
+    print("Testing getAlamoVersion...", end="")
+    script_dir = tempfile.mkdtemp()
+    script = os.path.join(script_dir, "alamo")
+    calls = os.path.join(script_dir, "calls")
+    with open(script, "w") as script_file:
+        script_file.write(
+            "#!/bin/sh\n"
+            "echo probed >> " + calls + "\n"
+            "touch probed.lst\n"
+            "echo ' ALAMO version 2022.10.7. Built: LNX-64'\n"
+        )
+    os.chmod(script, stat.S_IRWXU)
+    os.environ["ALAMO_EXEC_PATH"] = script
+    try:
+        assert str(almutils.get_alamo_path()) == script
+        assert almutils.get_alamo_version() == "2022.10.7"
+        assert almutils.get_alamo_version() == "2022.10.7"
+        with open(calls) as calls_file:
+            assert len(calls_file.readlines()) == 1
+        # The probe runs outside of the working directory
+        assert not os.path.exists("probed.lst")
+        # Replacing the executable invalidates the memoized version
+        os.utime(script, ns=(0, 0))
+        assert almutils.get_alamo_version() == "2022.10.7"
+        with open(calls) as calls_file:
+            assert len(calls_file.readlines()) == 2
+    finally:
+        del os.environ["ALAMO_EXEC_PATH"]
+        os.remove(script)
+        os.remove(calls)
+        os.rmdir(script_dir)
+    print("Passed.")
 
 
 def testAll():
@@ -141,7 +204,10 @@ def testAll():
     testIncrement()
     testFormatExtry()
     testFormatSection()
+    testParseTermCode()
+    testParseProgressLine()
     testVector2D()
+    testGetAlamoVersion()
 
 
 def main():
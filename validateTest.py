@@ -0,0 +1,124 @@
+"""
+Necessary testing for all functions from almvalidate.py
+"""
+
+import os
+import tempfile
+
+# import functions from testing from almvalidate
+import alamopy.almain as almain
+import alamopy.almsubset as almsubset
+import alamopy.almvalidate as almvalidate
+import numpy as np
+
+# data setup for tests: a model fitted on few points, validated on many
+rng = np.random.default_rng(0)
+xdata = rng.random((20000, 2)) + 0.5
+zdata = np.column_stack(
+    (
+        3.0 * xdata[:, 0] ** 2 - 2.0 * xdata[:, 1] + 1.0,
+        np.exp(xdata[:, 1]) + 0.01 * rng.standard_normal(20000),
+    )
+)
+result = almain.doalamo(
+    xdata[:100], zdata[:100], engine="subset", monomialpower=[2], expfcns=1
+)
+
+
+def reference(k):
+    model = result["out"]["Z%d" % (k + 1)]["model_fun"]
+    pred = model(xdata[:, 0], xdata[:, 1])
+    metrics = dict(almsubset.quality_metrics(zdata[:, k], pred, 0))
+    metrics["max error"] = np.abs(zdata[:, k] - pred).max()
+    return metrics, zdata[:, k] - pred
+
+
+def check_metrics(metrics):
+    for k in range(2):
+        expected, _ = reference(k)
+        output = metrics["Z%d" % (k + 1)]
+        assert output["ndata"] == 20000
+        for name in ("SSE", "RMSE", "R2", "MADp", "max error"):
+            assert np.isclose(output[name], expected[name], rtol=1e-9, atol=1e-12)
+
+
+# validate test checks
+def testValidate():
+    print("Testing validate...", end="")
+    metrics = almvalidate.validate(result, xdata, zdata)
+    check_metrics(metrics)
+    assert "residuals" not in metrics["Z1"]
+    assert metrics["Z2"]["RMSE"] < 0.02
+    check_metrics(almvalidate.validate(result, xdata, zdata, chunk_size=777))
+    check_metrics(almvalidate.validate(result, xdata, zdata, chunk_size=999, threads=4))
+    print("Passed.")
+
+
+def testResiduals():
+    print("Testing residuals...", end="")
+    metrics = almvalidate.validate(
+        result, xdata, zdata, chunk_size=3000, threads=2, residuals=True
+    )
+    for k in range(2):
+        _, residuals = reference(k)
+        assert np.allclose(metrics["Z%d" % (k + 1)]["residuals"], residuals)
+    print("Passed.")
+
+
+def testMemmap():
+    print("Testing memmap...", end="")
+    directory = tempfile.mkdtemp()
+    try:
+        xfile = np.memmap(
+            os.path.join(directory, "x.dat"), dtype=float, mode="w+", shape=xdata.shape
+        )
+        zfile = np.memmap(
+            os.path.join(directory, "z.dat"), dtype=float, mode="w+", shape=zdata.shape
+        )
+        xfile[:] = xdata
+        zfile[:] = zdata
+        check_metrics(almvalidate.validate(result, xfile, zfile, chunk_size=4096))
+        del xfile, zfile
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+    # Or an iterable of (xchunk, zchunk) pairs
+    chunks = ((xdata[i : i + 5000], zdata[i : i + 5000]) for i in range(0, 20000, 5000))
+    check_metrics(almvalidate.validate(result, chunks))
+    print("Passed.")
+
+
+def testModelFunctions():
+    print("Testing modelFunctions...", end="")
+    # Any callable model_fun, e.g. a lambdified expression, and outputs far
+    # from 0
+    offset = 1e6
+    plain = {
+        "in": {"ZLABELS": ["y", "w"]},
+        "out": {"y": {"model_fun": lambda a, b: offset + a * b}, "w": {}},
+    }
+    z = offset + xdata[:, 0] * xdata[:, 1] + 1e-3 * rng.standard_normal(20000)
+    metrics = almvalidate.validate(
+        plain, xdata, np.column_stack((z, z)), chunk_size=1000
+    )
+    assert list(metrics) == ["y"]
+    error = z - offset - xdata[:, 0] * xdata[:, 1]
+    sst = np.sum((z - offset - np.mean(z - offset)) ** 2)
+    assert np.isclose(metrics["y"]["R2"], 1.0 - error @ error / sst, rtol=1e-9)
+    print("Passed.")
+
+
+def testAll():
+    testValidate()
+    testResiduals()
+    testMemmap()
+    testModelFunctions()
+
+
+def main():
+    testAll()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Necessary testing for all functions from almworkspace.py
+"""
+
+import os
+import shutil
+import stat
+import tempfile
+import time
+
+# import functions from testing from almworkspace
+import alamopy.almain as almain
+import alamopy.almcache as almcache
+import alamopy.almworkspace as almworkspace
+import numpy as np
+
+sample_lst = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "sample.lst")
+xdata = np.random.rand(10, 2)
+zdata = np.column_stack([xdata[:, 0] ** 2, xdata[:, 1] ** 2])
+
+
+def fake_alamo(directory, body):
+    """
+    Write a stand-in ALAMO executable running the given shell body, which
+    only prints its version when run without arguments.
+    """
+    script = os.path.join(directory, "alamo")
+    version = 'if [ -z "$1" ]; then echo "ALAMO version 2020.5.27."; exit 0; fi\n'
+    with open(script, "w") as script_file:
+        script_file.write("#!/bin/sh\n" + version + body + "\n")
+    os.chmod(script, stat.S_IRWXU)
+    return script
+
+
+# WorkspacePool test checks
+def testWorkspacePool():
+    print("Testing workspacePool...", end="")
+    root = tempfile.mkdtemp()
+    try:
+        stale = os.path.join(root, almworkspace.pool_prefix() + "999999999-abc")
+        os.mkdir(stale)
+        pool = almworkspace.WorkspacePool(root=root, size=2)
+        assert not os.path.exists(stale)
+        assert len(os.listdir(root)) == 2
+
+        workspace = pool.acquire()
+        with open(os.path.join(workspace, "temp.lst"), "w") as lst_file:
+            lst_file.write("stale output")
+        pool.release(workspace)
+        assert pool.acquire() == workspace
+        assert os.listdir(workspace) == []
+
+        # Beyond the pool size, released workspaces are removed
+        extra = [pool.acquire() for _ in range(2)]
+        for directory in [workspace] + extra:
+            pool.release(directory)
+        assert len(os.listdir(root)) == 2
+
+        kept = pool.detach(pool.acquire())
+        assert not os.path.basename(kept).startswith(almworkspace.pool_prefix())
+        pool.close()
+        assert os.listdir(root) == [os.path.basename(kept)]
+    finally:
+        shutil.rmtree(root)
+    print("Passed.")
+
+
+# doalamo with a workspace pool test checks
+def testDoalamoPooled():
+    print("Testing doalamoPooled...", end="")
+    root = tempfile.mkdtemp()
+    script_dir = tempfile.mkdtemp()
+    script = fake_alamo(
+        script_dir, 'cat "$1" > /dev/null\ncat ' + sample_lst + ' > "${1%.alm}.lst"'
+    )
+    os.environ["ALAMO_EXEC_PATH"] = script
+    try:
+        for fifo in [False, True]:
+            pool = almworkspace.WorkspacePool(root=root, size=1, fifo=fifo)
+            workspaces = sorted(os.listdir(root))
+            for _ in range(3):
+                result = almain.doalamo(xdata, zdata, workspace_pool=pool)
+                assert result["out"]["z1"]["model_str"].startswith("1.0 * X1^2 + ")
+                assert result["other"]["time"]["total"] == 0.16
+                assert sorted(os.listdir(root)) == workspaces
+                assert os.listdir(os.path.join(root, workspaces[0])) == []
+            pool.close()
+        # A cache takes precedence over the named pipes
+        pool = almworkspace.WorkspacePool(root=root, size=1, fifo=True)
+        cache = almcache.AlmCache()
+        for cached in [False, True]:
+            result = almain.doalamo(xdata, zdata, workspace_pool=pool, cache=cache)
+            assert result["other"]["cached"] == cached
+        pool.close()
+    finally:
+        del os.environ["ALAMO_EXEC_PATH"]
+        shutil.rmtree(script_dir)
+        shutil.rmtree(root)
+    print("Passed.")
+
+
+# crashing ALAMO with named pipes test checks
+def testDoalamoFifoCrash():
+    print("Testing doalamoFifoCrash...", end="")
+    root = tempfile.mkdtemp()
+    script_dir = tempfile.mkdtemp()
+    script = fake_alamo(script_dir, "exit 3")
+    os.environ["ALAMO_EXEC_PATH"] = script
+    try:
+        pool = almworkspace.WorkspacePool(root=root, size=1, fifo=True)
+        start = time.perf_counter()
+        result = almain.doalamo(xdata, zdata, workspace_pool=pool)
+        assert time.perf_counter() - start < 10
+        assert "z1" not in result["out"]
+        workspace = os.path.join(root, os.listdir(root)[0])
+        assert os.listdir(workspace) == []
+        pool.close()
+    finally:
+        del os.environ["ALAMO_EXEC_PATH"]
+        shutil.rmtree(script_dir)
+        shutil.rmtree(root)
+    print("Passed.")
+
+
+def testAll():
+    testWorkspacePool()
+    testDoalamoPooled()
+    testDoalamoFifoCrash()
+
+
+def main():
+    testAll()
+
+
+if __name__ == "__main__":
+    main()
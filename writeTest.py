@@ -0,0 +1,68 @@
+"""
+Necessary testing for all functions from almwrite.py
+"""
+
+import io
+import os
+import tempfile
+
+# import functions from testing from almwrite
+import alamopy.almopts as almopts
+import alamopy.almutils as almutils
+import alamopy.almwrite as almwrite
+import numpy as np
+
+
+# write_numeric_section test checks
+def testWriteNumericSection():
+    print("Testing writeNumericSection...", end="")
+    opts = dict()
+    opts["data"] = [[1, 0], [2, 0], [3, 0]]
+    alm_file = io.StringIO()
+    almwrite.write_numeric_section(alm_file, "data", opts["data"], block_rows=2)
+    assert alm_file.getvalue() == almutils.format_section("data", opts)
+
+    alm_file = io.StringIO()
+    almwrite.write_numeric_section(alm_file, "valdata", [0.1, 0.25], "%.2f")
+    assert alm_file.getvalue() == "\nBEGIN_VALDATA\n0.10\n0.25\nEND_VALDATA\n"
+    print("Passed.")
+
+
+# write_alm_file test checks
+def testWriteAlmFile():
+    print("Testing writeAlmFile...", end="")
+    xdata = np.random.rand(1000, 3)
+    zdata = xdata[:, 0] ** 2 + xdata[:, 1] ** 2
+    opts = almopts.prepare_default_opts()
+    opts["xdata"] = xdata
+    opts["zdata"] = zdata
+    opts["write_block_rows"] = 64
+    opts["alm_file_name"] = os.path.join(tempfile.mkdtemp(), "temp.alm")
+    almopts.complete_opts(opts)
+    almwrite.write_alm_file(opts)
+
+    with open(opts["alm_file_name"]) as alm_file:
+        lines = alm_file.read().split("\n")
+    os.remove(opts["alm_file_name"])
+    os.rmdir(os.path.dirname(opts["alm_file_name"]))
+
+    assert "ndata 1000" in lines
+    begin = lines.index("BEGIN_DATA")
+    end = lines.index("END_DATA")
+    data = np.loadtxt(lines[begin + 1 : end])
+    # "%.17g" round-trips every value exactly
+    assert np.array_equal(data, np.column_stack((xdata, zdata)))
+    print("Passed.")
+
+
+def testAll():
+    testWriteNumericSection()
+    testWriteAlmFile()
+
+
+def main():
+    testAll()
+
+
+if __name__ == "__main__":
+    main()